@@ -1,7 +1,6 @@
-import requests
-
-
 class Address:
+    __slots__ = ("gateway", "api_url")
+
     def __init__(self, gateway):
         self.gateway = gateway
         self.api_url = gateway.config.external_api_url
@@ -13,6 +12,6 @@ class Address:
 
         url = f"{self.api_url}/api/external/address/fields/{country_code}"
 
-        response = requests.get(url)
+        response = self.gateway.transport.request("GET", url)
         response.raise_for_status()
-        return response.json()
+        return self.gateway.transport.decode(response)
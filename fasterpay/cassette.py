@@ -0,0 +1,300 @@
+import base64
+import datetime
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import math
+import os
+import random
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3.response import HTTPResponse
+
+from fasterpay import forksafety
+from fasterpay.redaction import REDACTED, SECRET_FIELDS, SECRET_HEADERS
+
+# Response headers describing the original wire transfer rather than the body kept.
+_TRANSFER_HEADERS = frozenset({"connection", "content-encoding", "content-length", "date", "keep-alive", "transfer-encoding"})
+
+
+class Cassette:
+    """
+    Recorded FasterPay request/response pairs, for driving a gateway without the network.
+
+    In "record" mode, requests go to FasterPay (or any stand-in) as usual and every
+    exchange is kept with its credentials redacted: secret headers are dropped, and
+    secret query parameters and JSON fields, as well as any literal `secrets`, are
+    replaced by REDACTED. `save` writes them to a gzip-compressed JSON Lines file.
+
+    In "replay" mode, responses are served in process from the file, so load tests
+    and profiles of the resources measure the SDK alone. Requests are matched on
+    method, path and query (and the request body with `match_body`); a request
+    recorded several times replays its responses in recorded order, cycling. The
+    host is not matched, so a cassette recorded against the sandbox replays with any
+    `api_url`. Replayed responses come back immediately unless `latency` is set.
+
+    Use it through `Transport.use_cassette`:
+
+        cassette = Cassette("invoices.cassette", mode="replay", latency=lognormal_latency(0.08))
+        gateway.transport.use_cassette(cassette)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mode: str = "replay",
+        latency=None,
+        match_body: bool = False,
+        secrets=(),
+        redact_fields=SECRET_FIELDS,
+    ):
+        """
+        Args:
+            path (str): Cassette file. Loaded when it exists; in "record" mode new
+                exchanges are added to the ones already in it.
+            mode (str): "record" or "replay".
+            latency (optional): Delay of replayed responses: seconds (float), a
+                callable returning seconds, or "recorded" to wait as long as the
+                recorded response took. None replays at full speed.
+            match_body (bool): Also match requests on their (redacted) body.
+            secrets (iterable): Literal strings, e.g. the private key, redacted
+                wherever they appear in URLs, bodies and headers.
+            redact_fields (iterable): Query parameters and JSON fields redacted.
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError("mode must be 'record' or 'replay'.")
+        if latency is not None and latency != "recorded" and not callable(latency) and latency < 0:
+            raise ValueError("latency must be None, 'recorded', a callable or a non-negative number.")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.match_body = match_body
+        self.secrets = tuple(secret for secret in secrets if secret)
+        self.redact_fields = frozenset(redact_fields)
+        self.interactions = []
+        self._lock = threading.Lock()
+        self._index = {}
+        if os.path.exists(path):
+            with gzip.open(path, "rt", encoding="utf-8") as cassette:
+                self.interactions = [json.loads(line) for line in cassette if line.strip()]
+        elif mode == "replay":
+            raise ValueError(f"Cassette {path} does not exist; record it first.")
+        for interaction in self.interactions:
+            self._add(interaction)
+        forksafety.register(self)
+
+    def record(self, request: requests.PreparedRequest, response: requests.Response) -> dict:
+        """Redact and keep one exchange; the response body is read."""
+        body = response.content
+        headers = {
+            name: self._scrub(value)
+            for name, value in response.headers.items()
+            if name.lower() not in SECRET_HEADERS and name.lower() not in _TRANSFER_HEADERS
+        }
+        interaction = {
+            "method": request.method,
+            "url": self._redact_url(request.url),
+            "body_digest": self._body_digest(request.body),
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": headers,
+            "elapsed": response.elapsed.total_seconds(),
+        }
+        body = self._redact_body(body, headers.get("Content-Type", ""))
+        try:
+            interaction["body"] = body.decode("utf-8")
+        except UnicodeDecodeError:
+            interaction["body_base64"] = base64.b64encode(body).decode("ascii")
+        with self._lock:
+            self.interactions.append(interaction)
+            self._add(interaction)
+        return interaction
+
+    def play(self, request: requests.PreparedRequest):
+        """
+        Return the next recorded exchange matching `request`.
+
+        Raises:
+            LookupError: Nothing matching was recorded.
+        """
+        body_digest = self._body_digest(request.body) if self.match_body else None
+        replies = self._index.get(self._key(request.method, self._redact_url(request.url), body_digest))
+        if replies is None:
+            raise LookupError(f"No recorded response for {request.method} {self._redact_url(request.url)}.")
+        playlist, turns = replies
+        return playlist[next(turns) % len(playlist)]
+
+    def save(self) -> None:
+        """Write the recorded exchanges to `path`, replacing it atomically."""
+        with self._lock:
+            lines = [json.dumps(interaction, separators=(",", ":")) + "\n" for interaction in self.interactions]
+        partial = f"{self.path}.part"
+        with gzip.open(partial, "wt", encoding="utf-8") as cassette:
+            cassette.writelines(lines)
+        os.replace(partial, self.path)
+
+    def delay(self, reply: "_Reply") -> float:
+        """Seconds a replayed response waits, according to `latency`."""
+        if self.latency is None:
+            return 0.0
+        if self.latency == "recorded":
+            return reply.elapsed
+        return self.latency() if callable(self.latency) else self.latency
+
+    def _add(self, interaction: dict) -> None:
+        key = self._key(interaction["method"], interaction["url"], interaction.get("body_digest"))
+        replies = self._index.get(key)
+        if replies is None:
+            replies = self._index[key] = ([], itertools.count())
+        replies[0].append(_Reply(interaction))
+
+    def _key(self, method: str, url: str, body_digest: str):
+        parts = urlsplit(url)
+        query = tuple(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+        return (method, parts.path, query, body_digest if self.match_body else None)
+
+    def _scrub(self, text: str) -> str:
+        for secret in self.secrets:
+            text = text.replace(secret, REDACTED)
+        return text
+
+    def _redact_url(self, url: str) -> str:
+        parts = urlsplit(self._scrub(url))
+        if not parts.query:
+            return parts.geturl()
+        query = [
+            (name, REDACTED if name.lower() in self.redact_fields else value)
+            for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        ]
+        return parts._replace(query=urlencode(query)).geturl()
+
+    def _redact_body(self, body: bytes, content_type: str) -> bytes:
+        if self.secrets:
+            for secret in self.secrets:
+                body = body.replace(secret.encode("utf-8"), REDACTED.encode("utf-8"))
+        if "json" in content_type and body[:1] in (b"{", b"["):
+            try:
+                decoded = json.loads(body)
+            except ValueError:
+                return body
+            redacted = _redact_json(decoded, self.redact_fields)
+            if redacted != decoded:
+                body = json.dumps(redacted).encode("utf-8")
+        return body
+
+    def _body_digest(self, body) -> str:
+        if not body:
+            return None
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        elif not isinstance(body, bytes):
+            return None  # Streamed uploads are not matched on.
+        if body[:2] == b"\x1f\x8b":
+            body = gzip.decompress(body)
+        return hashlib.sha1(self._redact_body(body, "json")).hexdigest()
+
+    def _after_fork(self) -> None:
+        self._lock = threading.Lock()
+
+
+class CassetteAdapter(BaseAdapter):
+    """
+    `requests` adapter recording exchanges to, or replaying them from, a `Cassette`.
+
+    Mounted by `Transport.use_cassette` in place of the transport's adapters; in
+    "record" mode requests are sent through the replaced adapter, `upstream`.
+    """
+
+    def __init__(self, cassette: Cassette, upstream: BaseAdapter = None):
+        super().__init__()
+        if cassette.mode == "record" and upstream is None:
+            raise ValueError("Recording requires an upstream adapter.")
+        self.cassette = cassette
+        self.upstream = upstream
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if self.cassette.mode == "record":
+            response = self.upstream.send(request, stream=False, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+            reply = _Reply(self.cassette.record(request, response))
+            delay = response.elapsed.total_seconds()
+        else:
+            reply = self.cassette.play(request)
+            delay = self.cassette.delay(reply)
+            if delay:
+                time.sleep(delay)
+        return reply.response(request, self, stream, delay)
+
+    def close(self) -> None:
+        if self.upstream is not None:
+            self.upstream.close()
+
+
+class _Reply:
+    """A recorded response, decoded once and turned into `requests.Response` objects on demand."""
+
+    __slots__ = ("status", "reason", "headers", "encoding", "body", "elapsed")
+
+    def __init__(self, interaction: dict):
+        self.status = interaction["status"]
+        self.reason = interaction.get("reason")
+        self.headers = interaction.get("headers") or {}
+        self.encoding = get_encoding_from_headers(CaseInsensitiveDict(self.headers))
+        if "body_base64" in interaction:
+            self.body = base64.b64decode(interaction["body_base64"])
+        else:
+            self.body = interaction.get("body", "").encode("utf-8")
+        self.elapsed = interaction.get("elapsed") or 0.0
+
+    def response(self, request, adapter: BaseAdapter, stream: bool, elapsed: float) -> requests.Response:
+        response = requests.Response()
+        response.status_code = self.status
+        response.reason = self.reason
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.headers["Content-Length"] = str(len(self.body))
+        response.encoding = self.encoding
+        response.url = request.url
+        response.request = request
+        response.connection = adapter
+        response.elapsed = datetime.timedelta(seconds=elapsed)
+        if stream:
+            response.raw = HTTPResponse(
+                body=io.BytesIO(self.body), headers=response.headers, status=self.status, preload_content=False
+            )
+        else:
+            response._content = self.body
+        return response
+
+
+def lognormal_latency(median: float, sigma: float = 0.5, seed: int = None):
+    """
+    Return a latency callable for `Cassette`, drawing log-normally distributed delays.
+
+    Args:
+        median (float): Median delay in seconds.
+        sigma (float): Spread; 0.5 puts the 99th percentile near 3.2 times the median.
+        seed (int, optional): Seed, for reproducible runs.
+    """
+    if median <= 0 or sigma < 0:
+        raise ValueError("median must be positive and sigma non-negative.")
+    generator = random.Random(seed)
+    mu = math.log(median)
+    return lambda: generator.lognormvariate(mu, sigma)
+
+
+def _redact_json(value, fields: frozenset):
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if key.lower() in fields and value[key] is not None else _redact_json(value[key], fields)
+            for key in value
+        }
+    if isinstance(value, list):
+        return [_redact_json(item, fields) for item in value]
+    return value
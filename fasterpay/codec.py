@@ -0,0 +1,43 @@
+import json
+
+
+class JsonCodec:
+    """
+    Standard library JSON codec used for request bodies, multipart `json` fields,
+    API responses and pingbacks.
+
+    Subclass it and override `dumps` / `loads` to plug in another JSON library.
+    """
+
+    name = "json"
+
+    def dumps(self, obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), allow_nan=False).encode("utf-8")
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    """JSON codec backed by the optional `orjson` package."""
+
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self._orjson = orjson
+
+    def dumps(self, obj) -> bytes:
+        return self._orjson.dumps(obj)
+
+    def loads(self, data):
+        return self._orjson.loads(data)
+
+
+def fastest_codec() -> JsonCodec:
+    """Return the fastest installed JSON codec, falling back to the standard library."""
+    try:
+        return OrjsonCodec()
+    except ImportError:
+        return JsonCodec()
@@ -0,0 +1,199 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from fasterpay import forksafety
+
+# Limiter gating the requests sent from the current bulk task, if any.
+_active = contextvars.ContextVar("fasterpay_limiter", default=None)
+
+
+def current_limiter():
+    """Return the limiter of the bulk task running in this context, or None."""
+    return _active.get()
+
+
+class AdaptiveLimiter:
+    """
+    AIMD limit on the number of requests bulk helpers keep in flight.
+
+    Kept by every `Transport` as `limiter` and shared by the bulk helpers of all
+    resources (`Transaction.refund_many`, `Payout.get_payouts`, `Einvoice.create_invoices`,
+    ...). Requests sent from their tasks wait for a slot; every request that completes
+    healthy raises the limit by about one per round trip (additive increase), while a
+    429, a 5xx, a connection error or a timeout halves it (multiplicative decrease).
+    Latency counts too: when the smoothed latency exceeds `latency_tolerance` times
+    the lowest recent latency, requests are queueing upstream and the limit is cut
+    before errors appear. A cut only follows requests started after the previous
+    one, so a burst of failures from one round trip cuts the limit once.
+
+    Retry backoff happens outside the limiter, so a request waiting to be retried does
+    not hold a slot.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        backoff: float = 0.5,
+        latency_tolerance: float = 2.0,
+        smoothing: float = 0.1,
+        window: int = 500,
+    ):
+        """
+        Args:
+            initial_limit (int): Requests in flight before any feedback.
+            min_limit (int): Lowest limit.
+            max_limit (int): Highest limit; also the number of threads bulk helpers use.
+            backoff (float): Factor applied to the limit on overload.
+            latency_tolerance (float): Smoothed latency, relative to the lowest recent
+                latency, above which the upstream counts as overloaded.
+            smoothing (float): Weight of a new sample in the smoothed latency.
+            window (int): Samples after which the lowest latency is re-measured, so it
+                follows lasting changes in upstream speed.
+        """
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("Limits must satisfy 1 <= min_limit <= initial_limit <= max_limit.")
+        if not 0 < backoff < 1 or latency_tolerance <= 1 or not 0 < smoothing <= 1:
+            raise ValueError("backoff and smoothing must be in (0, 1) and latency_tolerance above 1.")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self.window = window
+
+        self._condition = threading.Condition()
+        self._limit = float(initial_limit)
+        self.in_flight = 0
+        self._smoothed = None
+        self._window_min = None
+        self._previous_min = None
+        self._window_samples = 0
+        self._last_decrease = 0.0
+        self.samples = 0
+        self.overloads = 0
+        self.decreases = 0
+        self.max_seen = initial_limit
+        forksafety.register(self)
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def acquire(self) -> float:
+        """Wait for a slot and return the time the request started, for `release`."""
+        with self._condition:
+            while self.in_flight >= int(self._limit):
+                self._condition.wait()
+            self.in_flight += 1
+        return time.perf_counter()
+
+    def release(self, started: float, overloaded: bool = False) -> None:
+        """
+        Free a slot and adjust the limit.
+
+        Args:
+            started (float): Value returned by `acquire`.
+            overloaded (bool): The request failed with a sign of upstream overload.
+        """
+        latency = time.perf_counter() - started
+        with self._condition:
+            saturated = self.in_flight >= int(self._limit)
+            self.in_flight -= 1
+            self.samples += 1
+            if overloaded:
+                self.overloads += 1
+                self._decrease(started)
+            elif started >= self._last_decrease:
+                # Requests started before the last cut describe the old limit.
+                baseline = self._observe(latency)
+                if self._smoothed > baseline * self.latency_tolerance:
+                    self._decrease(started)
+                elif saturated:
+                    # Grow only while the limit is actually in use.
+                    self._limit = min(self._limit + 1 / self._limit, float(self.max_limit))
+                    self.max_seen = max(self.max_seen, int(self._limit))
+            self._condition.notify_all()
+
+    def bind(self, function):
+        """Wrap `function` so the requests it sends are gated by this limiter."""
+
+        def limited(*args, **kwargs):
+            token = _active.set(self)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _active.reset(token)
+
+        return limited
+
+    def map_unordered(self, function, items, max_workers: int = None):
+        """
+        Call `function(item)` for every item on worker threads, gated by this limiter.
+
+        Args:
+            function (callable): Called once per item; should return an outcome rather
+                than raise.
+            items (iterable): Arguments of the calls.
+            max_workers (int, optional): Upper bound on concurrent calls; defaults to
+                `max_limit`.
+
+        Yields:
+            The results of the calls, in completion order.
+        """
+        items = list(items)
+        if not items:
+            return
+        workers = min(max_workers or self.max_limit, len(items))
+        limited = self.bind(function)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in as_completed([executor.submit(limited, item) for item in items]):
+                yield future.result()
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Current `limit`, `in_flight` requests, highest limit reached
+            (`max_seen`), completed `samples`, `overloads` reported, limit `decreases`,
+            and the smoothed and lowest recent latency in seconds.
+        """
+        with self._condition:
+            return {
+                "limit": int(self._limit),
+                "in_flight": self.in_flight,
+                "max_seen": self.max_seen,
+                "samples": self.samples,
+                "overloads": self.overloads,
+                "decreases": self.decreases,
+                "latency": self._smoothed,
+                "min_latency": self._baseline(),
+            }
+
+    def _observe(self, latency: float) -> float:
+        self._smoothed = latency if self._smoothed is None else self._smoothed + self.smoothing * (latency - self._smoothed)
+        if self._window_min is None or latency < self._window_min:
+            self._window_min = latency
+        self._window_samples += 1
+        if self._window_samples >= self.window:
+            self._previous_min, self._window_min, self._window_samples = self._window_min, None, 0
+        return self._baseline()
+
+    def _baseline(self):
+        candidates = [value for value in (self._window_min, self._previous_min) if value is not None]
+        return min(candidates) if candidates else None
+
+    def _decrease(self, started: float) -> None:
+        if started < self._last_decrease:
+            return
+        self._limit = max(self._limit * self.backoff, float(self.min_limit))
+        self._last_decrease = time.perf_counter()
+        self._smoothed = None
+        self.decreases += 1
+
+    def _after_fork(self) -> None:
+        # Requests in flight belong to the parent's threads.
+        self._condition = threading.Condition()
+        self.in_flight = 0
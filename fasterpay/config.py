@@ -1,20 +1,49 @@
 class Config:
+    """
+    Immutable gateway settings.
+
+    Resources cached by the gateway share one Config, so it cannot be modified once
+    created; build a new Gateway to use different keys or environments. `api_url` and
+    `external_api_url` override the FasterPay hosts, e.g. to point at a local stand-in.
+    """
+
+    __slots__ = (
+        "_private_key",
+        "_public_key",
+        "_api_base_url",
+        "_api_version",
+        "_external_api_url",
+    )
+
     def __init__(
         self,
         private_key: str,
         public_key: str,
         is_test: bool = False,
         api_version: str = "1.0.0",
+        api_url: str = None,
+        external_api_url: str = None,
     ):
-        self._private_key = private_key
-        self._public_key = public_key
-        self._api_base_url = (
-            "https://pay.sandbox.fasterpay.com"
-            if is_test else
-            "https://pay.fasterpay.com"
+        set_field = object.__setattr__
+        set_field(self, "_private_key", private_key)
+        set_field(self, "_public_key", public_key)
+        set_field(
+            self,
+            "_api_base_url",
+            api_url or (
+                "https://pay.sandbox.fasterpay.com"
+                if is_test else
+                "https://pay.fasterpay.com"
+            ),
         )
-        self._api_version = api_version
-        self._external_api_url = "https://business.fasterpay.com"
+        set_field(self, "_api_version", api_version)
+        set_field(self, "_external_api_url", external_api_url or "https://business.fasterpay.com")
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Config is immutable.")
+
+    def __delattr__(self, name):
+        raise AttributeError("Config is immutable.")
 
     @property
     def public_key(self) -> str:
@@ -31,7 +60,7 @@ class Config:
     @property
     def api_version(self) -> str:
         return self._api_version
-    
+
     @property
     def external_api_url(self) -> str:
         return self._external_api_url
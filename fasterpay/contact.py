@@ -1,6 +1,6 @@
-import requests
-
 class Contact:
+    __slots__ = ("gateway", "api_url", "api_key")
+
     def __init__(self, gateway):
         self.gateway = gateway
         self.api_url = gateway.config.external_api_url
@@ -39,9 +39,37 @@ class Contact:
             raise ValueError("'phone_country_code' is required when 'phone' is provided.")
 
         url = f"{self.api_url}/api/external/contacts"
-        response = requests.post(url, json=params)
+        response = self.gateway.transport.request("POST", url, json=params)
         response.raise_for_status()
-        return response.json()
+        result = self.gateway.transport.decode(response)
+        self._sync_mirror(result)
+        return result
+
+    def create_contacts(self, contacts: list, max_workers: int = None):
+        """
+        Create many contacts concurrently.
+
+        Concurrency follows the transport's adaptive limiter, which raises it while
+        FasterPay answers quickly and cuts it on 429s, 5xx responses and rising latency.
+
+        Parameters:
+            - contacts (list): `create_contact` params, one dict per contact.
+            - max_workers (int, optional): Upper bound on concurrent requests.
+
+        Yields:
+            dict: Per-contact outcome, in completion order, with keys `index` (position
+                in `contacts`), `contact` (API response) and `error` (None on success).
+        """
+        def create(indexed):
+            index, params = indexed
+            outcome = {"index": index, "contact": None, "error": None}
+            try:
+                outcome["contact"] = self.create_contact(params)
+            except Exception as error:
+                outcome["error"] = error
+            return outcome
+
+        return self.gateway.transport.limiter.map_unordered(create, enumerate(contacts), max_workers)
 
     def list_contacts(self, params: dict = None) -> dict:
         """
@@ -76,9 +104,9 @@ class Contact:
             raise ValueError("'sort_by' is required when 'order_by' is provided.")
 
         url = f"{self.api_url}/api/external/contacts"
-        response = requests.get(url, params=params)
+        response = self.gateway.transport.request("GET", url, params=params)
         response.raise_for_status()
-        return response.json()
+        return self.gateway.transport.decode(response, listing=True)
 
     def get_contact(self, contact_id: str) -> dict:
         """
@@ -97,9 +125,9 @@ class Contact:
             raise ValueError("contact_id is required to retrieve a contact.")
 
         url = f"{self.api_url}/api/external/contacts/{contact_id}"
-        response = requests.get(url)
+        response = self.gateway.transport.request("GET", url)
         response.raise_for_status()
-        return response.json()
+        return self.gateway.transport.decode(response)
 
     def update_contact(self, contact_id: str, params: dict) -> dict:
         """
@@ -126,9 +154,11 @@ class Contact:
             raise ValueError("contact_id is required to update a contact.")
 
         url = f"{self.api_url}/api/external/contacts/{contact_id}"
-        response = requests.put(url, json=params)
+        response = self.gateway.transport.request("PUT", url, json=params)
         response.raise_for_status()
-        return response.json()
+        result = self.gateway.transport.decode(response)
+        self._sync_mirror(result)
+        return result
 
     def delete_contact(self, contact_id: str) -> dict:
         """
@@ -147,6 +177,16 @@ class Contact:
             raise ValueError("contact_id is required to delete a contact.")
 
         url = f"{self.api_url}/api/external/contacts/{contact_id}"
-        response = requests.delete(url)
+        response = self.gateway.transport.request("DELETE", url)
         response.raise_for_status()
-        return response.json()
+        mirror = getattr(self.gateway, "_contact_mirror", None)
+        if mirror is not None:
+            mirror.remove(contact_id)
+        return self.gateway.transport.decode(response)
+
+    def _sync_mirror(self, result: dict) -> None:
+        """Keep the gateway's contact mirror, if one is in use, up to date with SDK mutations."""
+        mirror = getattr(self.gateway, "_contact_mirror", None)
+        contact = result.get("data") if isinstance(result, dict) else None
+        if mirror is not None and isinstance(contact, dict):
+            mirror.upsert(contact)
@@ -0,0 +1,260 @@
+import bisect
+import threading
+
+from fasterpay import forksafety
+from fasterpay.pagination import iter_records
+
+
+class ContactMirror:
+    """
+    In-memory mirror of the merchant's contacts, indexed for fast local lookups.
+
+    Emails and phone numbers are kept in hash indexes, emails and names in sorted
+    prefix indexes. `list_contacts` accepts the same filters as `Contact.list_contacts`
+    and answers from the mirror, falling back to the server when nothing matches.
+    """
+
+    def __init__(self, gateway):
+        self.gateway = gateway
+        self._lock = threading.RLock()
+        self._by_id = {}
+        self._by_email = {}
+        self._by_phone = {}
+        self._email_index = []
+        self._name_index = []
+        self._dirty = False
+        self._watermark = None
+        forksafety.register(self)
+
+    @property
+    def watermark(self):
+        """Most recent `updated_at` value seen by the mirror."""
+        return self._watermark
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def refresh(self, full: bool = False) -> int:
+        """
+        Pull new and changed contacts from the API.
+
+        Contacts are requested sorted by `updated_at` descending, so an incremental
+        refresh stops at the first page that only holds contacts older than the
+        current watermark. A full refresh rebuilds the mirror, which also drops
+        contacts deleted outside the SDK.
+
+        Args:
+            full (bool): Discard the mirror and reload every contact.
+
+        Returns:
+            int: Number of contacts loaded or updated.
+        """
+        params = {"sort_by": "updated_at", "order_by": "desc"}
+        watermark = None if full else self._watermark
+        fetched = []
+
+        for record in iter_records(self.gateway.contact().list_contacts, params):
+            if watermark is not None and (record.get("updated_at") or "") < watermark:
+                break
+            fetched.append(record)
+
+        with self._lock:
+            if full:
+                self._by_id.clear()
+                self._by_email.clear()
+                self._by_phone.clear()
+                self._email_index = []
+                self._name_index = []
+                self._dirty = True
+                self._watermark = None
+            for record in fetched:
+                self._ingest(record)
+        return len(fetched)
+
+    def get_contact(self, contact_id: str):
+        """Return a mirrored contact by ID, or None if it is not mirrored."""
+        return self._by_id.get(contact_id)
+
+    def find_by_email(self, email: str):
+        """
+        Return the contact with exactly this email address, or None.
+
+        When several contacts share the address, the most recently updated one is
+        returned; `list_contacts({"email": email})` returns all of them.
+        """
+        contacts = [self._by_id[contact_id] for contact_id in self._by_email.get(_normalize_email(email), ())]
+        if not contacts:
+            return None
+        return max(contacts, key=lambda contact: (contact.get("updated_at") or "", str(contact.get("id"))))
+
+    def find_by_phone(self, phone: str) -> list:
+        """Return all contacts registered with this phone number."""
+        ids = self._by_phone.get(_normalize_phone(phone), ())
+        return [self._by_id[contact_id] for contact_id in ids]
+
+    def list_contacts(self, params: dict = None) -> dict:
+        """
+        List contacts using the same filters as `Contact.list_contacts`.
+
+        Filters on `name`, `email`, `phone` and `country` are answered from the
+        mirror. Queries using other filters, or that match no mirrored contact,
+        go to the server and their results are added to the mirror.
+
+        Returns:
+            dict: Paginated list of contacts, shaped like the API response.
+        """
+        params = params or {}
+
+        if "sort_by" in params and "order_by" not in params:
+            raise ValueError("'order_by' is required when 'sort_by' is provided.")
+        if "order_by" in params and "sort_by" not in params:
+            raise ValueError("'sort_by' is required when 'order_by' is provided.")
+
+        if params.get("fasterpay_account_only"):
+            return self._list_remote(params)
+
+        with self._lock:
+            matches = self._match(params)
+        if not matches:
+            return self._list_remote(params)
+
+        if params.get("sort_by"):
+            reverse = params["order_by"] == "desc"
+            key = params["sort_by"]
+            matches.sort(key=lambda c: (c.get(key) is None, c.get(key) or ""), reverse=reverse)
+        if params.get("prefer_favorite"):
+            matches.sort(key=lambda c: not c.get("favorite"))
+
+        page = int(params.get("page", 1))
+        per_page = int(params.get("per_page", 15))
+        start = (page - 1) * per_page
+
+        return {
+            "success": True,
+            "data": {
+                "data": matches[start:start + per_page],
+                "current_page": page,
+                "per_page": per_page,
+                "total": len(matches),
+            },
+        }
+
+    def upsert(self, contact: dict) -> None:
+        """Add or replace a single contact in the mirror."""
+        with self._lock:
+            self._ingest(contact)
+
+    def remove(self, contact_id: str) -> None:
+        """Drop a contact from the mirror."""
+        with self._lock:
+            self._discard(contact_id)
+
+    def _after_fork(self) -> None:
+        self._lock = threading.RLock()
+
+    def _list_remote(self, params: dict) -> dict:
+        response = self.gateway.contact().list_contacts(params)
+        data = response.get("data", {}) if isinstance(response, dict) else {}
+        records = data.get("data", []) if isinstance(data, dict) else data
+        with self._lock:
+            for record in records or []:
+                self._ingest(record)
+        return response
+
+    def _match(self, params: dict) -> list:
+        if self._dirty:
+            self._rebuild_sorted()
+        candidates = None
+
+        if params.get("phone"):
+            candidates = set(self._by_phone.get(_normalize_phone(params["phone"]), ()))
+
+        if params.get("email"):
+            found = set(self._prefix_ids(self._email_index, _normalize_email(params["email"])))
+            candidates = found if candidates is None else candidates & found
+
+        if params.get("name"):
+            found = set(self._prefix_ids(self._name_index, params["name"].strip().lower()))
+            candidates = found if candidates is None else candidates & found
+
+        if candidates is None:
+            candidates = self._by_id.keys()
+
+        country = (params.get("country") or "").upper()
+        return [
+            self._by_id[contact_id] for contact_id in candidates
+            if not country or (self._by_id[contact_id].get("country") or "").upper() == country
+        ]
+
+    def _prefix_ids(self, index: list, prefix: str):
+        for position in range(bisect.bisect_left(index, (prefix, "")), len(index)):
+            key, contact_id = index[position]
+            if not key.startswith(prefix):
+                break
+            yield contact_id
+
+    def _rebuild_sorted(self) -> None:
+        emails = []
+        names = []
+        for contact_id, contact in self._by_id.items():
+            email = _normalize_email(contact.get("email"))
+            if email:
+                emails.append((email, contact_id))
+            for name in _name_keys(contact):
+                names.append((name, contact_id))
+        emails.sort()
+        names.sort()
+        self._email_index = emails
+        self._name_index = names
+        self._dirty = False
+
+    def _ingest(self, contact: dict) -> None:
+        contact_id = contact.get("id")
+        if not contact_id:
+            return
+        self._discard(contact_id)
+        self._by_id[contact_id] = contact
+
+        email = _normalize_email(contact.get("email"))
+        if email:
+            self._by_email.setdefault(email, set()).add(contact_id)
+        phone = _normalize_phone(contact.get("phone"))
+        if phone:
+            self._by_phone.setdefault(phone, set()).add(contact_id)
+
+        updated_at = contact.get("updated_at")
+        if updated_at and (self._watermark is None or updated_at > self._watermark):
+            self._watermark = updated_at
+        self._dirty = True
+
+    def _discard(self, contact_id: str) -> None:
+        contact = self._by_id.pop(contact_id, None)
+        if contact is None:
+            return
+
+        _unindex(self._by_email, _normalize_email(contact.get("email")), contact_id)
+        _unindex(self._by_phone, _normalize_phone(contact.get("phone")), contact_id)
+        self._dirty = True
+
+
+def _unindex(index: dict, key: str, contact_id: str) -> None:
+    ids = index.get(key)
+    if ids:
+        ids.discard(contact_id)
+        if not ids:
+            del index[key]
+
+
+def _normalize_email(email) -> str:
+    return (email or "").strip().lower()
+
+
+def _normalize_phone(phone) -> str:
+    return "".join(ch for ch in str(phone or "") if ch.isdigit())
+
+
+def _name_keys(contact: dict) -> list:
+    first = (contact.get("first_name") or "").strip().lower()
+    last = (contact.get("last_name") or "").strip().lower()
+    full = f"{first} {last}".strip()
+    return [name for name in {first, last, full} if name]
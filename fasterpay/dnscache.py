@@ -0,0 +1,107 @@
+import ipaddress
+import socket
+import threading
+import time
+
+from fasterpay import forksafety
+
+
+class DNSCache:
+    """
+    Host name resolutions kept for `ttl` seconds.
+
+    Python resolves a host for every new connection, and unlike a browser nothing
+    caches the answer in process. Used by the transport's connection pools, so opening
+    connections to the FasterPay hosts skips the resolver while an answer is fresh.
+    Concurrent lookups of a host wait for one resolution rather than each querying the
+    resolver. A host whose addresses all fail to connect is forgotten and resolved again.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 256):
+        """
+        Args:
+            ttl (float): Seconds an answer is reused.
+            max_entries (int): Hosts kept; the cache is cleared when it is exceeded.
+        """
+        if ttl <= 0 or max_entries < 1:
+            raise ValueError("ttl must be positive and max_entries at least 1.")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._lookups = {}
+        self.hits = 0
+        self.misses = 0
+        forksafety.register(self)
+
+    def resolve(self, host: str, port: int) -> list:
+        """
+        Return the IP addresses of a host, from the cache when fresh.
+
+        Raises:
+            socket.gaierror: The host cannot be resolved.
+        """
+        key = (host, port)
+        with self._lock:
+            addresses = self._fresh(key)
+            if addresses is not None:
+                return addresses
+            lookup = self._lookups.setdefault(key, threading.Lock())
+
+        # One lookup per host at a time; callers queued behind it get its answer.
+        with lookup:
+            with self._lock:
+                addresses = self._fresh(key)
+                if addresses is not None:
+                    return addresses
+            try:
+                answers = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+            except OSError:
+                with self._lock:
+                    self._lookups.pop(key, None)
+                raise
+            addresses = list(dict.fromkeys(sockaddr[0] for _, _, _, _, sockaddr in answers))
+            with self._lock:
+                self.misses += 1
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+                self._entries[key] = (time.monotonic() + self.ttl, addresses)
+                self._lookups.pop(key, None)
+        return addresses
+
+    def invalidate(self, host: str = None) -> None:
+        """Forget one host, or every host."""
+        with self._lock:
+            if host is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == host]:
+                    del self._entries[key]
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: `hits`, `misses` (lookups sent to the resolver) and cached `entries`.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def _fresh(self, key: tuple):
+        """Return the cached addresses of a key while fresh, counting a hit; call with the lock held."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+        return None
+
+    def _after_fork(self) -> None:
+        self._lock = threading.Lock()
+        self._lookups = {}
+
+
+def is_ip_address(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
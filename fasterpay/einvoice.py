@@ -1,14 +1,38 @@
-import requests
-import json
+import os
+
+from fasterpay.invoicebatch import InvoiceBatch
+from fasterpay.invoicecatalog import InvoiceCatalog
+from fasterpay.invoicetotals import InvoiceTotals
 
 
 class Einvoice:
+    __slots__ = ("gateway", "api_url", "api_key")
+
     def __init__(self, gateway):
         self.gateway = gateway
         self.api_url = gateway.config.external_api_url
         self.api_key = gateway.config.private_key
 
-    def create_invoice(self, params: dict) -> dict:
+    def catalog(self) -> InvoiceCatalog:
+        """
+        Return the gateway's reference-data catalog of products, taxes and discounts.
+
+        The catalog loads each collection once and then resolves SKUs and names
+        locally, see `fasterpay.invoicecatalog.InvoiceCatalog`.
+        """
+        return self.gateway.invoice_catalog()
+
+    def totals(self) -> InvoiceTotals:
+        """
+        Return a calculator of invoice totals, tax and discount amounts.
+
+        Totals are computed locally from the catalog's prices, taxes and discounts, so
+        they can be shown or checked before `create_invoice` without a round trip, see
+        `fasterpay.invoicetotals.InvoiceTotals`. Reuse the returned instance for a batch.
+        """
+        return InvoiceTotals(self.catalog())
+
+    def create_invoice(self, params: dict, idempotency_key: str = None) -> dict:
         """
         Create a new E-Invoice.
 
@@ -17,6 +41,12 @@ class Einvoice:
         Docs:
             https://docs.fasterpay.com/api#section-create-invoice
 
+        Args:
+            params (dict): Invoice data.
+            idempotency_key (str, optional): Key used to retry this call when connecting
+                fails and to deduplicate it in the journal. Without one the call is sent
+                once and not retried.
+
         Returns:
             dict: API response containing invoice data.
         """
@@ -53,16 +83,20 @@ class Einvoice:
             # Send as multipart/form-data
             headers.pop("Content-Type", None)
             form_data = {
-                "json": json.dumps(params)
+                "json": self.gateway.json_codec.dumps(params)
             }
-            response = requests.post(url, headers=headers, data=form_data, files=files)
+            response = self.gateway.transport.request(
+                "POST", url, headers=headers, data=form_data, files=files, idempotency_key=idempotency_key
+            )
         else:
             # Send as JSON
             headers["Content-Type"] = "application/json"
-            response = requests.post(url, headers=headers, json=params)
+            response = self.gateway.transport.request(
+                "POST", url, headers=headers, json=params, idempotency_key=idempotency_key
+            )
 
         response.raise_for_status()
-        return response.json()
+        return self.gateway.transport.decode(response)
 
     def list_invoices(self, params: dict = None) -> dict:
         """
@@ -76,9 +110,9 @@ class Einvoice:
             "X-ApiKey": self.api_key,
             "Content-Type": "application/json"
         }
-        response = requests.get(url, params=params or {}, headers=headers)
+        response = self.gateway.transport.request("GET", url, params=params or {}, headers=headers)
         response.raise_for_status()
-        return response.json()
+        return self.gateway.transport.decode(response, listing=True)
 
     def get_invoice(self, invoice_id: str, params: dict = None) -> dict:
         """
@@ -95,9 +129,9 @@ class Einvoice:
             "X-ApiKey": self.api_key,
             "Content-Type": "application/json"
         }
-        response = requests.get(url, params=params or {}, headers=headers)
+        response = self.gateway.transport.request("GET", url, params=params or {}, headers=headers)
         response.raise_for_status()
-        return response.json()
+        return self.gateway.transport.decode(response)
     
     def update_invoice(self, invoice_id: str, params: dict) -> dict:
         """
@@ -143,16 +177,16 @@ class Einvoice:
         if files:
             # multipart/form-data (use POST method)
             form_data = {
-                "json": json.dumps(params)
+                "json": self.gateway.json_codec.dumps(params)
             }
-            response = requests.post(url, headers=headers, data=form_data, files=files)
+            response = self.gateway.transport.request("POST", url, headers=headers, data=form_data, files=files)
         else:
             # Standard PUT request
             headers["Content-Type"] = "application/json"
-            response = requests.put(url, headers=headers, json=params)
+            response = self.gateway.transport.request("PUT", url, headers=headers, json=params)
 
         response.raise_for_status()
-        return response.json()
+        return self.gateway.transport.decode(response)
     
     def update_invoice_status(self, invoice_id: str, status: str) -> dict:
         """
@@ -184,9 +218,9 @@ class Einvoice:
         }
 
         payload = {"status": status}
-        response = requests.put(url, headers=headers, json=payload)
+        response = self.gateway.transport.request("PUT", url, headers=headers, json=payload)
         response.raise_for_status()
-        return response.json()
+        return self.gateway.transport.decode(response)
     
     def preview_invoice_pdf(self, invoice_id: str) -> str:
         """
@@ -207,9 +241,86 @@ class Einvoice:
         url = f"{self.api_url}/api/external/invoices/{invoice_id}/pdf"
         headers = {"X-ApiKey": self.api_key}
 
-        response = requests.get(url, headers=headers)
+        response = self.gateway.transport.request("GET", url, headers=headers)
         response.raise_for_status()
         return response.text  # Returns HTML content 
+
+    def download_invoice_pdf(self, invoice_id: str, destination, chunk_size: int = 64 * 1024) -> int:
+        """
+        Stream the invoice preview to a file without buffering or decoding it in memory.
+
+        Args:
+            invoice_id (str): The ID of the invoice to download.
+            destination (str, os.PathLike or file-like): Path to write to, or a binary
+                file-like object with a `write` method. Paths are written atomically.
+            chunk_size (int): Number of bytes read from the network per write.
+
+        Returns:
+            int: Number of bytes written.
+        """
+        if not invoice_id:
+            raise ValueError("invoice_id is required.")
+
+        url = f"{self.api_url}/api/external/invoices/{invoice_id}/pdf"
+        headers = {"X-ApiKey": self.api_key}
+
+        with self.gateway.transport.request("GET", url, headers=headers, stream=True) as response:
+            response.raise_for_status()
+            chunks = response.iter_content(chunk_size=chunk_size)
+
+            if not isinstance(destination, (str, os.PathLike)):
+                return _write_chunks(chunks, destination)
+
+            partial = f"{os.fspath(destination)}.part"
+            try:
+                with open(partial, "wb") as fileobj:
+                    written = _write_chunks(chunks, fileobj)
+                os.replace(partial, destination)
+            except BaseException:
+                if os.path.exists(partial):
+                    os.remove(partial)
+                raise
+            return written
+
+    def download_invoice_pdfs(
+        self,
+        invoice_ids: list,
+        directory: str,
+        filename: str = "{invoice_id}.html",
+        max_workers: int = 8,
+        chunk_size: int = 64 * 1024,
+    ):
+        """
+        Download the previews of many invoices concurrently into a directory.
+
+        Each worker streams one invoice at a time, so memory use stays at one chunk per worker.
+        Requests follow the transport's adaptive limiter, see
+        `fasterpay.concurrencylimit.AdaptiveLimiter`, but it only gates them until the
+        response headers arrive: `max_workers` bounds the bodies downloaded at once.
+
+        Args:
+            invoice_ids (list): IDs of the invoices to download.
+            directory (str): Target directory, created if missing.
+            filename (str): File name template, formatted with `invoice_id`.
+            max_workers (int): Upper bound on concurrent downloads.
+            chunk_size (int): Number of bytes read from the network per write.
+
+        Yields:
+            dict: Per-invoice outcome, in completion order, with keys
+                `invoice_id`, `path`, `bytes` and `error` (None on success).
+        """
+        os.makedirs(directory, exist_ok=True)
+
+        def download(invoice_id):
+            path = os.path.join(directory, filename.format(invoice_id=invoice_id))
+            outcome = {"invoice_id": invoice_id, "path": path, "bytes": 0, "error": None}
+            try:
+                outcome["bytes"] = self.download_invoice_pdf(invoice_id, path, chunk_size=chunk_size)
+            except Exception as error:
+                outcome["error"] = error
+            return outcome
+
+        yield from self.gateway.transport.limiter.map_unordered(download, invoice_ids, max_workers)
     
 
     def send_invoice(self, invoice_id: str, test: bool = False) -> dict:
@@ -236,10 +347,29 @@ class Einvoice:
 
         data = {"test": test} if test else {}
 
-        response = requests.post(url, json=data, headers=headers)
+        response = self.gateway.transport.request("POST", url, json=data, headers=headers)
         response.raise_for_status()
-        return response.json()
+        return self.gateway.transport.decode(response)
     
+    def create_invoices(self, specs: list, send: bool = False, test: bool = False, max_workers: int = None):
+        """
+        Create a batch of E-Invoices concurrently, creating shared contacts, products,
+        taxes and discounts only once.
+
+        See `fasterpay.invoicebatch.InvoiceBatch` for the spec format.
+
+        Args:
+            specs (list): Invoice specs.
+            send (bool): If True, send each invoice after it has been created.
+            test (bool): Send test invoices to the merchant email instead.
+            max_workers (int, optional): Upper bound on concurrent API calls; the
+                transport's adaptive limiter sets the actual concurrency.
+
+        Returns:
+            generator: Per-invoice outcome dicts, yielded as each invoice completes.
+        """
+        return InvoiceBatch(self.gateway, max_workers=max_workers).run(specs, send=send, test=test)
+
     def create_invoice_template(self, template: dict) -> dict:
         """
         Create a new invoice template.
@@ -281,16 +411,16 @@ class Einvoice:
             # Multipart form-data required
             headers.pop("Content-Type", None)
             form_data = {
-                "json": json.dumps(template)
+                "json": self.gateway.json_codec.dumps(template)
             }
-            response = requests.post(url, headers=headers, data=form_data, files=files)
+            response = self.gateway.transport.request("POST", url, headers=headers, data=form_data, files=files)
         else:
             # Pure JSON
             headers["Content-Type"] = "application/json"
-            response = requests.post(url, headers=headers, json=template)
+            response = self.gateway.transport.request("POST", url, headers=headers, json=template)
 
         response.raise_for_status()
-        return response.json()
+        return self.gateway.transport.decode(response)
     
     def list_invoice_templates(self, params: dict = None) -> dict:
         """
@@ -309,9 +439,9 @@ class Einvoice:
         url = f"{self.api_url}/api/external/invoices/templates"
         headers = {"X-ApiKey": self.api_key}
 
-        response = requests.get(url, headers=headers, params=params or {})
+        response = self.gateway.transport.request("GET", url, headers=headers, params=params or {})
         response.raise_for_status()
-        return response.json()
+        return self.gateway.transport.decode(response, listing=True)
     
     def get_invoice_template(self, template_id: str) -> dict:
         """
@@ -329,9 +459,9 @@ class Einvoice:
         url = f"{self.api_url}/api/external/invoices/templates/{template_id}"
         headers = {"X-ApiKey": self.api_key}
 
-        response = requests.get(url, headers=headers)
+        response = self.gateway.transport.request("GET", url, headers=headers)
         response.raise_for_status()
-        return response.json()
+        return self.gateway.transport.decode(response)
 
     def update_invoice_template(self, template_id: str, params: dict) -> dict:
         """
@@ -372,14 +502,14 @@ class Einvoice:
                 files["logo"] = logo
                 params["logo"] = None
 
-            form_data = {"json": json.dumps(params)}
-            response = requests.post(url, headers=headers, data=form_data, files=files)
+            form_data = {"json": self.gateway.json_codec.dumps(params)}
+            response = self.gateway.transport.request("POST", url, headers=headers, data=form_data, files=files)
         else:
             headers["Content-Type"] = "application/json"
-            response = requests.put(url, headers=headers, json=params)
+            response = self.gateway.transport.request("PUT", url, headers=headers, json=params)
 
         response.raise_for_status()
-        return response.json()
+        return self.gateway.transport.decode(response)
     
     def delete_invoice_template(self, template_id: str) -> dict:
         """
@@ -397,9 +527,9 @@ class Einvoice:
         url = f"{self.api_url}/api/external/invoices/templates/{template_id}"
         headers = {"X-ApiKey": self.api_key}
 
-        response = requests.delete(url, headers=headers)
+        response = self.gateway.transport.request("DELETE", url, headers=headers)
         response.raise_for_status()
-        return response.json() 
+        return self.gateway.transport.decode(response) 
     
     def create_invoice_product(self, params: dict) -> dict:
         """
@@ -428,14 +558,14 @@ class Einvoice:
         if use_multipart:
             files = {"image": image}
             params["image"] = None  # Remove file reference from params
-            form_data = {"json": json.dumps(params)}
-            response = requests.post(url, headers=headers, data=form_data, files=files)
+            form_data = {"json": self.gateway.json_codec.dumps(params)}
+            response = self.gateway.transport.request("POST", url, headers=headers, data=form_data, files=files)
         else:
             headers["Content-Type"] = "application/json"
-            response = requests.post(url, headers=headers, json=params)
+            response = self.gateway.transport.request("POST", url, headers=headers, json=params)
 
         response.raise_for_status()
-        return response.json()
+        return self._sync_catalog("products", self.gateway.transport.decode(response))
     
     def list_invoice_products(self, params: dict = None) -> dict:
         """
@@ -460,9 +590,9 @@ class Einvoice:
             dict: API response with product list and metadata.
         """
         url = f"{self.api_url}/api/external/invoices/products"
-        response = requests.get(url, headers={"X-ApiKey": self.api_key}, params=params or {})
+        response = self.gateway.transport.request("GET", url, headers={"X-ApiKey": self.api_key}, params=params or {})
         response.raise_for_status()
-        return response.json()
+        return self.gateway.transport.decode(response, listing=True)
     
     def get_invoice_product(self, product_id: str) -> dict:
         """
@@ -480,9 +610,9 @@ class Einvoice:
         url = f"{self.api_url}/api/external/invoices/products/{product_id}"
         headers = {"X-ApiKey": self.api_key}
 
-        response = requests.get(url, headers=headers)
+        response = self.gateway.transport.request("GET", url, headers=headers)
         response.raise_for_status()
-        return response.json()
+        return self.gateway.transport.decode(response)
     
     def update_invoice_product(self, product_id: str, data: dict, files: dict = None) -> dict:
         """
@@ -510,12 +640,12 @@ class Einvoice:
 
         if files:
             data["_method"] = "PUT"
-            response = requests.post(url, data=data, files=files, headers=headers)
+            response = self.gateway.transport.request("POST", url, data=data, files=files, headers=headers)
         else:
-            response = requests.put(url, json=data, headers=headers)
+            response = self.gateway.transport.request("PUT", url, json=data, headers=headers)
 
         response.raise_for_status()
-        return response.json()
+        return self._sync_catalog("products", self.gateway.transport.decode(response))
     
     def delete_invoice_product(self, product_id: str) -> dict:
         """
@@ -533,9 +663,12 @@ class Einvoice:
         url = f"{self.api_url}/api/external/invoices/products/{product_id}"
         headers = {"X-ApiKey": self.api_key}
 
-        response = requests.delete(url, headers=headers)
+        response = self.gateway.transport.request("DELETE", url, headers=headers)
         response.raise_for_status()
-        return response.json()
+        catalog = getattr(self.gateway, "_invoice_catalog", None)
+        if catalog is not None:
+            catalog.remove("products", product_id)
+        return self.gateway.transport.decode(response)
 
     def delete_invoice_product_price(self, product_id: str, currency: str) -> dict:
         """
@@ -554,9 +687,12 @@ class Einvoice:
         url = f"{self.api_url}/api/external/invoices/products/{product_id}/prices/{currency}"
         headers = {"X-ApiKey": self.api_key}
 
-        response = requests.delete(url, headers=headers)
+        response = self.gateway.transport.request("DELETE", url, headers=headers)
         response.raise_for_status()
-        return response.json()
+        catalog = getattr(self.gateway, "_invoice_catalog", None)
+        if catalog is not None:
+            catalog.remove_price(product_id, currency)
+        return self.gateway.transport.decode(response)
     
     def create_invoice_tax(self, data: dict) -> dict:
         """
@@ -574,9 +710,9 @@ class Einvoice:
         """
         url = f"{self.api_url}/api/external/invoices/taxes"
         headers = {"X-ApiKey": self.api_key}
-        response = requests.post(url, json=data, headers=headers)
+        response = self.gateway.transport.request("POST", url, json=data, headers=headers)
         response.raise_for_status()
-        return response.json()
+        return self._sync_catalog("taxes", self.gateway.transport.decode(response))
     
     def list_invoice_taxes(self, params: dict = None) -> dict:
         """
@@ -595,9 +731,9 @@ class Einvoice:
         """
         url = f"{self.api_url}/api/external/invoices/taxes"
         headers = {"X-ApiKey": self.api_key}
-        response = requests.get(url, headers=headers, params=params)
+        response = self.gateway.transport.request("GET", url, headers=headers, params=params)
         response.raise_for_status()
-        return response.json()
+        return self.gateway.transport.decode(response, listing=True)
     
     def get_invoice_tax(self, tax_id: str) -> dict:
         """
@@ -615,9 +751,9 @@ class Einvoice:
         url = f"{self.api_url}/api/external/invoices/taxes/{tax_id}"
         headers = {"X-ApiKey": self.api_key}
 
-        response = requests.get(url, headers=headers)
+        response = self.gateway.transport.request("GET", url, headers=headers)
         response.raise_for_status()
-        return response.json()
+        return self.gateway.transport.decode(response)
 
     def update_invoice_tax(self, tax_id: str, data: dict) -> dict:
         """
@@ -635,9 +771,9 @@ class Einvoice:
         """
         url = f"{self.api_url}/api/external/invoices/taxes/{tax_id}"
         headers = {"X-ApiKey": self.api_key, "Content-Type": "application/json"}
-        response = requests.put(url, headers=headers, json=data)
+        response = self.gateway.transport.request("PUT", url, headers=headers, json=data)
         response.raise_for_status()
-        return response.json()
+        return self._sync_catalog("taxes", self.gateway.transport.decode(response))
     
     def delete_invoice_tax(self, tax_id: str) -> dict:
         """
@@ -655,9 +791,12 @@ class Einvoice:
         url = f"{self.api_url}/api/external/invoices/taxes/{tax_id}"
         headers = {"X-ApiKey": self.api_key}
 
-        response = requests.delete(url, headers=headers)
+        response = self.gateway.transport.request("DELETE", url, headers=headers)
         response.raise_for_status()
-        return response.json()
+        catalog = getattr(self.gateway, "_invoice_catalog", None)
+        if catalog is not None:
+            catalog.remove("taxes", tax_id)
+        return self.gateway.transport.decode(response)
     
     def create_invoice_discount(self, data: dict) -> dict:
         """
@@ -676,9 +815,9 @@ class Einvoice:
         """
         url = f"{self.api_url}/api/external/invoices/discounts"
         headers = {"X-ApiKey": self.api_key, "Content-Type": "application/json"}
-        response = requests.post(url, headers=headers, json=data)
+        response = self.gateway.transport.request("POST", url, headers=headers, json=data)
         response.raise_for_status()
-        return response.json()
+        return self._sync_catalog("discounts", self.gateway.transport.decode(response))
     
     def list_invoice_discounts(self, params: dict = None) -> dict:
         """
@@ -698,9 +837,9 @@ class Einvoice:
         """
         url = f"{self.api_url}/api/external/invoices/discounts"
         headers = {"X-ApiKey": self.api_key}
-        response = requests.get(url, headers=headers, params=params)
+        response = self.gateway.transport.request("GET", url, headers=headers, params=params)
         response.raise_for_status()
-        return response.json()
+        return self.gateway.transport.decode(response, listing=True)
     
     def get_invoice_discount(self, discount_id: str) -> dict:
         """
@@ -718,9 +857,9 @@ class Einvoice:
         url = f"{self.api_url}/api/external/invoices/discounts/{discount_id}"
         headers = {"X-ApiKey": self.api_key}
 
-        response = requests.get(url, headers=headers)
+        response = self.gateway.transport.request("GET", url, headers=headers)
         response.raise_for_status()
-        return response.json()
+        return self.gateway.transport.decode(response)
     
     def update_invoice_discount(self, discount_id: str, data: dict) -> dict:
         """
@@ -740,9 +879,9 @@ class Einvoice:
         """
         url = f"{self.api_url}/api/external/invoices/discounts/{discount_id}"
         headers = {"X-ApiKey": self.api_key, "Content-Type": "application/json"}
-        response = requests.put(url, headers=headers, json=data)
+        response = self.gateway.transport.request("PUT", url, headers=headers, json=data)
         response.raise_for_status()
-        return response.json()
+        return self._sync_catalog("discounts", self.gateway.transport.decode(response))
     
     def delete_invoice_discount(self, discount_id: str) -> dict:
         """
@@ -760,6 +899,26 @@ class Einvoice:
         url = f"{self.api_url}/api/external/invoices/discounts/{discount_id}"
         headers = {"X-ApiKey": self.api_key}
 
-        response = requests.delete(url, headers=headers)
+        response = self.gateway.transport.request("DELETE", url, headers=headers)
         response.raise_for_status()
-        return response.json()
\ No newline at end of file
+        catalog = getattr(self.gateway, "_invoice_catalog", None)
+        if catalog is not None:
+            catalog.remove("discounts", discount_id)
+        return self.gateway.transport.decode(response)
+
+    def _sync_catalog(self, kind: str, result: dict) -> dict:
+        """Apply a product, tax or discount returned by a mutation to the catalog, if one is in use."""
+        catalog = getattr(self.gateway, "_invoice_catalog", None)
+        record = result.get("data") if isinstance(result, dict) else None
+        if catalog is not None and isinstance(record, dict):
+            catalog.upsert(kind, record)
+        return result
+
+
+def _write_chunks(chunks, fileobj) -> int:
+    written = 0
+    for chunk in chunks:
+        if chunk:
+            fileobj.write(chunk)
+            written += len(chunk)
+    return written
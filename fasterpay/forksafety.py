@@ -0,0 +1,32 @@
+import os
+import weakref
+
+# Objects holding per-process state: locks, pooled connections, threads, open files.
+_registered = weakref.WeakSet()
+
+
+def register(instance) -> None:
+    """
+    Have `instance._after_fork()` called in the child process after every `fork()`.
+
+    Pre-forking servers (gunicorn or uWSGI with the application preloaded) fork
+    worker processes from a parent that may already have created gateways. The child
+    inherits their connections, which the parent still uses, and their locks, which
+    may have been held by parent threads that do not exist in the child. Objects
+    owning such state register themselves here and rebuild it in `_after_fork`,
+    leaving immutable state (configuration, signing keys, cached reference data and
+    forms) shared copy-on-write with the parent.
+    """
+    _registered.add(instance)
+
+
+def _after_fork_in_child() -> None:
+    for instance in list(_registered):
+        try:
+            instance._after_fork()
+        except Exception:
+            pass  # One broken object must not keep the others from being reset.
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
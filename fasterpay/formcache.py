@@ -0,0 +1,214 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from fasterpay import forksafety
+from fasterpay.paymentform import hidden_input, render_form
+
+# Payload fields that change with every order or customer; all other fields
+# (amount, currency, recurring_sku_id, ...) are part of the cached plan.
+DYNAMIC_FIELDS = frozenset({
+    "merchant_order_id",
+    "email",
+    "first_name",
+    "last_name",
+    "city",
+    "zip",
+    "phone",
+    "address",
+    "country",
+    "state",
+})
+
+_SLOT = "\0fasterpay-form-fields\0"
+
+
+class FormCache:
+    """
+    Cache of signed checkout forms, for products sold with the same payload over and over.
+
+    Forms whose payloads differ only in `dynamic_fields` (order ID and customer details)
+    share a plan, keyed by the payload's fields and its other values. The plan holds the
+    rendered HTML of the static fields and the hash state of the static fields that sort
+    before the first dynamic one, so rendering a form only signs and escapes the
+    per-order fields. Plans are evicted least recently used first.
+
+    `build_form` returns exactly what `PaymentForm.build_form` returns for the same
+    parameters.
+    """
+
+    def __init__(self, gateway, max_entries: int = 1024, dynamic_fields=DYNAMIC_FIELDS):
+        """
+        Args:
+            gateway (Gateway): Gateway whose keys sign the forms.
+            max_entries (int): Plans kept before the least recently used is evicted.
+            dynamic_fields (iterable): Payload fields that vary per order.
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1.")
+        dynamic_fields = frozenset(dynamic_fields)
+        if dynamic_fields & {"api_key", "hash", "sign_version"}:
+            raise ValueError("api_key, hash and sign_version cannot be dynamic fields.")
+        self.gateway = gateway
+        self.max_entries = max_entries
+        self.dynamic_fields = dynamic_fields
+
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.uncacheable = 0
+        forksafety.register(self)
+
+    def build_form(self, parameters: dict) -> str:
+        """
+        Build a FasterPay Checkout Form, see `PaymentForm.build_form`.
+
+        Like `PaymentForm.build_form`, `api_key` and `hash` are added to the payload.
+        Payloads that already carry a hash, or have unhashable values, are rendered
+        without the cache.
+        """
+        payload = parameters.get("payload", {})
+        if "hash" in payload:
+            return self._uncached(parameters)
+        payload["api_key"] = self.gateway.config.public_key
+
+        dynamic_fields = self.dynamic_fields
+        auto_submit = bool(parameters.get("auto_submit_form"))
+        fingerprint = (
+            auto_submit,
+            tuple(payload),
+            tuple((type(value), value) for key, value in payload.items() if key not in dynamic_fields),
+        )
+        try:
+            with self._lock:
+                plan = self._plans.get(fingerprint)
+                if plan is not None:
+                    self._plans.move_to_end(fingerprint)
+                    self.hits += 1
+        except TypeError:
+            return self._uncached(parameters)
+
+        if plan is None:
+            plan = _FormPlan(self.gateway, payload, dynamic_fields, auto_submit)
+            with self._lock:
+                self.misses += 1
+                self._plans[fingerprint] = plan
+                if len(self._plans) > self.max_entries:
+                    self._plans.popitem(last=False)
+                    self.evictions += 1
+
+        tracers = self.gateway.tracers
+        if tracers:
+            started = time.perf_counter()
+            signature = plan.sign(payload)
+            elapsed = time.perf_counter() - started
+            for tracer in tracers:
+                tracer.on_sign(plan.scheme, elapsed)
+        else:
+            signature = plan.sign(payload)
+        payload["hash"] = signature
+        return plan.render(payload, signature)
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: `hits`, `misses`, `evictions`, `uncacheable` (forms rendered without
+            the cache), `entries` and `hit_rate` (hits over cached lookups).
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "uncacheable": self.uncacheable,
+                "entries": len(self._plans),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self) -> None:
+        """Drop every plan, e.g. after the gateway's keys were rotated."""
+        with self._lock:
+            self._plans.clear()
+
+    def _after_fork(self) -> None:
+        # Plans are immutable and stay shared with the parent process.
+        self._lock = threading.Lock()
+
+    def _uncached(self, parameters: dict) -> str:
+        with self._lock:
+            self.uncacheable += 1
+        return self.gateway.payment_form().build_form(parameters)
+
+
+class _FormPlan:
+    """Precomputed signing state and HTML of the static fields of one payload shape."""
+
+    __slots__ = ("scheme", "_state", "_tail", "_suffix", "_html", "_slots")
+
+    def __init__(self, gateway, payload: dict, dynamic_fields: frozenset, auto_submit: bool):
+        self.scheme = payload.get("sign_version", "v1")
+        items = sorted(payload.items())
+        split = next((index for index, (key, _) in enumerate(items) if key in dynamic_fields), len(items))
+
+        # The hash input is fixed up to the first dynamic field; hash it once and copy
+        # the state for every form. The rest is kept as precomputed pieces, with
+        # dynamic fields as keys to fill in.
+        if self.scheme == "v1":
+            prefix = urlencode(items[:split])
+            self._state = hashlib.sha256(prefix.encode())
+            self._tail = []
+            for index, (key, value) in enumerate(items[split:]):
+                separator = "&" if prefix or index else ""
+                self._tail.append((separator, key) if key in dynamic_fields else separator + urlencode(((key, value),)))
+            self._suffix = gateway.config.private_key
+        else:
+            self._state = gateway.signature()._hmac.copy()
+            self._state.update("".join(f"{key}={value};" for key, value in items[:split]).encode())
+            self._tail = [("", key) if key in dynamic_fields else f"{key}={value};" for key, value in items[split:]]
+            self._suffix = ""
+
+        # HTML: static fields are rendered once; dynamic fields and the hash go in slots.
+        head, foot = render_form(gateway.config.api_url, _SLOT, auto_submit).split(_SLOT)
+        self._html = [head]
+        self._slots = []
+        static = []
+        for key, value in payload.items():
+            if key in dynamic_fields:
+                self._html.append("\n".join(static + [""]) if static else "")
+                static = []
+                self._slots.append((len(self._html), key))
+                self._html.append(None)
+                self._html.append("\n")
+            else:
+                static.append(hidden_input(key, value))
+        static.append("")
+        self._html.append("\n".join(static))
+        self._html.append(None)
+        self._html.append(foot)
+
+    def sign(self, payload: dict) -> str:
+        v1 = self.scheme == "v1"
+        pieces = []
+        for piece in self._tail:
+            if isinstance(piece, str):
+                pieces.append(piece)
+            elif v1:
+                pieces.append(piece[0] + urlencode(((piece[1], payload[piece[1]]),)))
+            else:
+                pieces.append(f"{piece[1]}={payload[piece[1]]};")
+        pieces.append(self._suffix)
+        state = self._state.copy()
+        state.update("".join(pieces).encode())
+        return state.hexdigest()
+
+    def render(self, payload: dict, signature: str) -> str:
+        html = self._html.copy()
+        for index, key in self._slots:
+            html[index] = hidden_input(key, payload[key])
+        html[-2] = hidden_input("hash", signature)
+        return "".join(html)
@@ -1,13 +1,31 @@
+import importlib
+import threading
+from typing import TYPE_CHECKING
+
+from fasterpay import forksafety
 from fasterpay.config import Config
-from fasterpay.signature import Signature
-from fasterpay.pingback import Pingback
-from fasterpay.paymentform import PaymentForm
-from fasterpay.subscription import Subscription
-from fasterpay.transaction import Transaction
-from fasterpay.address import Address
-from fasterpay.contact import Contact
-from fasterpay.payout import Payout
-from fasterpay.einvoice import Einvoice
+
+# Resource modules, and the HTTP stack they pull in, are imported on first use so that
+# signing forms or validating pingbacks does not pay for importing `requests`.
+if TYPE_CHECKING:
+    from fasterpay.address import Address
+    from fasterpay.codec import JsonCodec
+    from fasterpay.contact import Contact
+    from fasterpay.contactmirror import ContactMirror
+    from fasterpay.einvoice import Einvoice
+    from fasterpay.formcache import FormCache
+    from fasterpay.instrumentation import Tracer
+    from fasterpay.invoicecatalog import InvoiceCatalog
+    from fasterpay.paymentform import PaymentForm
+    from fasterpay.payout import Payout
+    from fasterpay.pingback import Pingback
+    from fasterpay.pingbackjournal import PingbackJournal
+    from fasterpay.signature import Signature
+    from fasterpay.subscription import Subscription
+    from fasterpay.transaction import Transaction
+    from fasterpay.transport import Transport
+
+
 class Gateway:
     def __init__(
         self,
@@ -15,41 +33,303 @@ class Gateway:
         private_key: str,
         is_test: bool = False,
         api_version: str = "1.0.0",
+        retries: int = 2,
+        timeout: float = None,
+        idempotency_journal: str = None,
+        transport: "Transport" = None,
+        json_codec: "JsonCodec" = None,
+        api_url: str = None,
+        external_api_url: str = None,
+        coalesce_reads: bool = False,
+        http2: bool = False,
+        compress_threshold: int = None,
+        pingback_journal: str = None,
+        dns_ttl: float = 60.0,
     ):
+        """
+        Args:
+            public_key (str): Your FasterPay public key.
+            private_key (str): Your FasterPay private key.
+            is_test (bool): Use the sandbox environment.
+            api_version (str): API version.
+            retries (int): Retries for idempotent calls, and for idempotency-keyed
+                calls that failed to connect.
+            timeout (float, optional): Default request timeout in seconds.
+            idempotency_journal (str, optional): Path of an append-only journal used to
+                deduplicate refunds, payouts, invoice creations and cancellations
+                across retries and process restarts.
+            transport (Transport, optional): Existing transport to share, e.g. between the
+                gateways of several merchants. Overrides `retries`, `timeout`,
+                `idempotency_journal`, `coalesce_reads`, `http2`, `compress_threshold` and
+                `dns_ttl`.
+            json_codec (JsonCodec, optional): Codec used for request and response bodies,
+                multipart `json` fields and pingbacks. Defaults to the standard library;
+                see `fasterpay.codec.fastest_codec` for a faster optional backend.
+            api_url (str, optional): Overrides the payment API host.
+            external_api_url (str, optional): Overrides the business API host.
+            coalesce_reads (bool): Let concurrent identical GETs, e.g. many threads
+                fetching the same invoice, share one in-flight request. Off by default:
+                it adds to the cost of every GET and only pays off when many callers
+                read the same record at the same time.
+            http2 (bool): Multiplex business API calls (invoices, contacts, payouts)
+                over HTTP/2 connections; requires `httpx[http2]`. Use
+                `transport.use_http2` to switch other hosts. This holds fewer
+                connections but costs more CPU per request than HTTP/1.1, see
+                `fasterpay.http2.HTTP2Adapter`.
+            compress_threshold (int, optional): Gzip request bodies of at least this many
+                bytes, e.g. bulk payouts. Responses are always accepted compressed.
+            pingback_journal (str, optional): Directory of a journal recording the raw
+                body and headers of every validated pingback, see
+                `fasterpay.pingbackjournal.PingbackJournal`.
+            dns_ttl (float, optional): Seconds host name resolutions are reused by new
+                connections; None resolves the host for every connection.
+        """
         self.config = Config(
             private_key=private_key,
             public_key=public_key,
             is_test=is_test,
             api_version=api_version,
+            api_url=api_url,
+            external_api_url=external_api_url,
         )
+        self._transport_options = {
+            "retries": retries,
+            "timeout": timeout,
+            "idempotency_journal": idempotency_journal,
+            "coalesce_reads": coalesce_reads,
+            "http2": http2,
+            "compress_threshold": compress_threshold,
+            "dns_ttl": dns_ttl,
+        }
+        self._transport = transport
+        self.tracers = transport.tracers if transport is not None else []
+        self._json_codec = json_codec
+        self._lock = threading.RLock()
+        self._resources = {}
+        self._contact_mirror = None
+        self._form_cache = None
+        self._invoice_catalog = None
+        self._pingback_journal_path = pingback_journal
+        self._pingback_journal = None
+        forksafety.register(self)
+
+    @property
+    def transport(self) -> "Transport":
+        """HTTP transport shared by all resources, created on first use."""
+        if self._transport is None:
+            with self._lock:
+                if self._transport is None:
+                    from fasterpay.idempotency import IdempotencyJournal
+                    from fasterpay.transport import Transport
+
+                    options = self._transport_options
+                    journal_path = options["idempotency_journal"]
+                    transport = Transport(
+                        retries=options["retries"],
+                        timeout=options["timeout"],
+                        journal=IdempotencyJournal(journal_path) if journal_path else None,
+                        codec=self.json_codec,
+                        tracers=self.tracers,
+                        coalesce=options["coalesce_reads"],
+                        compress_threshold=options["compress_threshold"],
+                        dns_ttl=options["dns_ttl"],
+                    )
+                    if options["http2"]:
+                        transport.use_http2(self.config.external_api_url)
+                    self._transport = transport
+        return self._transport
+
+    @property
+    def json_codec(self) -> "JsonCodec":
+        """JSON codec used for bodies and pingbacks."""
+        if self._json_codec is None:
+            from fasterpay.codec import JsonCodec
+
+            self._json_codec = JsonCodec()
+        return self._json_codec
+
+    @property
+    def pingback_journal(self) -> "PingbackJournal":
+        """Pingback journal, opened on first use, or None when not configured."""
+        if self._pingback_journal is None and self._pingback_journal_path is not None:
+            with self._lock:
+                if self._pingback_journal is None:
+                    from fasterpay.pingbackjournal import PingbackJournal
+
+                    self._pingback_journal = PingbackJournal(self._pingback_journal_path)
+        return self._pingback_journal
+
+    def warmup(self, connections: int = 2, keep_alive: float = None) -> dict:
+        """
+        Open connections to the FasterPay hosts before the first call needs them.
+
+        Resolves `config.api_url` and `config.external_api_url` and opens `connections`
+        pooled connections to each, so the first checkout after a deploy or scale-up
+        does not wait for DNS, TCP and TLS setup. Hosts sent over HTTP/2 are skipped.
+
+        Args:
+            connections (int): Connections per host, at most the pool size
+                (`transport.limiter.max_limit`, at least 10).
+            keep_alive (float, optional): Warm the pools again every this many seconds
+                on a background thread, reopening connections the server closed while
+                idle; see `Transport.keep_warm`.
+
+        Connections do not survive a fork: with a pre-forking server, call it from the
+        worker start hook (e.g. gunicorn's `post_fork`) rather than when preloading.
+
+        Returns:
+            dict: Number of open connections per host URL.
+        """
+        urls = (self.config.api_url, self.config.external_api_url)
+        opened = self.transport.warmup(urls, connections)
+        if keep_alive:
+            self.transport.keep_warm(urls, connections, keep_alive)
+        return opened
+
+    async def warmup_async(self, connections: int = 2, keep_alive: float = None) -> dict:
+        """`warmup` for asyncio code; connections are opened on a worker thread."""
+        import asyncio
+
+        return await asyncio.to_thread(self.warmup, connections, keep_alive)
+
+    def add_tracer(self, tracer: "Tracer") -> "Tracer":
+        """
+        Register an instrumentation hook receiving per-call timings and signing times.
 
-    def payment_form(self) -> PaymentForm:
-        return PaymentForm(self)
+        See `fasterpay.instrumentation` for the `Tracer` interface, the built-in
+        `HistogramCollector` and the `OpenTelemetryTracer` adapter. Gateways sharing a
+        transport share its tracers.
+        """
+        self.tracers.append(tracer)
+        return tracer
 
-    def signature(self) -> Signature:
-        return Signature(self)
+    def remove_tracer(self, tracer: "Tracer") -> None:
+        self.tracers.remove(tracer)
 
-    def pingback(self) -> Pingback:
-        return Pingback(self)
+    def payment_form(self) -> "PaymentForm":
+        return self._resource("paymentform", "PaymentForm")
+
+    def form_cache(self) -> "FormCache":
+        """Return the gateway's cache of signed checkout forms, creating it on first use."""
+        if self._form_cache is None:
+            with self._lock:
+                if self._form_cache is None:
+                    from fasterpay.formcache import FormCache
+
+                    self._form_cache = FormCache(self)
+        return self._form_cache
+
+    def signature(self) -> "Signature":
+        return self._resource("signature", "Signature")
+
+    def pingback(self) -> "Pingback":
+        return self._resource("pingback", "Pingback")
 
     def get_config(self) -> Config:
         return self.config
 
-    def subscription(self) -> Subscription:
-        return Subscription(self)
+    def subscription(self) -> "Subscription":
+        return self._resource("subscription", "Subscription")
 
-    def transaction(self) -> Transaction:
-        return Transaction(self)
+    def transaction(self) -> "Transaction":
+        return self._resource("transaction", "Transaction")
     
-    def address(self) -> Address:
-        return Address(self)
+    def address(self) -> "Address":
+        return self._resource("address", "Address")
     
-    def contact(self) -> Contact:
-        return Contact(self)
+    def contact(self) -> "Contact":
+        return self._resource("contact", "Contact")
     
-    def payout(self) -> Payout:
-        return Payout(self)
+    def contact_mirror(self) -> "ContactMirror":
+        """Return the gateway's local contact mirror, creating it on first use."""
+        if self._contact_mirror is None:
+            with self._lock:
+                if self._contact_mirror is None:
+                    from fasterpay.contactmirror import ContactMirror
+
+                    self._contact_mirror = ContactMirror(self)
+        return self._contact_mirror
+
+    def payout(self) -> "Payout":
+        return self._resource("payout", "Payout")
     
-    def einvoice(self) -> Einvoice:
-        return Einvoice(self)
-    
\ No newline at end of file
+    def einvoice(self) -> "Einvoice":
+        return self._resource("einvoice", "Einvoice")
+
+    def invoice_catalog(self) -> "InvoiceCatalog":
+        """Return the gateway's E-Invoice reference-data catalog, creating it on first use."""
+        if self._invoice_catalog is None:
+            with self._lock:
+                if self._invoice_catalog is None:
+                    from fasterpay.invoicecatalog import InvoiceCatalog
+
+                    self._invoice_catalog = InvoiceCatalog(self)
+        return self._invoice_catalog
+
+    def response_mode(self, mode: str):
+        """
+        Context manager changing how list methods return their page inside the block:
+        "json" (dict, default), "raw" (bytes) or "stream" (iterator over the records
+        of the page). Other calls keep returning dicts. See
+        `fasterpay.streaming.response_mode`.
+
+        Example:
+            with gateway.response_mode("stream"):
+                for invoice in gateway.einvoice().list_invoices({"per_page": 1000}):
+                    ...
+        """
+        from fasterpay.streaming import response_mode
+
+        return response_mode(mode)
+
+    def _after_fork(self) -> None:
+        self._lock = threading.RLock()
+
+    def _resource(self, module: str, name: str):
+        """
+        Return the gateway's shared instance of a resource class, creating it on first use.
+
+        Resources hold no per-call state, so one instance per gateway is safely shared
+        between threads.
+        """
+        resource = self._resources.get(name)
+        if resource is None:
+            with self._lock:
+                resource = self._resources.get(name)
+                if resource is None:
+                    resource_class = getattr(importlib.import_module(f"fasterpay.{module}"), name)
+                    resource = self._resources[name] = resource_class(self)
+        return resource
+
+    def resume_pending(self) -> list:
+        """
+        Re-send the keyed calls that were in flight when the process last stopped.
+
+        Each call is sent again with its original idempotency key. A call pending in the
+        journal may still have reached FasterPay before the process stopped, and
+        FasterPay does not document deduplicating the key: check refunds and payouts
+        before resuming them. Multipart calls cannot be resumed and are left pending in
+        the journal.
+
+        Returns:
+            list: (idempotency_key, response dict or exception) pairs.
+        """
+        journal = self.transport.journal
+        if journal is None:
+            raise ValueError("An idempotency journal is required to resume pending calls.")
+
+        headers = {"X-ApiKey": self.config.private_key, "Content-Type": "application/json"}
+        results = []
+        for record in journal.pending():
+            if not record.get("resumable"):
+                continue
+            try:
+                response = self.transport.request(
+                    record["method"], record["url"], json=record["json"], headers=headers,
+                    idempotency_key=record["key"],
+                )
+                response.raise_for_status()
+                results.append((record["key"], self.transport.decode(response)))
+            except Exception as error:
+                results.append((record["key"], error))
+        return results
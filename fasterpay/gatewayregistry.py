@@ -0,0 +1,161 @@
+import hashlib
+import hmac
+import threading
+from collections import OrderedDict
+
+from fasterpay import forksafety
+from fasterpay.gateway import Gateway
+
+
+class GatewayRegistry:
+    """
+    Gateways for many merchants (sub-merchants) sharing one HTTP transport.
+
+    Merchant key pairs are registered once. A merchant's Gateway, with its cached
+    resources and precomputed signing state, is built on first use and kept resident
+    while the merchant stays active; the least recently used gateways are evicted once
+    more than `max_resident` are held. All gateways share one transport, and therefore
+    one connection pool per upstream host.
+    """
+
+    def __init__(
+        self,
+        max_resident: int = 256,
+        retries: int = 2,
+        timeout: float = None,
+        idempotency_journal: str = None,
+        json_codec=None,
+    ):
+        """
+        Args:
+            max_resident (int): Maximum number of merchant gateways kept in memory.
+            retries (int): Retries for idempotent calls, and for idempotency-keyed
+                calls that failed to connect.
+            timeout (float, optional): Default request timeout in seconds.
+            idempotency_journal (str, optional): Journal shared by all merchants, see `Gateway`.
+            json_codec (JsonCodec, optional): Codec shared by all merchants, see `Gateway`.
+        """
+        if max_resident < 1:
+            raise ValueError("max_resident must be at least 1.")
+        self.max_resident = max_resident
+        self._transport_options = {
+            "retries": retries,
+            "timeout": timeout,
+            "idempotency_journal": idempotency_journal,
+        }
+        self.json_codec = json_codec
+        self._lock = threading.RLock()
+        self._merchants = {}
+        self._by_private_key = {}
+        self._resident = OrderedDict()
+        self._transport = None
+        forksafety.register(self)
+
+    @property
+    def transport(self):
+        """Transport shared by every merchant gateway, created on first use."""
+        with self._lock:
+            if self._transport is None:
+                from fasterpay.idempotency import IdempotencyJournal
+                from fasterpay.transport import Transport
+
+                options = self._transport_options
+                journal_path = options["idempotency_journal"]
+                self._transport = Transport(
+                    retries=options["retries"],
+                    timeout=options["timeout"],
+                    journal=IdempotencyJournal(journal_path) if journal_path else None,
+                    codec=self.json_codec,
+                )
+            return self._transport
+
+    def register(self, merchant_id: str, public_key: str, private_key: str, is_test: bool = False) -> None:
+        """Register, or replace, the key pair of a merchant."""
+        if not merchant_id or not public_key or not private_key:
+            raise ValueError("merchant_id, public_key and private_key are required.")
+
+        with self._lock:
+            self.unregister(merchant_id)
+            self._merchants[merchant_id] = (public_key, private_key, is_test)
+            self._by_private_key[private_key] = merchant_id
+
+    def unregister(self, merchant_id: str) -> None:
+        """Forget a merchant and drop its gateway."""
+        with self._lock:
+            keys = self._merchants.pop(merchant_id, None)
+            if keys is not None:
+                self._by_private_key.pop(keys[1], None)
+            self._resident.pop(merchant_id, None)
+
+    def gateway(self, merchant_id: str) -> Gateway:
+        """Return the gateway of a registered merchant, building it if it is not resident."""
+        with self._lock:
+            gateway = self._resident.get(merchant_id)
+            if gateway is not None:
+                self._resident.move_to_end(merchant_id)
+                return gateway
+
+            keys = self._merchants.get(merchant_id)
+            if keys is None:
+                raise ValueError(f"Unknown merchant: {merchant_id!r}.")
+
+            public_key, private_key, is_test = keys
+            gateway = Gateway(
+                public_key, private_key, is_test,
+                transport=self.transport, json_codec=self.transport.codec,
+            )
+            self._resident[merchant_id] = gateway
+            if len(self._resident) > self.max_resident:
+                self._resident.popitem(last=False)
+            return gateway
+
+    def route_pingback(self, pingbackdata: str, headers: dict):
+        """
+        Find the merchant a pingback belongs to and validate it.
+
+        Pingbacks carrying `X-ApiKey` are routed with a single dictionary lookup. Signed
+        (v2) pingbacks without it can only be matched by checking the signature against
+        each merchant's key: resident merchants are tried first, using their precomputed
+        signing state, then the remaining registered merchants.
+
+        Returns:
+            tuple: (merchant_id, Gateway) of the merchant that sent it, or None if no
+            registered merchant validates the pingback.
+        """
+        if not headers or not pingbackdata:
+            return None
+
+        merchant_id = self._by_private_key.get(headers.get("X-ApiKey"))
+        if merchant_id is not None:
+            gateway = self.gateway(merchant_id)
+            if gateway.pingback().validate(pingbackdata, headers):
+                return merchant_id, gateway
+            return None
+
+        if headers.get("X-Fasterpay-Signature-Version") != "v2":
+            return None
+
+        received = headers.get("X-Fasterpay-Signature") or ""
+        with self._lock:
+            resident = list(self._resident.items())
+            others = [
+                (merchant_id, keys[1]) for merchant_id, keys in self._merchants.items()
+                if merchant_id not in self._resident
+            ]
+
+        for merchant_id, gateway in resident:
+            if gateway.pingback().validate(pingbackdata, headers):
+                return merchant_id, gateway
+
+        data = pingbackdata.encode() if isinstance(pingbackdata, str) else pingbackdata
+        for merchant_id, private_key in others:
+            expected = hmac.new(private_key.encode(), data, digestmod=hashlib.sha256).hexdigest()
+            if hmac.compare_digest(expected, received):
+                return merchant_id, self.gateway(merchant_id)
+        return None
+
+    def __len__(self) -> int:
+        return len(self._merchants)
+
+    def _after_fork(self) -> None:
+        self._lock = threading.RLock()
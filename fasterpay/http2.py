@@ -0,0 +1,199 @@
+import asyncio
+import datetime
+import os
+import ssl
+import threading
+import time
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import DEFAULT_CA_BUNDLE_PATH, select_proxy
+
+
+class HTTP2Adapter(BaseAdapter):
+    """
+    `requests` adapter sending requests over multiplexed HTTP/2 connections.
+
+    Backed by the optional `httpx` package with HTTP/2 support (`pip install
+    httpx[http2]`). Concurrent requests to one host share a few connections instead of
+    holding one HTTP/1.1 connection each. Mount it for the hosts that should use
+    HTTP/2, usually through `Transport.use_http2`; responses are returned as regular
+    `requests.Response` objects, so resources, retries and streaming work unchanged.
+
+    The HTTP/2 connections are driven by an asyncio client on a private event loop
+    thread: the synchronous httpx HTTP/2 client is not safe to share between threads,
+    while calling threads here only wait for their own stream. That one thread also
+    does all the HTTP/2 framing, in pure Python, so a request costs more CPU than on
+    the HTTP/1.1 pool and throughput tops out lower: the bundled benchmark
+    (tests/test-http2.py) has measured HTTP/2 up to 40% below HTTP/1.1 against a local
+    server. Use HTTP/2 to hold fewer connections, e.g. many processes each calling
+    the API with a handful of threads or behind a connection limit, not for speed.
+
+    TLS verification, client certificates and proxies are taken from each request, as
+    `requests` passes them (`Session.verify`, `Session.cert`, `Session.proxies` and the
+    environment); a client is kept for every combination in use.
+    """
+
+    def __init__(self, max_connections: int = 10, prior_knowledge: bool = False):
+        """
+        Args:
+            max_connections (int): Connections kept per host, for every combination of
+                TLS and proxy settings; each multiplexes many concurrent requests.
+            prior_knowledge (bool): Speak HTTP/2 without negotiation, required for
+                plain-text (`http://`) servers such as local stand-ins.
+        """
+        super().__init__()
+        import httpx
+
+        self._httpx = httpx
+        self.max_connections = max_connections
+        self.prior_knowledge = prior_knowledge
+        self._clients = {}
+        self._clients_lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="fasterpay-http2", daemon=True)
+        self._thread.start()
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        httpx = self._httpx
+        started = time.perf_counter()
+        client = self._client(verify, cert, select_proxy(request.url, proxies or {}))
+        try:
+            upstream = self._call(self._send(client, request, stream, _timeout(httpx, timeout)))
+        except httpx.ConnectTimeout as error:
+            raise requests.ConnectTimeout(error, request=request)
+        except httpx.TimeoutException as error:
+            raise requests.ReadTimeout(error, request=request)
+        except httpx.TransportError as error:
+            raise requests.ConnectionError(error, request=request)
+
+        response = requests.Response()
+        response.status_code = upstream.status_code
+        response.reason = upstream.reason_phrase
+        response.headers = CaseInsensitiveDict(upstream.headers)
+        # httpx has already removed any content encoding.
+        response.headers.pop("Content-Encoding", None)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.elapsed = datetime.timedelta(seconds=time.perf_counter() - started)
+        if stream:
+            response.raw = _RawBody(self, upstream)
+        else:
+            response._content = upstream.content
+        return response
+
+    def close(self) -> None:
+        if self._loop.is_closed():
+            return
+        with self._clients_lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            self._call(client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def _client(self, verify, cert, proxy):
+        key = (verify, cert, proxy)
+        client = self._clients.get(key)
+        if client is None:
+            with self._clients_lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = self._clients[key] = self._call(self._create_client(_ssl_context(verify, cert), proxy))
+        return client
+
+    async def _create_client(self, context: ssl.SSLContext, proxy: str):
+        httpx = self._httpx
+        return httpx.AsyncClient(
+            http1=not self.prior_knowledge,
+            http2=True,
+            verify=context,
+            trust_env=False,
+            **({"proxy": proxy} if proxy else {}),
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+        )
+
+    async def _send(self, client, request, stream: bool, timeout):
+        upstream = await client.send(
+            client.build_request(
+                request.method,
+                request.url,
+                headers=dict(request.headers),
+                content=request.body,
+                timeout=timeout,
+            ),
+            stream=stream,
+        )
+        if not stream:
+            await upstream.aread()
+        return upstream
+
+
+class _RawBody:
+    """Minimal `raw` object so `requests.Response.iter_content` streams an httpx response."""
+
+    def __init__(self, adapter: HTTP2Adapter, upstream):
+        self._adapter = adapter
+        self._upstream = upstream
+        self._chunks = None
+
+    def stream(self, chunk_size, decode_content=True):
+        chunks = self._upstream.aiter_bytes(chunk_size)
+        while True:
+            chunk = self._adapter._call(_next_chunk(chunks))
+            if chunk is None:
+                return
+            yield chunk
+
+    def read(self, amount=None):
+        if amount is None:
+            return b"".join(self.stream(64 * 1024))
+        if self._chunks is None:
+            self._chunks = self.stream(amount)
+        return next(self._chunks, b"")
+
+    def close(self) -> None:
+        self._adapter._call(self._upstream.aclose())
+
+    def release_conn(self) -> None:
+        self.close()
+
+
+async def _next_chunk(chunks):
+    try:
+        return await chunks.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+def _ssl_context(verify, cert) -> ssl.SSLContext:
+    """Build the TLS context `requests` would use for `verify` and `cert`."""
+    if verify is False:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    else:
+        bundle = DEFAULT_CA_BUNDLE_PATH if verify is True else verify
+        if os.path.isdir(bundle):
+            context = ssl.create_default_context(capath=bundle)
+        else:
+            context = ssl.create_default_context(cafile=bundle)
+    if cert:
+        if isinstance(cert, (tuple, list)):
+            context.load_cert_chain(*cert)
+        else:
+            context.load_cert_chain(cert)
+    return context
+
+
+def _timeout(httpx, timeout):
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(timeout)
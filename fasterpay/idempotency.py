@@ -0,0 +1,214 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from fasterpay import forksafety
+
+try:
+    import fcntl
+except ImportError:  # Windows: no fork(), so a journal has a single writer process.
+    fcntl = None
+
+
+def new_idempotency_key() -> str:
+    """Generate a fresh idempotency key."""
+    return uuid.uuid4().hex
+
+
+class IdempotencyJournal:
+    """
+    Append-only journal of mutating calls, keyed by idempotency key.
+
+    Every keyed call is written as `pending` before it is sent and as `done` (with the
+    response body) or `failed` once it finishes, one JSON object per line. Replaying a
+    `done` key returns the recorded response instead of calling the API again, and
+    `pending` entries left behind by a crash can be resumed with `Gateway.resume_pending`.
+
+    Only the `max_entries` most recent finished calls are kept: older `done` and
+    `failed` records are dropped from memory, and the file is compacted once it holds
+    twice as many lines. Pending calls are always kept.
+
+    Worker processes forked from the one that opened the journal keep appending to
+    the same file, under an exclusive `flock`. Compaction, under the same lock,
+    rebuilds the file from every record in it, so records appended by other
+    processes are not lost.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        """
+        Args:
+            path (str): Journal file, created if missing.
+            max_entries (int): Finished calls kept for deduplication.
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1.")
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._finished = 0
+        self._lines = 0
+        self._file = open(path, "a", encoding="utf-8")
+        with self._locked_file():
+            self._load()
+        self._evict()
+        forksafety.register(self)
+
+    def get(self, key: str):
+        """Return the latest record for a key, or None."""
+        return self._entries.get(key)
+
+    def begin(self, key: str, method: str, url: str, body=None) -> dict:
+        """
+        Record a call as in flight, unless the key already completed.
+
+        Args:
+            key (str): Idempotency key of the call.
+            method (str): HTTP method.
+            url (str): Request URL.
+            body (dict, optional): JSON body, kept so the call can be resumed.
+                Calls without a JSON body (e.g. multipart uploads) cannot be resumed.
+
+        Returns:
+            dict: The journal record; its `state` is "done" if the call already completed.
+        """
+        with self._lock:
+            record = self._entries.get(key)
+            if record and record["state"] == "done":
+                return record
+            record = {
+                "key": key,
+                "state": "pending",
+                "method": method,
+                "url": url,
+                "json": body,
+                "resumable": body is not None,
+                "ts": time.time(),
+            }
+            self._append(record)
+            return record
+
+    def complete(self, key: str, status: int, body: str) -> None:
+        """Record the successful response of a call."""
+        self._finish(key, "done", status=status, body=body)
+
+    def fail(self, key: str, status: int = None, error: str = None) -> None:
+        """Record that a call failed permanently; it will be sent again if retried."""
+        self._finish(key, "failed", status=status, error=error)
+
+    def pending(self) -> list:
+        """Return the records of calls that were started but never finished."""
+        with self._lock:
+            return [record for record in self._entries.values() if record["state"] == "pending"]
+
+    def compact(self) -> None:
+        """Rewrite the journal keeping only the latest record of each key."""
+        with self._lock:
+            self._compact()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def _after_fork(self) -> None:
+        # Records are flushed as they are written, so the child can reopen the file.
+        self._lock = threading.Lock()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _finish(self, key: str, state: str, **fields) -> None:
+        with self._lock:
+            record = dict(self._entries.get(key) or {"key": key}, state=state, ts=time.time(), **fields)
+            self._append(record)
+
+    @contextmanager
+    def _locked_file(self):
+        """Hold the journal's file lock, reopening the file if another process compacted it."""
+        if fcntl is None:
+            yield
+            return
+        while True:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            try:
+                replaced = os.fstat(self._file.fileno()).st_ino != os.stat(self.path).st_ino
+            except FileNotFoundError:
+                replaced = True
+            if not replaced:
+                break
+            self._file.close()  # Releases the lock on the replaced file.
+            self._file = open(self.path, "a", encoding="utf-8")
+        try:
+            yield
+        finally:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as journal:
+            for line in journal:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Torn final line from an interrupted write
+                self._lines += 1
+                self._track(record)
+
+    def _append(self, record: dict) -> None:
+        with self._locked_file():
+            self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._lines += 1
+        self._track(record)
+        self._evict()
+
+    def _track(self, record: dict) -> None:
+        previous = self._entries.pop(record["key"], None)
+        if previous is not None and previous["state"] != "pending":
+            self._finished -= 1
+        # Re-inserted, so entries stay ordered by last update.
+        self._entries[record["key"]] = record
+        if record["state"] != "pending":
+            self._finished += 1
+
+    def _evict(self) -> None:
+        self._drop_finished()
+        if self._lines > 2 * max(self.max_entries, len(self._entries)):
+            self._compact()
+
+    def _drop_finished(self) -> None:
+        excess = self._finished - self.max_entries
+        if excess > 0:
+            # Entries are ordered by last update, so the oldest finished calls come first.
+            stale = []
+            for key, record in self._entries.items():
+                if record["state"] != "pending":
+                    stale.append(key)
+                    if len(stale) == excess:
+                        break
+            for key in stale:
+                del self._entries[key]
+            self._finished -= len(stale)
+
+    def _compact(self) -> None:
+        with self._locked_file():
+            # Other processes may have appended records this one never saw: start over
+            # from the file rather than from memory.
+            self._entries, self._finished, self._lines = {}, 0, 0
+            self._load()
+            self._drop_finished()
+            partial = f"{self.path}.compact.{os.getpid()}"
+            with open(partial, "w", encoding="utf-8") as journal:
+                for record in self._entries.values():
+                    journal.write(json.dumps(record, separators=(",", ":")) + "\n")
+                journal.flush()
+                os.fsync(journal.fileno())
+            os.replace(partial, self.path)
+        # Closing the replaced file releases its lock; other processes then reopen the path.
+        self._file.close()
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._lines = len(self._entries)
@@ -0,0 +1,336 @@
+import bisect
+import re
+import threading
+import time
+
+from fasterpay import forksafety
+
+# Segments holding record IDs: numbers, prefixed IDs (FPBIV-250528-0001, PO-000001),
+# UUIDs, long hex tokens and anything else with four digits or more. Version segments
+# such as `v1` are kept.
+_ID_SEGMENT = re.compile(
+    r"^(?:\d+"
+    r"|[A-Za-z]+[-_]\d[\w-]*"
+    r"|[0-9a-fA-F]{8}(?:-[0-9a-fA-F]{4}){3}-[0-9a-fA-F]{12}"
+    r"|[0-9a-fA-F]*\d[0-9a-fA-F]*(?<=.{16})"
+    r"|(?:\D*\d){4}.*)$"
+)
+_CODE_SEGMENT = re.compile(r"^[A-Z]{2,3}$")
+
+
+def endpoint_template(url: str) -> str:
+    """
+    Reduce a request URL to its endpoint template.
+
+    Path segments holding IDs become `{id}` and country or currency codes become
+    `{code}`, e.g. `https://business.fasterpay.com/api/external/invoices/FPBIV-250528-0001`
+    becomes `/api/external/invoices/{id}`, while `/api/v1/deliveries` is kept as is.
+    """
+    path = url.split("://", 1)[-1]
+    path = path[path.find("/"):] if "/" in path else "/"
+    path = path.split("?", 1)[0]
+    return "/".join(
+        "{id}" if _ID_SEGMENT.match(segment) else "{code}" if _CODE_SEGMENT.match(segment) else segment
+        for segment in path.split("/")
+    )
+
+
+class CallEvent:
+    """
+    Timings and metadata of one API call.
+
+    Phases (seconds) that may be present:
+        - queue: Waiting for a slot of the adaptive concurrency limiter (bulk helpers).
+        - encode: JSON encoding of the request body.
+        - compress: Gzip compression of a large request body.
+        - connect: DNS resolution and TCP connect of new connections.
+        - tls: TLS handshake of new connections.
+        - server: Time to response headers, minus connection setup.
+        - download: Reading the response body.
+        - backoff: Sleeping between retries.
+        - decode: Decoding the response body (reported through `Tracer.on_decode`).
+
+    Body sizes are counted both decoded (`request_bytes`, `response_bytes`) and as
+    sent over the network (`request_wire_bytes`, `response_wire_bytes`), which is
+    smaller when the body was compressed.
+    """
+
+    __slots__ = (
+        "method",
+        "url",
+        "endpoint",
+        "status",
+        "retries",
+        "request_bytes",
+        "response_bytes",
+        "request_wire_bytes",
+        "response_wire_bytes",
+        "phases",
+        "started",
+        "duration",
+        "error",
+    )
+
+    def __init__(self, method: str, url: str):
+        self.method = method
+        self.url = url
+        self.endpoint = endpoint_template(url)
+        self.status = None
+        self.retries = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.request_wire_bytes = 0
+        self.response_wire_bytes = 0
+        self.phases = {}
+        self.started = time.time()
+        self.duration = 0.0
+        self.error = None
+
+    def add_phase(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+
+class Tracer:
+    """
+    Base class for instrumentation hooks; override the methods you need.
+
+    Register tracers with `Gateway.add_tracer`. When no tracer is registered the
+    SDK skips all timing work.
+    """
+
+    def on_call(self, event: CallEvent) -> None:
+        """Called once the HTTP exchange of a call has completed or failed."""
+
+    def on_decode(self, event: CallEvent, seconds: float) -> None:
+        """Called when the response body of a call has been decoded."""
+
+    def on_sign(self, scheme: str, seconds: float) -> None:
+        """Called after a form or pingback signature has been computed."""
+
+
+class Histogram:
+    """Fixed log-scale histogram of durations, from 1 microsecond to about 100 seconds."""
+
+    BOUNDS = [1e-6 * 2 ** (n / 4) for n in range(0, 108)]
+
+    __slots__ = ("counts", "count", "total")
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.BOUNDS[min(index, len(self.BOUNDS) - 1)]
+        return self.BOUNDS[-1]
+
+    def summary(self) -> dict:
+        """Count, mean and p50/p90/p99 upper bounds, in seconds."""
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+        }
+
+
+class HistogramCollector(Tracer):
+    """
+    Low-overhead in-memory metrics: duration and per-phase histograms, status counts,
+    retries and payload sizes (decoded and on the wire) per (method, endpoint template).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._signing = {}
+        forksafety.register(self)
+
+    def on_call(self, event: CallEvent) -> None:
+        with self._lock:
+            stats = self._stats(event)
+            stats["duration"].observe(event.duration)
+            for phase, seconds in event.phases.items():
+                stats["phases"].setdefault(phase, Histogram()).observe(seconds)
+            status = event.status if event.status is not None else type(event.error).__name__
+            stats["statuses"][status] = stats["statuses"].get(status, 0) + 1
+            stats["retries"] += event.retries
+            stats["request_bytes"] += event.request_bytes
+            stats["response_bytes"] += event.response_bytes
+            stats["request_wire_bytes"] += event.request_wire_bytes
+            stats["response_wire_bytes"] += event.response_wire_bytes
+
+    def on_decode(self, event: CallEvent, seconds: float) -> None:
+        with self._lock:
+            self._stats(event)["phases"].setdefault("decode", Histogram()).observe(seconds)
+
+    def on_sign(self, scheme: str, seconds: float) -> None:
+        with self._lock:
+            self._signing.setdefault(scheme, Histogram()).observe(seconds)
+
+    def snapshot(self) -> dict:
+        """
+        Summarise the collected metrics.
+
+        Returns:
+            dict: `{"calls": {"GET /api/...": {...}}, "signing": {"v1": {...}}}` with
+            count, mean, p50, p90 and p99 (seconds) for every histogram.
+        """
+        with self._lock:
+            calls = {
+                key: {
+                    "duration": stats["duration"].summary(),
+                    "phases": {phase: hist.summary() for phase, hist in stats["phases"].items()},
+                    "statuses": dict(stats["statuses"]),
+                    "retries": stats["retries"],
+                    "request_bytes": stats["request_bytes"],
+                    "response_bytes": stats["response_bytes"],
+                    "request_wire_bytes": stats["request_wire_bytes"],
+                    "response_wire_bytes": stats["response_wire_bytes"],
+                }
+                for key, stats in self._endpoints.items()
+            }
+            signing = {scheme: hist.summary() for scheme, hist in self._signing.items()}
+        return {"calls": calls, "signing": signing}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+            self._signing.clear()
+
+    def _after_fork(self) -> None:
+        # Each worker process reports its own calls.
+        self._lock = threading.Lock()
+        self.reset()
+
+    def _stats(self, event: CallEvent) -> dict:
+        key = f"{event.method} {event.endpoint}"
+        stats = self._endpoints.get(key)
+        if stats is None:
+            stats = self._endpoints[key] = {
+                "duration": Histogram(),
+                "phases": {},
+                "statuses": {},
+                "retries": 0,
+                "request_bytes": 0,
+                "response_bytes": 0,
+                "request_wire_bytes": 0,
+                "response_wire_bytes": 0,
+            }
+        return stats
+
+
+class OpenTelemetryTracer(Tracer):
+    """
+    Report calls as OpenTelemetry client spans and metrics.
+
+    Requires the optional `opentelemetry-api` package; without a configured SDK the
+    OpenTelemetry API is a no-op.
+    """
+
+    def __init__(self, tracer_provider=None, meter_provider=None):
+        from opentelemetry import metrics, trace
+
+        self._tracer = trace.get_tracer("fasterpay", tracer_provider=tracer_provider)
+        meter = metrics.get_meter("fasterpay", meter_provider=meter_provider)
+        self._duration = meter.create_histogram("fasterpay.client.duration", unit="s")
+        self._phase = meter.create_histogram("fasterpay.client.phase.duration", unit="s")
+        self._signing = meter.create_histogram("fasterpay.signing.duration", unit="s")
+        self._kind = trace.SpanKind.CLIENT
+
+    def on_call(self, event: CallEvent) -> None:
+        attributes = {
+            "http.request.method": event.method,
+            "http.route": event.endpoint,
+            "url.full": event.url.split("?", 1)[0],
+            "fasterpay.retries": event.retries,
+            "http.request.body.size": event.request_wire_bytes,
+            "http.response.body.size": event.response_wire_bytes,
+            "fasterpay.request.body.decoded_size": event.request_bytes,
+            "fasterpay.response.body.decoded_size": event.response_bytes,
+        }
+        if event.status is not None:
+            attributes["http.response.status_code"] = event.status
+        if event.error is not None:
+            attributes["error.type"] = type(event.error).__name__
+
+        start = int(event.started * 1e9)
+        span = self._tracer.start_span(
+            f"{event.method} {event.endpoint}", kind=self._kind, start_time=start, attributes=attributes,
+        )
+        for phase, seconds in event.phases.items():
+            span.set_attribute(f"fasterpay.phase.{phase}", seconds)
+        span.end(end_time=start + int(event.duration * 1e9))
+
+        metric_attributes = {"http.request.method": event.method, "http.route": event.endpoint}
+        self._duration.record(event.duration, metric_attributes)
+        for phase, seconds in event.phases.items():
+            self._phase.record(seconds, dict(metric_attributes, phase=phase))
+
+    def on_decode(self, event: CallEvent, seconds: float) -> None:
+        self._phase.record(seconds, {"http.request.method": event.method, "http.route": event.endpoint, "phase": "decode"})
+
+    def on_sign(self, scheme: str, seconds: float) -> None:
+        self._signing.record(seconds, {"fasterpay.sign_version": scheme})
+
+
+class TransferCounters:
+    """
+    Running totals of body bytes exchanged by a transport, decoded and on the wire.
+
+    Kept by every `Transport` as `transfer`, whether or not tracers are registered.
+    Take a snapshot before and after a job to see the bandwidth compression saved;
+    per-endpoint totals are available from `HistogramCollector`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def record(self, request_bytes: int, request_wire_bytes: int, response_bytes: int, response_wire_bytes: int) -> None:
+        with self._lock:
+            self.calls += 1
+            self.request_bytes += request_bytes
+            self.request_wire_bytes += request_wire_bytes
+            self.response_bytes += response_bytes
+            self.response_wire_bytes += response_wire_bytes
+
+    def snapshot(self) -> dict:
+        """
+        Returns:
+            dict: Call count, decoded and wire byte totals for requests and responses,
+            and `saved_bytes`, the difference between the two.
+        """
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "request_bytes": self.request_bytes,
+                "request_wire_bytes": self.request_wire_bytes,
+                "response_bytes": self.response_bytes,
+                "response_wire_bytes": self.response_wire_bytes,
+                "saved_bytes": (
+                    self.request_bytes - self.request_wire_bytes + self.response_bytes - self.response_wire_bytes
+                ),
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls = 0
+            self.request_bytes = 0
+            self.request_wire_bytes = 0
+            self.response_bytes = 0
+            self.response_wire_bytes = 0
@@ -0,0 +1,133 @@
+import copy
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+class InvoiceBatch:
+    """
+    Create many E-Invoices at once, creating their shared dependencies only once.
+
+    Each invoice spec takes the same fields as `Einvoice.create_invoice`, plus these
+    batch-only shortcuts that are created on demand and replaced by their IDs:
+        - contact (dict): Contact to create, deduplicated by email or phone. Replaces `contact_id`.
+        - tax (dict) / discount (dict): Invoice-level tax or discount. Replaces `tax_id` / `discount_id`.
+        - items[].product (dict): Product to create, deduplicated by SKU. Replaces `product_id`.
+          Products carrying an image upload are sent inline with their invoice instead.
+        - items[].tax (dict) / items[].discount (dict): Line-level tax or discount.
+
+    Identical dependencies across the batch are created once, independent creations run
+    concurrently, and invoices are created (and optionally sent) as soon as their own
+    dependencies are ready. API calls are gated by the transport's adaptive limiter,
+    see `fasterpay.concurrencylimit.AdaptiveLimiter`.
+    """
+
+    def __init__(self, gateway, max_workers: int = None):
+        if max_workers is not None and max_workers < 1:
+            raise ValueError("max_workers must be at least 1.")
+        self.gateway = gateway
+        self.max_workers = max_workers
+
+    def run(self, specs: list, send: bool = False, test: bool = False):
+        """
+        Create the invoices described by `specs`.
+
+        Args:
+            specs (list): Invoice specs, see the class docstring.
+            send (bool): If True, send each invoice once it has been created.
+            test (bool): Passed on to `Einvoice.send_invoice`.
+
+        Yields:
+            dict: One outcome per invoice, in completion order:
+                - index (int): Position of the spec in `specs`.
+                - invoice (dict or None): `create_invoice` response.
+                - sent (dict or None): `send_invoice` response, if sent.
+                - error (Exception or None): First error hit while processing this invoice.
+        """
+        specs = [copy.deepcopy(spec) for spec in specs]
+        einvoice = self.gateway.einvoice()
+        contact = self.gateway.contact()
+
+        creators = {
+            "contact": contact.create_contact,
+            "product": einvoice.create_invoice_product,
+            "tax": einvoice.create_invoice_tax,
+            "discount": einvoice.create_invoice_discount,
+        }
+        dependencies = {}
+        wiring = [self._collect(spec, dependencies) for spec in specs]
+
+        limiter = self.gateway.transport.limiter
+        with ThreadPoolExecutor(max_workers=self.max_workers or limiter.max_limit) as executor:
+            # Dependencies are queued first so invoice tasks never wait on work queued behind them.
+            created = {
+                key: executor.submit(limiter.bind(_create_record), creators[key[0]], payload)
+                for key, payload in dependencies.items()
+            }
+            futures = {
+                executor.submit(limiter.bind(self._create_invoice), einvoice, spec, links, created, send, test): index
+                for index, (spec, links) in enumerate(zip(specs, wiring))
+            }
+
+            for future in as_completed(futures):
+                outcome = future.result()
+                outcome["index"] = futures[future]
+                yield outcome
+
+    def _collect(self, spec: dict, dependencies: dict) -> list:
+        """Register the dependencies of one spec and return where their IDs must be written."""
+        links = []
+
+        def register(kind, container, field, target):
+            payload = container.pop(field)
+            key = (kind, _dependency_key(kind, payload))
+            dependencies.setdefault(key, payload)
+            links.append((container, target, key))
+
+        if isinstance(spec.get("contact"), dict):
+            register("contact", spec, "contact", "contact_id")
+        for kind in ("tax", "discount"):
+            if isinstance(spec.get(kind), dict):
+                register(kind, spec, kind, f"{kind}_id")
+
+        for item in spec.get("items") or []:
+            product = item.get("product")
+            if isinstance(product, dict) and not isinstance(product.get("image"), (bytes, tuple)):
+                register("product", item, "product", "product_id")
+            for kind in ("tax", "discount"):
+                if isinstance(item.get(kind), dict):
+                    register(kind, item, kind, f"{kind}_id")
+
+        return links
+
+    def _create_invoice(self, einvoice, spec, links, created, send, test) -> dict:
+        outcome = {"invoice": None, "sent": None, "error": None}
+        try:
+            for container, target, key in links:
+                container[target] = created[key].result()
+
+            outcome["invoice"] = einvoice.create_invoice(spec)
+            if send:
+                outcome["sent"] = einvoice.send_invoice(_record_id(outcome["invoice"]), test=test)
+        except Exception as error:
+            outcome["error"] = error
+        return outcome
+
+
+def _create_record(create, payload: dict) -> str:
+    return _record_id(create(payload))
+
+
+def _record_id(response: dict) -> str:
+    data = response.get("data", response) if isinstance(response, dict) else None
+    record_id = data.get("id") if isinstance(data, dict) else None
+    if not record_id:
+        raise ValueError("API response does not contain a record ID.")
+    return record_id
+
+
+def _dependency_key(kind: str, payload: dict) -> str:
+    if kind == "product" and payload.get("sku"):
+        return f"sku:{payload['sku']}"
+    if kind == "contact" and (payload.get("email") or payload.get("phone")):
+        return f"contact:{(payload.get('email') or '').lower()}:{payload.get('phone') or ''}"
+    return json.dumps(payload, sort_keys=True, default=str)
@@ -0,0 +1,201 @@
+import threading
+
+from fasterpay import forksafety
+from fasterpay.pagination import iter_records
+
+
+class InvoiceCatalog:
+    """
+    Client-side index of E-Invoice reference data: products, taxes and discounts.
+
+    Each collection is loaded once, page by page, on first use. Products are indexed by
+    ID, SKU and name, with their prices indexed by currency; taxes and discounts by ID
+    and name. Mutations made through `Einvoice` are applied to the catalog as they
+    happen, and `refresh` reloads a collection to pick up changes made elsewhere.
+
+    Collections are fetched without holding the catalog's lock and swapped in once
+    complete, so lookups never wait for, or see half of, a reload.
+    """
+
+    KINDS = ("products", "taxes", "discounts")
+
+    def __init__(self, gateway):
+        self.gateway = gateway
+        self._lock = threading.RLock()
+        self._records = {kind: {} for kind in self.KINDS}
+        self._by_name = {kind: {} for kind in self.KINDS}
+        self._by_sku = {}
+        self._prices = {}
+        self._loaded = set()
+        self._loading = {kind: threading.Lock() for kind in self.KINDS}
+        forksafety.register(self)
+
+    def refresh(self, kind: str = None) -> None:
+        """
+        Reload one collection from the API, or all of them.
+
+        Every page of the collection is fetched again: the reference-data listings
+        cannot be filtered on changes, so there is no incremental refresh. Lookups
+        answer from the previous data until the reload completes.
+
+        Args:
+            kind (str, optional): One of "products", "taxes" or "discounts".
+        """
+        for name in ([kind] if kind else self.KINDS):
+            self._load(name)
+
+    def product(self, sku: str = None, product_id: str = None, name: str = None):
+        """Return a product by SKU, ID or name, or None if it is unknown."""
+        self._ensure("products")
+        if product_id:
+            return self._records["products"].get(product_id)
+        if sku:
+            product_id = self._by_sku.get(sku)
+        elif name:
+            product_id = self._by_name["products"].get(name.strip().lower())
+        return self._records["products"].get(product_id) if product_id else None
+
+    def price(self, product_id: str, currency: str):
+        """Return the product's price in `currency`, or None if it has none."""
+        self._ensure("products")
+        return self._prices.get((product_id, currency.upper()))
+
+    def tax(self, name: str = None, tax_id: str = None):
+        """Return a tax by name or ID, or None if it is unknown."""
+        return self._lookup("taxes", name, tax_id)
+
+    def discount(self, name: str = None, discount_id: str = None):
+        """Return a discount by name or ID, or None if it is unknown."""
+        return self._lookup("discounts", name, discount_id)
+
+    def resolve_item(self, item: dict, currency: str) -> dict:
+        """
+        Turn a line item that refers to reference data by name into an API item.
+
+        Args:
+            item (dict): Line item with:
+                - sku (str) or product_id (str): The product sold.
+                - quantity (int, optional): Defaults to 1.
+                - price (float, optional): Overrides the catalog price.
+                - tax (str, optional): Tax name.
+                - discount (str, optional): Discount name.
+            currency (str): Invoice currency, used to look up the product price.
+
+        Returns:
+            dict: Item with `product_id`, `price`, `quantity` and, when given, `tax_id` / `discount_id`.
+        """
+        product = self.product(sku=item.get("sku"), product_id=item.get("product_id"))
+        if product is None:
+            raise ValueError(f"Unknown product: {item.get('sku') or item.get('product_id')!r}.")
+
+        price = item.get("price")
+        if price is None:
+            price = self.price(product["id"], currency)
+        if price is None:
+            raise ValueError(f"Product {product['id']!r} has no price in {currency}.")
+
+        resolved = {"product_id": product["id"], "price": price, "quantity": item.get("quantity", 1)}
+        for kind, lookup in (("tax", self.tax), ("discount", self.discount)):
+            if item.get(kind):
+                record = lookup(name=item[kind])
+                if record is None:
+                    raise ValueError(f"Unknown {kind}: {item[kind]!r}.")
+                resolved[f"{kind}_id"] = record["id"]
+        return resolved
+
+    def resolve_items(self, items: list, currency: str) -> list:
+        """Resolve every line item of an invoice, see `resolve_item`."""
+        return [self.resolve_item(item, currency) for item in items]
+
+    def upsert(self, kind: str, record: dict) -> None:
+        """Add or replace a record, if its collection has been loaded."""
+        with self._lock:
+            if kind in self._loaded and record.get("id"):
+                self._remove(kind, record["id"])
+                self._index(kind, record)
+
+    def remove(self, kind: str, record_id: str) -> None:
+        """Drop a record, if its collection has been loaded."""
+        with self._lock:
+            if kind in self._loaded:
+                self._remove(kind, record_id)
+
+    def remove_price(self, product_id: str, currency: str) -> None:
+        """Drop one price of a cached product."""
+        with self._lock:
+            self._prices.pop((product_id, currency.upper()), None)
+            product = self._records["products"].get(product_id)
+            if product and product.get("prices"):
+                product["prices"] = [
+                    price for price in product["prices"]
+                    if (price.get("currency") or "").upper() != currency.upper()
+                ]
+
+    def _after_fork(self) -> None:
+        self._lock = threading.RLock()
+        self._loading = {kind: threading.Lock() for kind in self.KINDS}
+
+    def _lookup(self, kind: str, name: str, record_id: str):
+        self._ensure(kind)
+        if not record_id and name:
+            record_id = self._by_name[kind].get(name.strip().lower())
+        return self._records[kind].get(record_id) if record_id else None
+
+    def _ensure(self, kind: str) -> None:
+        if kind not in self._loaded:
+            # Only callers needing the same collection wait for its first load.
+            with self._loading[kind]:
+                if kind not in self._loaded:
+                    self._load(kind)
+
+    def _load(self, kind: str) -> None:
+        einvoice = self.gateway.einvoice()
+        fetch, params = {
+            "products": (einvoice.list_invoice_products, {"include": "prices"}),
+            "taxes": (einvoice.list_invoice_taxes, {}),
+            "discounts": (einvoice.list_invoice_discounts, {}),
+        }[kind]
+        records, by_name, by_sku, prices = {}, {}, {}, {}
+        for record in iter_records(fetch, params):
+            _index_record(kind, record, records, by_name, by_sku, prices)
+
+        with self._lock:
+            self._records[kind] = records
+            self._by_name[kind] = by_name
+            if kind == "products":
+                self._by_sku = by_sku
+                self._prices = prices
+            self._loaded.add(kind)
+
+    def _index(self, kind: str, record: dict) -> None:
+        _index_record(kind, record, self._records[kind], self._by_name[kind], self._by_sku, self._prices)
+
+    def _remove(self, kind: str, record_id: str) -> None:
+        record = self._records[kind].pop(record_id, None)
+        if record is None:
+            return
+        name = (record.get("name") or "").strip().lower()
+        if self._by_name[kind].get(name) == record_id:
+            del self._by_name[kind][name]
+
+        if kind == "products":
+            if self._by_sku.get(record.get("sku")) == record_id:
+                del self._by_sku[record["sku"]]
+            for price in record.get("prices") or []:
+                self._prices.pop((record_id, (price.get("currency") or "").upper()), None)
+
+
+def _index_record(kind: str, record: dict, records: dict, by_name: dict, by_sku: dict, prices: dict) -> None:
+    record_id = record.get("id")
+    if not record_id:
+        return
+    records[record_id] = record
+    if record.get("name"):
+        by_name[record["name"].strip().lower()] = record_id
+
+    if kind == "products":
+        if record.get("sku"):
+            by_sku[record["sku"]] = record_id
+        for price in record.get("prices") or []:
+            if price.get("currency"):
+                prices[(record_id, price["currency"].upper())] = price.get("price")
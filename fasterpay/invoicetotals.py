@@ -0,0 +1,160 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+# ISO 4217 currencies whose minor unit is not the cent; every other currency has 2 decimals.
+CURRENCY_DECIMALS = {
+    "BIF": 0, "CLP": 0, "DJF": 0, "GNF": 0, "ISK": 0, "JPY": 0, "KMF": 0, "KRW": 0, "PYG": 0,
+    "RWF": 0, "UGX": 0, "UYI": 0, "VND": 0, "VUV": 0, "XAF": 0, "XOF": 0, "XPF": 0,
+    "BHD": 3, "IQD": 3, "JOD": 3, "KWD": 3, "LYD": 3, "OMR": 3, "TND": 3,
+    "CLF": 4, "UYW": 4,
+}
+
+HUNDRED = Decimal(100)
+ZERO = Decimal(0)
+
+# Catalog collection -> (record name, ID keyword of its lookup).
+_ADJUSTMENTS = {"discounts": ("discount", "discount_id"), "taxes": ("tax", "tax_id")}
+
+
+def to_decimal(value) -> Decimal:
+    """Convert an API amount (str, int or float) to Decimal without binary float artifacts."""
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, float):
+        return Decimal(repr(value))
+    return Decimal(value if value not in (None, "") else 0)
+
+
+def minor_unit(currency: str) -> Decimal:
+    """Return the smallest amount of `currency`, e.g. Decimal("0.01") for USD."""
+    return Decimal(1).scaleb(-CURRENCY_DECIMALS.get(currency.upper(), 2))
+
+
+class InvoiceTotals:
+    """
+    Compute E-Invoice line and invoice totals locally, before the invoice is created.
+
+    Prices come from the invoice items or, when an item has none, from the catalog's
+    price of the product in the invoice currency; taxes and discounts are looked up
+    in the catalog by ID. All arithmetic is done with `Decimal` and every amount is
+    rounded half up to the currency's minor unit as soon as it is computed:
+
+        line subtotal  = price x quantity
+        line discount  = subtotal x rate (percentage) or the flat amount, at most the subtotal
+        line tax       = (subtotal - discount) x rate (percentage) or the flat amount
+        line total     = subtotal - discount + tax
+
+    The invoice-level discount then applies to the sum of the discounted lines, and
+    the invoice-level tax to that amount less the invoice discount. Flat discounts
+    and taxes must be in the invoice currency.
+
+    Rates and prices are converted once per instance and reused across invoices, so
+    keep one instance for a batch; `refresh` drops them after the catalog changes.
+    """
+
+    def __init__(self, catalog):
+        """
+        Args:
+            catalog (InvoiceCatalog): Source of product prices, taxes and discounts.
+        """
+        self.catalog = catalog
+        self._adjustments = {}
+        self._prices = {}
+
+    def compute(self, invoice: dict) -> dict:
+        """
+        Compute the totals of one invoice.
+
+        Args:
+            invoice (dict): `Einvoice.create_invoice` params; `currency` and `items` are
+                used, each item with `product_id`, `quantity` (default 1) and optionally
+                `price`, `tax_id` and `discount_id`, and the invoice with optionally
+                `tax_id` and `discount_id`.
+
+        Returns:
+            dict: `currency`; `items`, one dict per line with `product_id`, `quantity`,
+                `price`, `subtotal`, `discount`, `tax` and `total`; and the invoice's
+                `subtotal`, `discount`, `tax` and `total`, all as `Decimal`.
+        """
+        currency = (invoice.get("currency") or "").upper()
+        if not currency:
+            raise ValueError("'currency' is required.")
+        unit = minor_unit(currency)
+
+        lines = [self._line(item, currency, unit) for item in invoice.get("items") or []]
+        subtotal = sum((line["subtotal"] for line in lines), ZERO)
+        discounted = sum((line["subtotal"] - line["discount"] for line in lines), ZERO)
+        line_tax = sum((line["tax"] for line in lines), ZERO)
+
+        invoice_discount = min(self._adjust("discounts", invoice.get("discount_id"), discounted, currency, unit), discounted)
+        invoice_tax = self._adjust("taxes", invoice.get("tax_id"), discounted - invoice_discount, currency, unit)
+        discount = subtotal - discounted + invoice_discount
+        tax = line_tax + invoice_tax
+        return {
+            "currency": currency,
+            "items": lines,
+            "subtotal": subtotal,
+            "discount": discount,
+            "tax": tax,
+            "total": subtotal - discount + tax,
+        }
+
+    def compute_many(self, invoices) -> list:
+        """Compute the totals of many invoices, see `compute`."""
+        return [self.compute(invoice) for invoice in invoices]
+
+    def refresh(self) -> None:
+        """Forget the converted prices and rates, after the catalog has been updated."""
+        self._adjustments.clear()
+        self._prices.clear()
+
+    def _line(self, item: dict, currency: str, unit: Decimal) -> dict:
+        product_id = item.get("product_id")
+        quantity = to_decimal(item.get("quantity", 1))
+        price = item.get("price")
+        price = self._catalog_price(product_id, currency) if price is None else to_decimal(price)
+
+        subtotal = (price * quantity).quantize(unit, ROUND_HALF_UP)
+        discount = min(self._adjust("discounts", item.get("discount_id"), subtotal, currency, unit), subtotal)
+        tax = self._adjust("taxes", item.get("tax_id"), subtotal - discount, currency, unit)
+        return {
+            "product_id": product_id,
+            "quantity": quantity,
+            "price": price,
+            "subtotal": subtotal,
+            "discount": discount,
+            "tax": tax,
+            "total": subtotal - discount + tax,
+        }
+
+    def _catalog_price(self, product_id: str, currency: str) -> Decimal:
+        key = (product_id, currency)
+        price = self._prices.get(key)
+        if price is None:
+            value = self.catalog.price(product_id, currency) if product_id else None
+            if value is None:
+                raise ValueError(f"Product {product_id!r} has no price in {currency}.")
+            price = self._prices[key] = to_decimal(value)
+        return price
+
+    def _adjust(self, kind: str, record_id: str, base: Decimal, currency: str, unit: Decimal) -> Decimal:
+        """Return the discount or tax `record_id` amounts to on `base`."""
+        if not record_id:
+            return ZERO
+        adjustment = self._adjustments.get((kind, record_id))
+        if adjustment is None:
+            adjustment = self._adjustments[(kind, record_id)] = self._load_adjustment(kind, record_id)
+        flat, value, flat_currency = adjustment
+        if not flat:
+            return (base * value).quantize(unit, ROUND_HALF_UP)
+        if flat_currency and flat_currency != currency:
+            raise ValueError(f"Flat {_ADJUSTMENTS[kind][0]} {record_id!r} is in {flat_currency}, not {currency}.")
+        return value.quantize(unit, ROUND_HALF_UP)
+
+    def _load_adjustment(self, kind: str, record_id: str) -> tuple:
+        name, id_keyword = _ADJUSTMENTS[kind]
+        record = getattr(self.catalog, name)(**{id_keyword: record_id})
+        if record is None:
+            raise ValueError(f"Unknown {name}: {record_id!r}.")
+        flat = (record.get("type") or "percentage") == "flat"
+        value = to_decimal(record.get("value"))
+        return flat, value if flat else value / HUNDRED, (record.get("currency") or "").upper() or None
@@ -0,0 +1,393 @@
+import asyncio
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fasterpay import forksafety
+from fasterpay.idempotency import new_idempotency_key
+from fasterpay.instrumentation import Histogram
+from fasterpay.transport import is_unsent
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    operation TEXT NOT NULL,
+    ordering_key TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    idempotency_key TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    enqueued REAL NOT NULL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (state, ordering_key, id);
+"""
+
+# The oldest pending call of every payment that is due: later calls for the same
+# payment wait until it has been sent or given up.
+_DUE = """
+SELECT id, operation, payload, idempotency_key, attempts, enqueued FROM outbox
+WHERE id IN (SELECT MIN(id) FROM outbox WHERE state = 'pending' GROUP BY ordering_key)
+AND next_attempt <= ?
+ORDER BY id
+LIMIT ?
+"""
+
+_NEXT_ATTEMPT = """
+SELECT MIN(next_attempt) FROM outbox
+WHERE id IN (SELECT MIN(id) FROM outbox WHERE state = 'pending' GROUP BY ordering_key)
+"""
+
+
+class Outbox:
+    """
+    Durable local queue for delivery confirmations and refunds.
+
+    `deliver` and `refund` only append the call to a SQLite database and return its
+    ID, keeping FasterPay out of the caller's latency. A drainer (`start` for a
+    worker thread, `run` for an asyncio task, or `drain` called directly) sends due
+    calls in batches through the gateway's pooled transport.
+
+    Calls for the same payment are sent one at a time, in the order they were
+    queued. A call is only retried, with exponential backoff, when it provably was
+    not applied: connecting to FasterPay failed, or it was answered 429. After a
+    read timeout, a dropped connection or a 5xx response the call may have been
+    applied, and FasterPay does not document deduplicating the idempotency key sent
+    with it: such calls are marked `unknown`, to be checked against FasterPay and
+    settled with `resolve`. Calls rejected with another 4xx response, or failing
+    `max_attempts` times, are kept as dead entries for inspection. Either way later
+    calls for the same payment are sent. Run a single drainer per database.
+    """
+
+    def __init__(
+        self,
+        gateway,
+        path: str,
+        batch_size: int = 50,
+        max_workers: int = 8,
+        max_attempts: int = 10,
+        backoff: float = 1.0,
+        max_backoff: float = 300.0,
+        poll_interval: float = 1.0,
+        synchronous: str = "NORMAL",
+    ):
+        """
+        Args:
+            gateway (Gateway): Gateway used to send the calls.
+            path (str): SQLite database file, created if missing.
+            batch_size (int): Calls fetched per batch.
+            max_workers (int): Calls of a batch sent concurrently.
+            max_attempts (int): Attempts before a call that was never applied is given up.
+            backoff (float): Delay before the first retry, doubled on every attempt.
+            max_backoff (float): Upper bound of the retry delay.
+            poll_interval (float): Seconds the worker sleeps when nothing is due.
+            synchronous (str): SQLite `synchronous` setting. "NORMAL" survives process
+                crashes; use "FULL" to also survive power loss, at the cost of an
+                fsync per queued call.
+        """
+        if batch_size < 1 or max_workers < 1 or max_attempts < 1:
+            raise ValueError("batch_size, max_workers and max_attempts must be at least 1.")
+        self.gateway = gateway
+        self.path = path
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+
+        self._lock = threading.Lock()
+        self._synchronous = synchronous
+        self._db = self._connect()
+
+        self._executor = None
+        self._worker = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._latency = Histogram()
+        self.sent = 0
+        self.retried = 0
+        self.given_up = 0
+        self.ambiguous = 0
+        forksafety.register(self)
+
+    def deliver(self, delivery_info: dict) -> int:
+        """
+        Queue a delivery confirmation, see `Transaction.deliver`.
+
+        Returns:
+            int: ID of the queued call.
+        """
+        payment_id = delivery_info.get("payment_id")
+        if not payment_id:
+            raise ValueError("delivery_info must contain a payment_id.")
+        return self._enqueue("deliver", payment_id, delivery_info)
+
+    def refund(self, order_id: str, amount: float) -> int:
+        """
+        Queue a refund, see `Transaction.refund`.
+
+        Returns:
+            int: ID of the queued call.
+        """
+        if not order_id or amount < 0:
+            raise ValueError("order_id is required and amount must be non-negative.")
+        return self._enqueue("refund", order_id, {"order_id": order_id, "amount": amount})
+
+    def drain(self, max_batches: int = None) -> int:
+        """
+        Send due calls until none is left, or `max_batches` batches were sent.
+
+        Returns:
+            int: Number of calls attempted.
+        """
+        attempted = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            count = self._drain_batch()
+            if not count:
+                break
+            attempted += count
+            batches += 1
+        return attempted
+
+    def start(self) -> None:
+        """Drain the outbox on a background thread until `stop` is called."""
+        with self._lock:
+            if self._worker is not None:
+                return
+            self._stopping.clear()
+            self._worker = threading.Thread(target=self._work, name="fasterpay-outbox", daemon=True)
+            self._worker.start()
+
+    def stop(self, timeout: float = None) -> None:
+        """Stop the background worker after its current batch."""
+        self._stopping.set()
+        self._wakeup.set()
+        worker, self._worker = self._worker, None
+        if worker is not None:
+            worker.join(timeout)
+
+    async def run(self) -> None:
+        """
+        Drain the outbox from an asyncio task until cancelled.
+
+        Batches are sent on a worker thread, so the event loop is not blocked.
+        """
+        while True:
+            count = await asyncio.to_thread(self._drain_batch)
+            if not count:
+                await asyncio.sleep(self._idle_delay())
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: `depth` (pending calls), `due`, `dead`, `unknown`, `oldest_age`
+            (seconds since the oldest pending call was queued), `sent`, `retried`,
+            `given_up` and `ambiguous` counters, and `latency`, the time from queueing
+            to a successful send (count, mean, p50, p90, p99 in seconds).
+        """
+        now = time.time()
+        with self._lock:
+            depth, due, oldest = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(next_attempt <= ?), 0), MIN(enqueued) "
+                "FROM outbox WHERE state = 'pending'",
+                (now,),
+            ).fetchone()
+            counts = dict(self._db.execute(
+                "SELECT state, COUNT(*) FROM outbox WHERE state IN ('dead', 'unknown') GROUP BY state"
+            ).fetchall())
+            return {
+                "depth": depth,
+                "due": due,
+                "dead": counts.get("dead", 0),
+                "unknown": counts.get("unknown", 0),
+                "oldest_age": now - oldest if oldest is not None else 0.0,
+                "sent": self.sent,
+                "retried": self.retried,
+                "given_up": self.given_up,
+                "ambiguous": self.ambiguous,
+                "latency": self._latency.summary(),
+            }
+
+    def dead(self) -> list:
+        """
+        Returns:
+            list: Given-up calls as dicts with `id`, `operation`, `payload`, `attempts`
+            and `last_error`.
+        """
+        return self._entries("dead")
+
+    def unknown(self) -> list:
+        """
+        Returns:
+            list: Calls that may or may not have been applied, as dicts like `dead`.
+            Check each against FasterPay, e.g. the payment's refunds, then `resolve` it.
+        """
+        return self._entries("unknown")
+
+    def resolve(self, call_id: int, applied: bool) -> None:
+        """
+        Settle a call of `unknown` once checked against FasterPay.
+
+        Args:
+            call_id (int): ID returned when the call was queued.
+            applied (bool): Whether FasterPay applied it. An applied call is removed;
+                one that was not is queued again, keeping its idempotency key.
+        """
+        with self._lock:
+            if applied:
+                cursor = self._db.execute("DELETE FROM outbox WHERE id = ? AND state = 'unknown'", (call_id,))
+            else:
+                cursor = self._db.execute(
+                    "UPDATE outbox SET state = 'pending', next_attempt = ? WHERE id = ? AND state = 'unknown'",
+                    (time.time(), call_id),
+                )
+        if not cursor.rowcount:
+            raise ValueError(f"No call {call_id} of unknown outcome in the outbox.")
+        self._wakeup.set()
+
+    def requeue_dead(self) -> int:
+        """
+        Queue all given-up calls again, keeping their idempotency keys.
+
+        Returns:
+            int: Number of calls queued again.
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE outbox SET state = 'pending', attempts = 0, next_attempt = ? WHERE state = 'dead'",
+                (time.time(),),
+            )
+        self._wakeup.set()
+        return cursor.rowcount
+
+    def close(self) -> None:
+        self.stop()
+        if self._executor is not None:
+            self._executor.shutdown()
+        self._db.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(f"PRAGMA synchronous={self._synchronous}")
+        db.executescript(_SCHEMA)
+        return db
+
+    def _after_fork(self) -> None:
+        # SQLite connections must not be used across fork(), and the drainer's
+        # threads were not copied; the child opens its own and may start its own.
+        self._lock = threading.Lock()
+        self._db = self._connect()
+        self._executor = None
+        self._worker = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+    def _entries(self, state: str) -> list:
+        codec = self.gateway.json_codec
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, operation, payload, attempts, last_error FROM outbox WHERE state = ? ORDER BY id", (state,)
+            ).fetchall()
+        return [
+            {"id": row[0], "operation": row[1], "payload": codec.loads(row[2]), "attempts": row[3], "last_error": row[4]}
+            for row in rows
+        ]
+
+    def _enqueue(self, operation: str, ordering_key: str, payload: dict) -> int:
+        data = self.gateway.json_codec.dumps(payload)
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO outbox (operation, ordering_key, payload, idempotency_key, next_attempt, enqueued) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (operation, str(ordering_key), data, new_idempotency_key(), now, now),
+            )
+        self._wakeup.set()
+        return cursor.lastrowid
+
+    def _drain_batch(self) -> int:
+        with self._lock:
+            rows = self._db.execute(_DUE, (time.time(), self.batch_size)).fetchall()
+            if rows and self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="fasterpay-outbox-send")
+        if not rows:
+            return 0
+        # Every row belongs to a different payment, so the batch can be sent concurrently.
+        outcomes = list(self._executor.map(self._send, rows))
+        with self._lock:
+            for row, error in zip(rows, outcomes):
+                self._settle(row, error)
+        return len(rows)
+
+    def _send(self, row):
+        _, operation, payload, idempotency_key, _, _ = row
+        payload = self.gateway.json_codec.loads(payload)
+        transaction = self.gateway.transaction()
+        try:
+            if operation == "deliver":
+                transaction.deliver(payload, idempotency_key=idempotency_key)
+            else:
+                transaction.refund(payload["order_id"], payload["amount"], idempotency_key=idempotency_key)
+        except Exception as error:
+            return error
+        return None
+
+    def _settle(self, row, error) -> None:
+        row_id, _, _, _, attempts, enqueued = row
+        if error is None:
+            self._db.execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+            self._latency.observe(time.time() - enqueued)
+            self.sent += 1
+            return
+
+        attempts += 1
+        status = getattr(getattr(error, "response", None), "status_code", None)
+        message = f"{type(error).__name__}: {error}"
+        unapplied = status == 429 or (status is None and is_unsent(error))
+        if not unapplied and (status is None or status >= 500):
+            # Sent and not rejected: it may have been applied, so it is not sent again.
+            self._db.execute(
+                "UPDATE outbox SET state = 'unknown', attempts = ?, last_error = ? WHERE id = ?",
+                (attempts, message, row_id),
+            )
+            self.ambiguous += 1
+            return
+        if not unapplied or attempts >= self.max_attempts:
+            self._db.execute(
+                "UPDATE outbox SET state = 'dead', attempts = ?, last_error = ? WHERE id = ?",
+                (attempts, message, row_id),
+            )
+            self.given_up += 1
+            return
+
+        delay = min(self.backoff * 2 ** (attempts - 1), self.max_backoff) * (0.5 + random.random())
+        self._db.execute(
+            "UPDATE outbox SET attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+            (attempts, time.time() + delay, message, row_id),
+        )
+        self.retried += 1
+
+    def _idle_delay(self) -> float:
+        with self._lock:
+            next_attempt = self._db.execute(_NEXT_ATTEMPT).fetchone()[0]
+        if next_attempt is None:
+            return self.poll_interval
+        return min(max(next_attempt - time.time(), 0.0), self.poll_interval)
+
+    def _work(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                count = self._drain_batch()
+            except Exception:
+                count = 0
+                self._stopping.wait(self.poll_interval)
+            if count:
+                continue
+            self._wakeup.wait(self._idle_delay())
+            self._wakeup.clear()
@@ -0,0 +1,44 @@
+def page_records(response: dict) -> list:
+    """
+    Extract the list of records from a paginated API response.
+
+    Handles both `{"data": [...]}` and the nested `{"data": {"data": [...], ...}}` shapes.
+    Inside `response_mode("stream")` list methods already return an iterator over the
+    records, which is returned as is: count the records while iterating, not with `len`.
+
+    Raises:
+        TypeError: The page is the undecoded body returned in `response_mode("raw")`.
+    """
+    if isinstance(response, (bytes, bytearray, memoryview)):
+        raise TypeError('Cannot extract records from an undecoded page: list it outside response_mode("raw").')
+    data = response.get("data", []) if isinstance(response, dict) else response
+    if isinstance(data, dict):
+        data = data.get("data", [])
+    return data or []
+
+
+def iter_records(fetch, params: dict = None, per_page: int = 1000):
+    """
+    Yield every record of a paginated listing, requesting one page at a time.
+
+    Args:
+        fetch (callable): A list method such as `Contact.list_contacts`.
+        params (dict, optional): Filters passed on every page request.
+        per_page (int): Page size used when `params` does not set one (max 1000).
+
+    Yields:
+        dict: Individual records, in the order returned by the API. Inside
+        `response_mode("stream")` each page is parsed while it is read.
+    """
+    params = dict(params or {})
+    params.setdefault("per_page", per_page)
+    page = params.pop("page", 1)
+
+    while True:
+        count = 0
+        for record in page_records(fetch({**params, "page": page})):
+            count += 1
+            yield record
+        if count < int(params["per_page"]):
+            return
+        page += 1
@@ -1,6 +1,8 @@
 import html
 
 class PaymentForm:
+    __slots__ = ("gateway",)
+
     def __init__(self, gateway):
         self.gateway = gateway
 
@@ -50,21 +52,27 @@ class PaymentForm:
         sign_version = payload.get("sign_version", "v1")    
         payload["hash"] = self.gateway.signature().calculate_hash(payload, sign_version)
 
-        form_fields = "\n".join(
-            f'<input type="hidden" name="{html.escape(str(k))}" value="{html.escape(str(v))}" />'
-            for k, v in payload.items()
-        )
+        form_fields = "\n".join(hidden_input(k, v) for k, v in payload.items())
+        return render_form(self.gateway.config.api_url, form_fields, parameters.get("auto_submit_form"))
+
+
+def hidden_input(name, value) -> str:
+    """Render one hidden form field."""
+    return f'<input type="hidden" name="{html.escape(str(name))}" value="{html.escape(str(value))}" />'
+
 
-        form = f'''
-            <form align="center" method="post" action="{self.gateway.config.api_url}/payment/form">
+def render_form(api_url: str, form_fields: str, auto_submit: bool = False) -> str:
+    """Wrap rendered form fields in the checkout form posting to FasterPay."""
+    form = f'''
+            <form align="center" method="post" action="{api_url}/payment/form">
             {form_fields}
             <input type="Submit" value="Pay Now" id="fasterpay-submit"/>
             </form>
             '''.strip()
 
-        if parameters.get("auto_submit_form"):
-            form += '\n<script type="text/javascript">document.getElementById("fasterpay-submit").click();</script>'
+    if auto_submit:
+        form += '\n<script type="text/javascript">document.getElementById("fasterpay-submit").click();</script>'
 
-        return form
+    return form
     
     
\ No newline at end of file
@@ -1,12 +1,12 @@
-import requests
-
 class Payout:
+    __slots__ = ("gateway", "api_url", "api_key")
+
     def __init__(self, gateway):
         self.gateway = gateway
         self.api_url = gateway.config.external_api_url
         self.api_key = gateway.config.private_key
 
-    def create_payout(self, params: dict) -> dict:
+    def create_payout(self, params: dict, idempotency_key: str = None) -> dict:
         """
         Create one or more payouts in a single request.
 
@@ -32,6 +32,10 @@ class Payout:
                 - additional_information (str, optional)
                 - reference_id (str, optional): Unique ID in your system.
 
+        Idempotency:
+            - idempotency_key (str, optional): Makes the call retried when connecting fails,
+              and deduplicated by the journal once it completed. Without one it is sent once.
+
         Endpoint:
             POST https://business.fasterpay.com/api/external/payouts
 
@@ -54,20 +58,32 @@ class Payout:
             "Content-Type": "application/json"
         }
 
-        response = requests.post(url, json=params, headers=headers)
+        response = self.gateway.transport.request(
+            "POST", url, json=params, headers=headers,
+            idempotency_key=idempotency_key,
+        )
         response.raise_for_status()
-        return response.json()
+        return self.gateway.transport.decode(response)
     
-    def list_payouts(self) -> dict:
-        """Retrieve a list of payouts."""
+    def list_payouts(self, params: dict = None) -> dict:
+        """
+        Retrieve a list of payouts.
+
+        Args:
+            params (dict, optional): Query parameters, e.g. `page`, `per_page`, and
+                `sort_by` with `order_by`.
+
+        Returns:
+            dict: Paginated list of payouts.
+        """
         url = f"{self.api_url}/api/external/payouts"
         headers = {
             "X-ApiKey": self.api_key,
             "Content-Type": "application/json"
         }
-        response = requests.get(url, headers=headers)
+        response = self.gateway.transport.request("GET", url, params=params or {}, headers=headers)
         response.raise_for_status()
-        return response.json()
+        return self.gateway.transport.decode(response, listing=True)
     
     def get_payout(self, payout_id: str) -> dict:
         """Retrieve details of a specific payout by ID."""
@@ -80,6 +96,31 @@ class Payout:
             "Content-Type": "application/json"
         }
 
-        response = requests.get(url, headers=headers)
+        response = self.gateway.transport.request("GET", url, headers=headers)
         response.raise_for_status()
-        return response.json()
+        return self.gateway.transport.decode(response)
+
+    def get_payouts(self, payout_ids: list, max_workers: int = None):
+        """
+        Retrieve many payouts concurrently, e.g. to poll the status of a batch.
+
+        Concurrency follows the transport's adaptive limiter, which raises it while
+        FasterPay answers quickly and cuts it on 429s, 5xx responses and rising latency.
+
+        Args:
+            payout_ids (list): IDs of the payouts.
+            max_workers (int, optional): Upper bound on concurrent requests.
+
+        Yields:
+            dict: Per-payout outcome, in completion order, with keys `payout_id`,
+                `payout` (API response) and `error` (None on success).
+        """
+        def get(payout_id):
+            outcome = {"payout_id": payout_id, "payout": None, "error": None}
+            try:
+                outcome["payout"] = self.get_payout(payout_id)
+            except Exception as error:
+                outcome["error"] = error
+            return outcome
+
+        return self.gateway.transport.limiter.map_unordered(get, payout_ids, max_workers)
@@ -1,8 +1,30 @@
+import hmac
+
+
 class Pingback:
+    __slots__ = ("gateway",)
+
     def __init__(self, gateway):
         self.gateway = gateway
 
-    def validate(self, pingbackdata: str, headers: dict) -> bool:
+    def validate(self, pingbackdata, headers: dict, journal: bool = True) -> bool:
+        """
+        Check that a pingback was sent by FasterPay.
+
+        Args:
+            pingbackdata (bytes or str): Raw request body; pass the bytes as received.
+            headers (dict): Request headers, at least the `X-Fasterpay-Signature*` or
+                `X-ApiKey` ones.
+            journal (bool): Record the pingback in the gateway's pingback journal, if
+                one is configured.
+        """
+        valid = self._validate(pingbackdata, headers)
+        pingback_journal = self.gateway.pingback_journal if journal else None
+        if pingback_journal is not None and pingbackdata:
+            pingback_journal.append(pingbackdata, headers, valid)
+        return valid
+
+    def _validate(self, pingbackdata, headers: dict) -> bool:
         if not headers or not pingbackdata:
             return False
 
@@ -10,10 +32,15 @@ class Pingback:
 
         if signature_version == "v2":
             expected_signature = self.gateway.signature().calculate_pingback_hash(pingbackdata)
-            received_signature = headers.get("X-Fasterpay-Signature")
-            return expected_signature == received_signature
+            received_signature = headers.get("X-Fasterpay-Signature") or ""
+            return hmac.compare_digest(expected_signature.encode(), received_signature.encode())
 
         # Fallback to v1: compare API keys (legacy)
-        api_key = headers.get("X-ApiKey")
-        return api_key == self.gateway.config.private_key
-    
+        api_key = headers.get("X-ApiKey") or ""
+        return hmac.compare_digest(api_key.encode(), self.gateway.config.private_key.encode())
+
+    def parse(self, pingbackdata) -> dict:
+        """Decode a pingback body (str or bytes) with the gateway's JSON codec."""
+        if not pingbackdata:
+            raise ValueError("pingbackdata is required.")
+        return self.gateway.json_codec.loads(pingbackdata)
@@ -0,0 +1,322 @@
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+
+from fasterpay import forksafety
+from fasterpay.redaction import REDACTED, SECRET_HEADERS
+
+# Record framing in segment files: CRC32 of headers + body, timestamp, headers and body lengths.
+_RECORD = struct.Struct("<IdII")
+# Sidecar index entries: record offset, timestamp, signature valid flag, event type.
+_ENTRY = struct.Struct("<Qd?31s")
+_EVENT = re.compile(rb'"event"\s*:\s*"([^"]{0,31})"')
+
+
+class JournalRecord:
+    """
+    One journaled pingback.
+
+    `body` is a memoryview into the memory-mapped segment and is only valid while the
+    replay that produced it is being iterated; copy it with `bytes(record.body)` to
+    keep it.
+    """
+
+    __slots__ = ("timestamp", "event", "valid", "segment", "offset", "body", "_headers")
+
+    def __init__(self, timestamp, event, valid, segment, offset, headers, body):
+        self.timestamp = timestamp
+        self.event = event
+        self.valid = valid
+        self.segment = segment
+        self.offset = offset
+        self._headers = headers
+        self.body = body
+
+    @property
+    def headers(self) -> dict:
+        return json.loads(bytes(self._headers))
+
+
+class PingbackJournal:
+    """
+    Append-only journal of raw pingbacks, for audit and replay.
+
+    Bodies and headers are appended as length-prefixed, checksummed records to
+    numbered segment files in `directory`, each with a sidecar index of fixed-size
+    entries (offset, timestamp, signature validity, event type). Replays filter on the
+    index, then read the matching records from memory-mapped segments without
+    copying them. A record torn by a crash is discarded when the journal is reopened.
+
+    Credentials are not journaled: the values of `redact_headers`, by default
+    `X-ApiKey` (the private key, on v1 pingbacks) and other credential headers, are
+    replaced by REDACTED. `verify` cannot check v1 pingbacks again; v2 pingbacks keep
+    their `X-Fasterpay-Signature`, an HMAC of the body, and are checked.
+
+    Enable it with `Gateway(pingback_journal=directory)` to record every pingback
+    passed to `Pingback.validate`. A journal directory takes appends from one process
+    at a time: give every worker of a pre-forking server its own directory.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_size: int = 64 * 1024 * 1024,
+        fsync: bool = False,
+        redact_headers=SECRET_HEADERS,
+    ):
+        """
+        Args:
+            directory (str): Directory holding the segment and index files.
+            segment_size (int): Size, in bytes, after which a new segment is started.
+            fsync (bool): Flush every record to disk before `append` returns.
+            redact_headers (iterable): Headers, case-insensitive, whose values are
+                replaced by REDACTED.
+        """
+        self.directory = directory
+        self.segment_size = segment_size
+        self.fsync = fsync
+        self.redact_headers = frozenset(name.lower() for name in redact_headers)
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        segments = self.segments()
+        self._segment = segments[-1] if segments else 0
+        # Without fsync, a crash can lose the tail of a segment that is no longer the
+        # last one; earlier segments are only scanned in full when their index is off.
+        for segment in segments[:-1]:
+            if not self._intact(segment):
+                self._recover(segment)
+        if segments:
+            self._recover(self._segment)
+        self._open(self._segment)
+        forksafety.register(self)
+
+    def append(self, body, headers: dict, valid: bool) -> None:
+        """
+        Journal one pingback.
+
+        Args:
+            body (bytes or str): Raw pingback body.
+            headers (dict): Pingback request headers.
+            valid (bool): Whether the signature was valid.
+        """
+        body = body.encode() if isinstance(body, str) else bytes(body)
+        headers = {
+            name: REDACTED if name.lower() in self.redact_headers else value
+            for name, value in (headers or {}).items()
+        }
+        header_bytes = json.dumps(headers, separators=(",", ":"), default=str).encode()
+        match = _EVENT.search(body)
+        event = match.group(1) if match else b""
+        timestamp = time.time()
+        record = _RECORD.pack(zlib.crc32(body, zlib.crc32(header_bytes)), timestamp, len(header_bytes), len(body))
+
+        with self._lock:
+            if self._size and self._size + len(record) + len(header_bytes) + len(body) > self.segment_size:
+                self._rotate()
+            offset = self._size
+            os.write(self._data, record + header_bytes + body)
+            os.write(self._index, _ENTRY.pack(offset, timestamp, valid, event))
+            if self.fsync:
+                os.fsync(self._data)
+                os.fsync(self._index)
+            self._size += len(record) + len(header_bytes) + len(body)
+
+    def records(self, start: float = None, end: float = None, events=None, valid: bool = None):
+        """
+        Replay journaled pingbacks in the order they were received.
+
+        Args:
+            start (float, optional): Earliest timestamp (seconds since the epoch).
+            end (float, optional): Latest timestamp, exclusive.
+            events (iterable, optional): Event types to include, e.g. {"payment"}.
+            valid (bool, optional): Only pingbacks whose signature was (in)valid.
+
+        Yields:
+            JournalRecord: Matching pingbacks.
+        """
+        wanted = {event.encode() for event in events} if events is not None else None
+        for segment in self.segments():
+            entries = self._entries(segment)
+            if not entries:
+                continue
+            if (start is not None and entries[-1][1] < start) or (end is not None and entries[0][1] >= end):
+                continue
+            selected = [
+                entry for entry in entries
+                if (start is None or entry[1] >= start)
+                and (end is None or entry[1] < end)
+                and (valid is None or entry[2] == valid)
+                and (wanted is None or entry[3].rstrip(b"\0") in wanted)
+            ]
+            if selected:
+                yield from self._read(segment, selected)
+
+    def verify(self, gateway, **filters) -> dict:
+        """
+        Check the signatures of journaled pingbacks again, e.g. after a key rotation.
+
+        Args:
+            gateway (Gateway): Gateway whose keys the pingbacks are checked against.
+            **filters: Passed on to `records`.
+
+        Returns:
+            dict: `checked` and `valid` counts, `redacted`, the number of pingbacks
+            skipped because their credentials were not journaled, and `invalid`, the
+            (segment, offset) of every pingback that does not validate.
+        """
+        pingback = gateway.pingback()
+        checked = passed = redacted = 0
+        invalid = []
+        for record in self.records(**filters):
+            headers = record.headers
+            version = headers.get("X-Fasterpay-Signature-Version", "v1")
+            if headers.get("X-Fasterpay-Signature" if version == "v2" else "X-ApiKey") == REDACTED:
+                redacted += 1
+                continue
+            checked += 1
+            if pingback.validate(record.body, headers, journal=False):
+                passed += 1
+            else:
+                invalid.append((record.segment, record.offset))
+        return {"checked": checked, "valid": passed, "redacted": redacted, "invalid": invalid}
+
+    def segments(self) -> list:
+        """Return the numbers of the segments in the journal, oldest first."""
+        return sorted(int(name[:-4]) for name in os.listdir(self.directory) if name.endswith(".seg"))
+
+    def close(self) -> None:
+        with self._lock:
+            os.close(self._data)
+            os.close(self._index)
+
+    def _after_fork(self) -> None:
+        # Reopen the files so the child appends from the current end of the segment.
+        self._lock = threading.Lock()
+        os.close(self._data)
+        os.close(self._index)
+        self._open(self._segment)
+
+    def _path(self, segment: int, suffix: str) -> str:
+        return os.path.join(self.directory, f"{segment:08d}{suffix}")
+
+    def _open(self, segment: int) -> None:
+        flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT
+        self._data = os.open(self._path(segment, ".seg"), flags, 0o644)
+        self._index = os.open(self._path(segment, ".idx"), flags, 0o644)
+        self._size = os.fstat(self._data).st_size
+
+    def _rotate(self) -> None:
+        os.close(self._data)
+        os.close(self._index)
+        self._segment += 1
+        self._open(self._segment)
+
+    def _entries(self, segment: int) -> list:
+        try:
+            with open(self._path(segment, ".idx"), "rb") as index:
+                data = index.read()
+        except FileNotFoundError:
+            return []
+        usable = len(data) - len(data) % _ENTRY.size
+        return list(_ENTRY.iter_unpack(data[:usable]))
+
+    def _read(self, segment: int, entries: list):
+        with open(self._path(segment, ".seg"), "rb") as data:
+            if os.fstat(data.fileno()).st_size == 0:
+                return
+            mapped = mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        try:
+            for offset, timestamp, valid, event in entries:
+                _, _, header_length, body_length = _RECORD.unpack_from(mapped, offset)
+                start = offset + _RECORD.size
+                yield JournalRecord(
+                    timestamp,
+                    event.rstrip(b"\0").decode(),
+                    valid,
+                    segment,
+                    offset,
+                    view[start:start + header_length],
+                    view[start + header_length:start + header_length + body_length],
+                )
+        finally:
+            view.release()
+            try:
+                mapped.close()
+            except BufferError:
+                pass  # A caller still holds a record body; the map is released with it.
+
+    def _intact(self, segment: int) -> bool:
+        """Whether the index of a segment accounts for exactly its records, without reading the bodies."""
+        entries = self._entries(segment)
+        try:
+            if os.path.getsize(self._path(segment, ".idx")) != len(entries) * _ENTRY.size:
+                return False
+        except FileNotFoundError:
+            return False
+        with open(self._path(segment, ".seg"), "rb") as data:
+            size = os.fstat(data.fileno()).st_size
+            if size == 0:
+                return not entries
+            mapped = mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ)
+        with mapped:
+            position = 0
+            for entry in entries:
+                if entry[0] != position or position + _RECORD.size > size:
+                    return False
+                _, _, header_length, body_length = _RECORD.unpack_from(mapped, position)
+                position += _RECORD.size + header_length + body_length
+        return position == size
+
+    def _recover(self, segment: int) -> None:
+        """Drop a record torn by a crash and index records whose index entry was lost."""
+        data_path = self._path(segment, ".seg")
+        with open(data_path, "rb") as data:
+            content = data.read()
+        entries = self._entries(segment)
+
+        valid_entries = []
+        position = 0
+        for entry in entries:
+            end = _record_end(content, position)
+            if entry[0] != position or end is None:
+                break
+            valid_entries.append(entry)
+            position = end
+
+        while True:
+            end = _record_end(content, position)
+            if end is None:
+                break
+            _, timestamp, header_length, _ = _RECORD.unpack_from(content, position)
+            match = _EVENT.search(content, position + _RECORD.size + header_length, end)
+            # The validity flag of a record whose entry was lost is unknown; mark it invalid.
+            valid_entries.append((position, timestamp, False, match.group(1) if match else b""))
+            position = end
+
+        if position != len(content):
+            with open(data_path, "r+b") as data:
+                data.truncate(position)
+        if valid_entries != entries:
+            with open(self._path(segment, ".idx"), "wb") as index:
+                index.write(b"".join(_ENTRY.pack(*entry) for entry in valid_entries))
+
+
+def _record_end(content: bytes, position: int):
+    """End offset of the record at `position`, or None if it is incomplete or corrupt."""
+    if position + _RECORD.size > len(content):
+        return None
+    checksum, _, header_length, body_length = _RECORD.unpack_from(content, position)
+    start = position + _RECORD.size
+    end = start + header_length + body_length
+    if end > len(content):
+        return None
+    if zlib.crc32(content[start + header_length:end], zlib.crc32(content[start:start + header_length])) != checksum:
+        return None
+    return end
@@ -0,0 +1,321 @@
+import queue
+import threading
+import time
+
+from fasterpay import forksafety
+from fasterpay.instrumentation import Histogram
+
+PINGBACK_HEADERS = ("X-Fasterpay-Signature", "X-Fasterpay-Signature-Version", "X-ApiKey")
+
+_ASGI_HEADERS = {name.lower().encode("latin-1"): name for name in PINGBACK_HEADERS}
+_WSGI_HEADERS = {"HTTP_" + name.upper().replace("-", "_"): name for name in PINGBACK_HEADERS}
+
+_OK = (200, b"OK")
+_INVALID = (400, b"NOK")
+_BUSY = (503, b"Busy")
+_TOO_LARGE = (413, b"Too large")
+_NOT_ALLOWED = (405, b"Method not allowed")
+
+
+class PingbackReceiver:
+    """
+    Verify pingbacks, acknowledge them at once and process them in the background.
+
+    `receive` checks the signature of the raw body, parses it and puts the event on a
+    bounded queue consumed by `workers` threads calling `handler(event, gateway)`, then
+    answers right away. FasterPay therefore gets its acknowledgement without waiting
+    for fulfilment. When the queue is full the pingback is refused with a 503, so
+    FasterPay retries it later instead of the process buffering without bound.
+
+    Events are held in memory only: a pingback acknowledged but not yet handled when
+    the process stops is lost, so keep handlers idempotent and reconcile with the API
+    if that matters. Serve it with `PingbackASGIApp` or `PingbackWSGIMiddleware`.
+    """
+
+    def __init__(
+        self,
+        handler,
+        gateway=None,
+        registry=None,
+        workers: int = 4,
+        max_queue: int = 1000,
+        max_body: int = 1024 * 1024,
+        on_error=None,
+    ):
+        """
+        Args:
+            handler (callable): Called as `handler(event, gateway)` on a worker thread
+                for every accepted pingback; `event` is the decoded body.
+            gateway (Gateway, optional): Gateway validating pingbacks of one merchant.
+            registry (GatewayRegistry, optional): Validates and routes pingbacks of many
+                merchants instead; the handler receives the merchant's gateway.
+            workers (int): Worker threads calling the handler.
+            max_queue (int): Accepted pingbacks waiting for a worker before new ones
+                are refused with a 503.
+            max_body (int): Largest accepted body, in bytes.
+            on_error (callable, optional): Called as `on_error(event, error)` when the
+                handler raises.
+        """
+        if (gateway is None) == (registry is None):
+            raise ValueError("Pass either gateway or registry.")
+        if workers < 1 or max_queue < 1:
+            raise ValueError("workers and max_queue must be at least 1.")
+        self.handler = handler
+        self.gateway = gateway
+        self.registry = registry
+        self.workers = workers
+        self.max_body = max_body
+        self.on_error = on_error
+
+        self._queue = queue.Queue(max_queue)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._wait = Histogram()
+        self._handling = Histogram()
+        self.received = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.refused = 0
+        self.processed = 0
+        self.failed = 0
+        self.max_depth = 0
+        forksafety.register(self)
+
+    def receive(self, body: bytes, headers: dict) -> tuple:
+        """
+        Verify, parse and queue one pingback.
+
+        Args:
+            body (bytes): Raw request body.
+            headers (dict): The `PINGBACK_HEADERS` of the request.
+
+        Returns:
+            tuple: (HTTP status, response body): 200 when queued, 400 when the signature
+            is invalid or the body cannot be parsed, 503 when the queue is full.
+        """
+        with self._lock:
+            self.received += 1
+
+        if self.registry is not None:
+            routed = self.registry.route_pingback(body, headers)
+            gateway = routed[1] if routed else None
+        else:
+            gateway = self.gateway if self.gateway.pingback().validate(body, headers) else None
+
+        event = None
+        if gateway is not None:
+            try:
+                event = gateway.pingback().parse(body)
+            except ValueError:
+                pass
+        if event is None:
+            with self._lock:
+                self.rejected += 1
+            return _INVALID
+
+        try:
+            self._queue.put_nowait((event, gateway, time.perf_counter()))
+        except queue.Full:
+            with self._lock:
+                self.refused += 1
+            return _BUSY
+
+        with self._lock:
+            self.accepted += 1
+            depth = self._queue.qsize()
+            if depth > self.max_depth:
+                self.max_depth = depth
+        return _OK
+
+    def start(self) -> None:
+        """Start the worker threads; called by the ASGI app and WSGI middleware on first use."""
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"fasterpay-pingback-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: float = None) -> None:
+        """Stop the workers once every queued pingback has been handled."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join(timeout)
+
+    def metrics(self) -> dict:
+        """
+        Returns:
+            dict: Counters (`received`, `accepted`, `rejected` for invalid pingbacks,
+            `refused` for 503s under backpressure, `processed`, `failed`), the current
+            and highest queue `depth`, `capacity`, and `queue_wait` / `handling`
+            latency summaries (count, mean, p50, p90, p99 in seconds).
+        """
+        with self._lock:
+            return {
+                "received": self.received,
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "refused": self.refused,
+                "processed": self.processed,
+                "failed": self.failed,
+                "depth": self._queue.qsize(),
+                "max_depth": self.max_depth,
+                "capacity": self._queue.maxsize,
+                "queue_wait": self._wait.summary(),
+                "handling": self._handling.summary(),
+            }
+
+    def _after_fork(self) -> None:
+        # Pingbacks queued in the parent are handled there; the child starts its own
+        # workers on first use.
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(self._queue.maxsize)
+        self._threads = []
+
+    def _work(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            event, gateway, queued = item
+            started = time.perf_counter()
+            error = None
+            try:
+                self.handler(event, gateway)
+            except Exception as exception:
+                error = exception
+            finished = time.perf_counter()
+            with self._lock:
+                self._wait.observe(started - queued)
+                self._handling.observe(finished - started)
+                if error is None:
+                    self.processed += 1
+                else:
+                    self.failed += 1
+            if error is not None and self.on_error is not None:
+                try:
+                    self.on_error(event, error)
+                except Exception:
+                    pass
+
+
+class PingbackASGIApp:
+    """
+    ASGI application receiving pingbacks for a `PingbackReceiver`.
+
+    Mount it on the pingback URL, e.g. `app.mount("/pingback", PingbackASGIApp(receiver))`
+    in Starlette or FastAPI, or serve it directly with any ASGI server. Worker threads
+    are started with the lifespan protocol, or on the first pingback.
+    """
+
+    def __init__(self, receiver: PingbackReceiver):
+        self.receiver = receiver
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] != "http":
+            return
+
+        if scope["method"] != "POST":
+            return await _asgi_respond(send, _NOT_ALLOWED)
+
+        receiver = self.receiver
+        receiver.start()
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > receiver.max_body:
+                return await _asgi_respond(send, _TOO_LARGE)
+            chunks.append(chunk)
+            if not message.get("more_body"):
+                break
+
+        headers = {}
+        for name, value in scope["headers"]:
+            canonical = _ASGI_HEADERS.get(name)
+            if canonical is not None:
+                headers[canonical] = value.decode("latin-1")
+        await _asgi_respond(send, receiver.receive(b"".join(chunks), headers))
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.receiver.start()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.receiver.stop()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+class PingbackWSGIMiddleware:
+    """
+    WSGI middleware answering pingbacks posted to `path` with a `PingbackReceiver`.
+
+    Other requests are passed to the wrapped application, e.g.
+    `app.wsgi_app = PingbackWSGIMiddleware(app.wsgi_app, receiver)` in Flask. Without an
+    application every other request gets a 404.
+    """
+
+    def __init__(self, app, receiver: PingbackReceiver, path: str = "/pingback"):
+        self.app = app
+        self.receiver = receiver
+        self.path = path
+
+    def __call__(self, environ, start_response):
+        if environ.get("PATH_INFO") != self.path:
+            if self.app is None:
+                start_response("404 Not Found", [("Content-Type", "text/plain"), ("Content-Length", "9")])
+                return [b"Not found"]
+            return self.app(environ, start_response)
+
+        receiver = self.receiver
+        if environ["REQUEST_METHOD"] != "POST":
+            return _wsgi_respond(start_response, _NOT_ALLOWED)
+        try:
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            length = 0
+        if length > receiver.max_body:
+            return _wsgi_respond(start_response, _TOO_LARGE)
+
+        receiver.start()
+        body = environ["wsgi.input"].read(length) if length else b""
+        headers = {}
+        for key, name in _WSGI_HEADERS.items():
+            value = environ.get(key)
+            if value is not None:
+                headers[name] = value
+        return _wsgi_respond(start_response, receiver.receive(body, headers))
+
+
+_REASONS = {200: "OK", 400: "Bad Request", 405: "Method Not Allowed", 413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+async def _asgi_respond(send, response) -> None:
+    status, body = response
+    headers = [(b"content-type", b"text/plain"), (b"content-length", str(len(body)).encode())]
+    if status == 503:
+        headers.append((b"retry-after", b"1"))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+def _wsgi_respond(start_response, response) -> list:
+    status, body = response
+    headers = [("Content-Type", "text/plain"), ("Content-Length", str(len(body)))]
+    if status == 503:
+        headers.append(("Retry-After", "1"))
+    start_response(f"{status} {_REASONS[status]}", headers)
+    return [body]
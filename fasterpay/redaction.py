@@ -0,0 +1,10 @@
+# Credentials kept out of anything the SDK writes to disk: cassettes and pingback journals.
+
+REDACTED = "[REDACTED]"
+
+# Request and response headers carrying credentials. `X-ApiKey` is the private key on
+# v1 pingbacks; `X-Fasterpay-Signature`, an HMAC of the body, is not one.
+SECRET_HEADERS = frozenset({"authorization", "cookie", "proxy-authorization", "set-cookie", "x-apikey"})
+
+# Query parameters and JSON fields whose values are replaced by REDACTED.
+SECRET_FIELDS = frozenset({"api_key", "hash", "password", "private_key", "signature", "token"})
@@ -1,33 +1,58 @@
 from urllib.parse import urlencode
 import hashlib
 import hmac
+import time
 
 class Signature:
+    __slots__ = ("gateway", "_hmac")
+
     def __init__(self, gateway):
         self.gateway = gateway
+        # Keyed HMAC state is computed once and copied for every signature.
+        self._hmac = hmac.new(gateway.config.private_key.encode(), digestmod=hashlib.sha256)
 
     def _sorted_items(self, params: dict) -> list[tuple[str, str]]:
         return sorted(params.items())
 
     def calculate_hash(self, params: dict, scheme: str = "v1") -> str:
+        if self.gateway.tracers:
+            started = time.perf_counter()
+            signature = self._calculate_hash(params, scheme)
+            self._report(scheme, time.perf_counter() - started)
+            return signature
+        return self._calculate_hash(params, scheme)
+
+    def _calculate_hash(self, params: dict, scheme: str) -> str:
         if scheme == "v1":
             query_string = urlencode(self._sorted_items(params)) + self.gateway.config.private_key
             return hashlib.sha256(query_string.encode()).hexdigest()
 
         # v2: build manually
         encoded = "".join(f"{k}={v};" for k, v in self._sorted_items(params))
-        return hmac.new(
-            self.gateway.config.private_key.encode(),
-            encoded.encode(),
-            digestmod=hashlib.sha256,
-        ).hexdigest()
-
-    def calculate_pingback_hash(self, pingback_data: str, is_string: bool = True) -> str:
-        if not is_string:
-            raise NotImplementedError("Only string pingback data is currently supported")
-
-        return hmac.new(
-            self.gateway.config.private_key.encode(),
-            pingback_data.encode(),
-            digestmod=hashlib.sha256,
-        ).hexdigest()
+        return self._hmac_hexdigest(encoded.encode())
+
+    def calculate_pingback_hash(self, pingback_data, is_string: bool = True) -> str:
+        """
+        Sign a pingback body.
+
+        `pingback_data` may be the raw request body (bytes or another bytes-like
+        object), which avoids decoding and re-encoding it, or a str, which is UTF-8
+        encoded. `is_string` is kept for
+        backwards compatibility and ignored.
+        """
+        data = pingback_data.encode() if isinstance(pingback_data, str) else pingback_data
+        if self.gateway.tracers:
+            started = time.perf_counter()
+            signature = self._hmac_hexdigest(data)
+            self._report("pingback", time.perf_counter() - started)
+            return signature
+        return self._hmac_hexdigest(data)
+
+    def _report(self, scheme: str, seconds: float) -> None:
+        for tracer in self.gateway.tracers:
+            tracer.on_sign(scheme, seconds)
+
+    def _hmac_hexdigest(self, data: bytes) -> str:
+        mac = self._hmac.copy()
+        mac.update(data)
+        return mac.hexdigest()
@@ -0,0 +1,158 @@
+import asyncio
+import functools
+import threading
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls into one.
+
+    While a call for a key is in flight, further callers with the same key wait for it
+    and receive its result (or its exception) instead of starting their own. Once the
+    call completes the key is forgotten, so later callers start a fresh call; results
+    are never cached.
+
+    `do` coalesces calls made from threads and `do_async` calls made from asyncio
+    tasks of one event loop. `calls` counts calls actually made and `shared` counts
+    callers served by another caller's call, i.e. upstream calls saved.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._async_flights = {}
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, function):
+        """
+        Call `function()`, or wait for the in-flight call with the same key.
+
+        Args:
+            key: Hashable identity of the call.
+            function (callable): Makes the call; invoked by the first caller only.
+
+        Returns:
+            The result of the call.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self.calls += 1
+                leader = True
+            else:
+                self.shared += 1
+                leader = False
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = function()
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result
+
+    async def do_async(self, key, function):
+        """
+        Await `function()`, or the in-flight call with the same key on the running loop.
+
+        Args:
+            key: Hashable identity of the call.
+            function (callable): Returns an awaitable making the call; invoked by the
+                first caller only.
+
+        Returns:
+            The result of the call.
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        with self._lock:
+            flight = self._async_flights.get(flight_key)
+            if flight is None:
+                flight = self._async_flights[flight_key] = _AsyncFlight(loop.create_future())
+                self.calls += 1
+                leader = True
+            else:
+                self.shared += 1
+                leader = False
+        flight.waiters += 1
+
+        if leader:
+            # The call runs in a task of its own, so cancelling the leader does not cancel
+            # it for the followers; it is cancelled once nobody waits for it any more.
+            try:
+                flight.task = asyncio.ensure_future(function())
+            except BaseException:
+                self._forget(flight_key, flight)
+                raise
+            flight.task.add_done_callback(functools.partial(self._land, flight_key, flight))
+
+        try:
+            return await asyncio.shield(flight.future)
+        except asyncio.CancelledError:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.future.done():
+                self._forget(flight_key, flight)
+                flight.task.cancel()
+            raise
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: `{"calls": int, "shared": int, "in_flight": int}`.
+        """
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "shared": self.shared,
+                "in_flight": len(self._flights) + len(self._async_flights),
+            }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.calls = 0
+            self.shared = 0
+
+    def _forget(self, flight_key, flight) -> None:
+        with self._lock:
+            if self._async_flights.get(flight_key) is flight:
+                del self._async_flights[flight_key]
+
+    def _land(self, flight_key, flight, task: asyncio.Task) -> None:
+        self._forget(flight_key, flight)
+        if task.cancelled():
+            flight.future.cancel()
+        elif task.exception() is not None:
+            flight.future.set_exception(task.exception())
+            # Mark the exception as retrieved when no caller is waiting for it.
+            flight.future.exception()
+        else:
+            flight.future.set_result(task.result())
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _AsyncFlight:
+    __slots__ = ("future", "task", "waiters")
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.task = None
+        self.waiters = 0
@@ -0,0 +1,109 @@
+import codecs
+import contextvars
+import json
+import re
+from contextlib import contextmanager
+
+RESPONSE_MODES = ("json", "raw", "stream")
+
+_response_mode = contextvars.ContextVar("fasterpay_response_mode", default="json")
+
+# A `"data"` key whose value is an array: the records of a paginated response.
+_RECORDS_START = re.compile(r'"data"\s*:\s*\[')
+_SEPARATORS = " \t\r\n,"
+
+
+def current_response_mode() -> str:
+    """Return the response mode in effect for the current thread or task."""
+    return _response_mode.get()
+
+
+@contextmanager
+def response_mode(mode: str):
+    """
+    Change how the list methods (`list_invoices`, `list_contacts`, `list_payouts`, ...)
+    return their page inside the block; every other call keeps returning a dict.
+
+    Modes:
+        - "json": Decode the body into a dict (default).
+        - "raw": Return the undecoded body as bytes.
+        - "stream": Stream the body and return an iterator over the records of its
+          `data` array, parsing one record at a time.
+
+    The mode is stored in a context variable, so it applies to the current thread or
+    asyncio task only; helpers that run calls on worker threads are not affected.
+    """
+    if mode not in RESPONSE_MODES:
+        raise ValueError(f"mode must be one of: {', '.join(RESPONSE_MODES)}.")
+    token = _response_mode.set(mode)
+    try:
+        yield
+    finally:
+        _response_mode.reset(token)
+
+
+def iter_records_from_chunks(chunks):
+    """
+    Incrementally parse the records of a paginated JSON response.
+
+    Finds the `"data": [...]` array of the response (at any depth, so both
+    `{"data": [...]}` and `{"data": {"data": [...]}}` work) and yields its elements
+    one by one while the body is still being read. Only the current record and the
+    unparsed remainder of the last chunk are held in memory.
+
+    Args:
+        chunks (iterable): Byte chunks of the response body.
+
+    Yields:
+        Each element of the records array, decoded.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer = ""
+    exhausted = False
+
+    def fill() -> bool:
+        nonlocal buffer, exhausted
+        for chunk in chunks:
+            if chunk:
+                buffer += text.decode(chunk)
+                return True
+        exhausted = True
+        buffer += text.decode(b"", final=True)
+        return False
+
+    while True:
+        match = _RECORDS_START.search(buffer)
+        if match:
+            buffer = buffer[match.end():]
+            break
+        if exhausted:
+            return
+        # Keep a tail long enough to hold a `"data" : [` split across chunks.
+        buffer = buffer[-64:]
+        fill()
+
+    position = 0
+    while True:
+        while position < len(buffer) and buffer[position] in _SEPARATORS:
+            position += 1
+        if position >= len(buffer):
+            buffer, position = "", 0
+            if not fill():
+                raise ValueError("Unterminated records array in response body.")
+            continue
+        if buffer[position] == "]":
+            return
+        try:
+            record, end = decoder.raw_decode(buffer, position)
+        except ValueError:
+            if not fill():
+                raise
+            continue
+        if end == len(buffer) and not exhausted and buffer[position] not in "{[\"":
+            # A bare number may continue in the next chunk.
+            if fill():
+                continue
+        yield record
+        buffer, position = buffer[end:], 0
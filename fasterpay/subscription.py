@@ -1,14 +1,17 @@
-import requests
-
-
 class Subscription:
+    __slots__ = ("gateway", "api_url", "api_key")
+
     def __init__(self, gateway):
         self.gateway = gateway
         self.api_url = gateway.config.api_url
         self.api_key = gateway.config.private_key
 
-    def cancel(self, order_id: str) -> dict:
-        """Cancel a subscription for the given order ID."""
+    def cancel(self, order_id: str, idempotency_key: str = None) -> dict:
+        """
+        Cancel a subscription for the given order ID.
+
+        Retried only when sent with an idempotency key, and only when connecting fails.
+        """
         if not order_id:
             raise ValueError("order_id is required to cancel a subscription.")
 
@@ -18,6 +21,9 @@ class Subscription:
             "Content-Type": "application/json"
         }
 
-        response = requests.post(url, json={}, headers=headers)
+        response = self.gateway.transport.request(
+            "POST", url, json={}, headers=headers,
+            idempotency_key=idempotency_key,
+        )
         response.raise_for_status()
-        return response.json()
+        return self.gateway.transport.decode(response)
@@ -0,0 +1,348 @@
+import asyncio
+import gzip
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PAGINATED = re.compile(r"^/api/external/(invoices(/products|/taxes|/discounts|/templates)?|contacts|payouts)$")
+
+
+class MockFasterPayServer:
+    """
+    Local stand-in for the FasterPay payment and business APIs.
+
+    Serves every endpoint used by the SDK on one port: list endpoints return
+    synthetic paginated records, reads return a single record and writes echo a
+    created record. Latency and error injection are configurable, as is a capacity
+    ceiling: requests beyond `capacity` queue for a processing slot, so latency
+    inflates like on a saturated upstream, and beyond `queue_limit` get a 429.
+
+    Example:
+        with MockFasterPayServer(latency=0.005, error_rate=0.01) as server:
+            gateway = Gateway(public_key, private_key, api_url=server.url, external_api_url=server.url)
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, records: int = 1000, seed: int = 0,
+                 compression: bool = False, capacity: int = None, queue_limit: int = None, statuses: dict = None,
+                 truncate_pdfs: bool = False):
+        """
+        Args:
+            latency (float): Seconds added before every response.
+            jitter (float): Random extra latency, uniformly drawn from [0, jitter].
+            error_rate (float): Fraction of requests answered with 503.
+            records (int): Number of records behind every list endpoint.
+            seed (int): Seed of the random generator used for jitter and errors.
+            compression (bool): Gzip responses of clients accepting it and accept gzip
+                request bodies; otherwise compressed request bodies get a 415.
+            capacity (int, optional): Requests processed at once; unlimited by default.
+                Not applied by `MockHTTP2Server`.
+            queue_limit (int, optional): Requests waiting for a processing slot beyond
+                which new requests are answered with 429.
+            statuses (dict, optional): Error status answering every request to a path,
+                e.g. {"/payment/1167/refund": 422}.
+            truncate_pdfs (bool): Announce the full length of invoice previews, send half
+                of them and close the connection.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.records = records
+        self.compression = compression
+        self.capacity = capacity
+        self.queue_limit = queue_limit
+        self.statuses = statuses or {}
+        self.truncate_pdfs = truncate_pdfs
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.connections = 0
+        # `Idempotency-Key` header of every request, None when absent.
+        self.idempotency_keys = []
+        # (method, path, record ID) of every successful write, in the order answered.
+        self.writes = []
+        self.peak_concurrency = 0
+        self._concurrency = 0
+        self._slots = threading.BoundedSemaphore(capacity) if capacity else None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self) -> "MockFasterPayServer":
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockFasterPayServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _decide(self):
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            failed = self.error_rate and self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        return delay, failed
+
+    def _admit(self) -> bool:
+        """Count a request in; False when it must be throttled because the queue is full."""
+        with self._lock:
+            waiting = self._concurrency - (self.capacity or self._concurrency)
+            if self.queue_limit is not None and waiting >= self.queue_limit:
+                self.requests += 1
+                self.throttled += 1
+                return False
+            self._concurrency += 1
+            self.peak_concurrency = max(self.peak_concurrency, self._concurrency)
+        return True
+
+    def _leave(self) -> None:
+        with self._lock:
+            self._concurrency -= 1
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def do_GET(self):
+                self._respond()
+
+            def do_POST(self):
+                self._respond()
+
+            def do_PUT(self):
+                self._respond()
+
+            def do_DELETE(self):
+                self._respond()
+
+            def log_message(self, *args):
+                pass
+
+            def _respond(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                with server._lock:
+                    server.idempotency_keys.append(self.headers.get("Idempotency-Key"))
+
+                if not server._admit():
+                    return self._send_bytes(*_json(429, {"success": False, "message": "Too many requests"}))
+                try:
+                    if server._slots is not None:
+                        server._slots.acquire()
+                    try:
+                        delay, failed = server._decide()
+                        if delay:
+                            time.sleep(delay)
+                    finally:
+                        if server._slots is not None:
+                            server._slots.release()
+                finally:
+                    server._leave()
+                if self.headers.get("Content-Encoding") == "gzip":
+                    if not server.compression:
+                        return self._send_bytes(415, b"{}", "application/json")
+                    body = gzip.decompress(body)
+                truncate = server.truncate_pdfs and self.path.partition("?")[0].endswith("/pdf")
+                self._send_bytes(*server._route(self.command, self.path, body, failed), truncate=truncate)
+
+            def _send_bytes(self, status, data, content_type, truncate=False):
+                compress = server.compression and len(data) > 1024 and "gzip" in self.headers.get("Accept-Encoding", "")
+                if compress:
+                    data = gzip.compress(data, 6)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                if compress:
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(data)))
+                try:
+                    self.end_headers()
+                    self.wfile.write(data[:len(data) // 2] if truncate else data)
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True  # The client gave up, e.g. on a read timeout.
+                if truncate:
+                    self.close_connection = True
+
+        return Handler
+
+    def _route(self, method: str, target: str, body: bytes, failed: bool):
+        """Return the (status, body, content type) answering a request."""
+        if failed:
+            return _json(503, {"success": False, "message": "Injected failure"})
+        path, _, query = target.partition("?")
+        if path in self.statuses:
+            return _json(self.statuses[path], {"success": False, "message": "Injected status"})
+        if method == "GET" and PAGINATED.match(path):
+            return _json(200, self._page(path, _query(query)))
+        if path.endswith("/pdf"):
+            return 200, b"<html><body>" + b"invoice " * 4096 + b"</body></html>", "text/html"
+        return _json(200, {"success": True, "data": self._record(path, method, body)})
+
+    def _page(self, path: str, query: dict) -> dict:
+        page = int(query.get("page", 1))
+        per_page = min(int(query.get("per_page", 15)), 1000)
+        start = (page - 1) * per_page
+        kind = path.rstrip("/").rsplit("/", 1)[-1]
+        rows = [_synthetic(kind, index) for index in range(start, min(start + per_page, self.records))]
+        return {
+            "success": True,
+            "data": {"current_page": page, "per_page": per_page, "total": self.records, "data": rows},
+        }
+
+    def _record(self, path: str, method: str, body: bytes) -> dict:
+        record = {"id": f"MOCK-{abs(hash((path, body))) % 10 ** 8:08d}", "path": path, "method": method}
+        if body[:1] == b"{":
+            record.update(json.loads(body))
+        if method != "GET":
+            with self._lock:
+                self.writes.append((method, path, record["id"]))
+        return record
+
+
+class MockHTTP2Server(MockFasterPayServer):
+    """
+    HTTP/2 variant of `MockFasterPayServer`, serving plain-text HTTP/2 with prior
+    knowledge. Requests are answered concurrently on one asyncio loop, so many
+    streams can be in flight on a single connection. Requires the `h2` package.
+    """
+
+    def start(self) -> "MockHTTP2Server":
+        import h2.config  # noqa: F401, fail early when h2 is missing
+
+        self._loop = asyncio.new_event_loop()
+        self._started = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._started.wait()
+        return self
+
+    def stop(self) -> None:
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._port}"
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(asyncio.start_server(self._serve, "127.0.0.1", 0))
+        self._port = self._server.sockets[0].getsockname()[1]
+        self._started.set()
+        self._loop.run_forever()
+        self._server.close()
+        tasks = asyncio.all_tasks(self._loop)
+        for task in tasks:
+            task.cancel()
+        self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self._loop.close()
+
+    async def _serve(self, reader, writer):
+        import h2.config
+        import h2.connection
+        import h2.events
+
+        with self._lock:
+            self.connections += 1
+        connection = h2.connection.H2Connection(
+            config=h2.config.H2Configuration(client_side=False, header_encoding="utf-8")
+        )
+        connection.initiate_connection()
+        writer.write(connection.data_to_send())
+        window_open = asyncio.Event()
+        streams = {}
+        tasks = set()
+
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            for event in connection.receive_data(data):
+                if isinstance(event, h2.events.RequestReceived):
+                    streams[event.stream_id] = (dict(event.headers), bytearray())
+                elif isinstance(event, h2.events.DataReceived):
+                    streams[event.stream_id][1].extend(event.data)
+                    connection.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                elif isinstance(event, h2.events.StreamEnded):
+                    headers, body = streams.pop(event.stream_id)
+                    task = asyncio.ensure_future(
+                        self._reply(connection, writer, window_open, event.stream_id, headers, bytes(body))
+                    )
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                elif isinstance(event, h2.events.WindowUpdated):
+                    window_open.set()
+                elif isinstance(event, h2.events.ConnectionTerminated):
+                    writer.close()
+                    return
+            writer.write(connection.data_to_send())
+        writer.close()
+
+    async def _reply(self, connection, writer, window_open, stream_id, headers, body):
+        delay, failed = self._decide()
+        if delay:
+            await asyncio.sleep(delay)
+        status, data, content_type = self._route(headers[":method"], headers[":path"], body, failed)
+        connection.send_headers(
+            stream_id,
+            [(":status", str(status)), ("content-type", content_type), ("content-length", str(len(data)))],
+        )
+        while data:
+            size = min(connection.local_flow_control_window(stream_id), connection.max_outbound_frame_size, len(data))
+            if size <= 0:
+                window_open.clear()
+                writer.write(connection.data_to_send())
+                await window_open.wait()
+                continue
+            connection.send_data(stream_id, data[:size])
+            data = data[size:]
+        connection.end_stream(stream_id)
+        writer.write(connection.data_to_send())
+
+
+def _json(status: int, payload: dict):
+    return status, json.dumps(payload).encode(), "application/json"
+
+
+def _query(query: str) -> dict:
+    pairs = (part.split("=", 1) for part in query.split("&") if "=" in part)
+    return {key: value for key, value in pairs}
+
+
+def _synthetic(kind: str, index: int) -> dict:
+    day = 1 + index % 28
+    return {
+        "id": f"{kind[:2].upper()}-2505{day:02d}-{index:06d}",
+        "name": f"{kind} {index}",
+        "email": f"customer{index}@example.com",
+        "status": "paid" if index % 3 else "sent",
+        "currency": "USD",
+        "amount": f"{10 + index % 90}.00",
+        "prices": [{"price": 10 + index % 90, "currency": "USD"}],
+        "updated_at": f"2025-05-{day:02d} 10:00:00",
+    }
@@ -0,0 +1,74 @@
+import argparse
+import threading
+import time
+
+from fasterpay.concurrencylimit import AdaptiveLimiter
+from fasterpay.gateway import Gateway
+from fasterpay.tests.mockserver import MockFasterPayServer
+from fasterpay.transport import Transport
+
+PUBLIC_KEY = "<your public key>"
+PRIVATE_KEY = "<your private key>"
+
+
+def run(server: MockFasterPayServer, limiter: AdaptiveLimiter, requests: int) -> dict:
+    """Poll `requests` payouts through `Payout.get_payouts`; return throughput and limiter figures."""
+    transport = Transport(limiter=limiter)
+    gateway = Gateway(PUBLIC_KEY, PRIVATE_KEY, True, transport=transport, api_url=server.url, external_api_url=server.url)
+    throttled_before = server.throttled
+    limits = []
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(0.02):
+            limits.append(limiter.limit)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    outcomes = list(gateway.payout().get_payouts([f"PO-{index:06d}" for index in range(requests)]))
+    elapsed = time.perf_counter() - started
+    done.set()
+    sampler.join()
+    transport.close()
+
+    settled = limits[len(limits) // 2:] or [limiter.limit]
+    stats = limiter.stats()
+    return {
+        "throughput": requests / elapsed,
+        "failed": sum(outcome["error"] is not None for outcome in outcomes),
+        "throttled": server.throttled - throttled_before,
+        "settled": sum(settled) / len(settled),
+        "max_seen": stats["max_seen"],
+        "decreases": stats["decreases"],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare fixed concurrency with the adaptive limiter against a server with a capacity ceiling."
+    )
+    parser.add_argument("--requests", type=int, default=1500)
+    parser.add_argument("--latency", type=float, default=0.05, help="Server processing time per request, seconds.")
+    parser.add_argument("--capacity", type=int, default=8, help="Requests the server processes at once.")
+    parser.add_argument("--queue-limit", type=int, default=8, help="Queued requests beyond which the server answers 429.")
+    args = parser.parse_args()
+
+    optimum = args.capacity / args.latency
+    print(
+        f"{args.requests} payout polls, server capacity {args.capacity} x {args.latency * 1000:.0f} ms "
+        f"(at most {optimum:.0f} req/s), queue limit {args.queue_limit}"
+    )
+    with MockFasterPayServer(latency=args.latency, capacity=args.capacity, queue_limit=args.queue_limit) as server:
+        for fixed in (4, args.capacity, 64):
+            result = run(server, AdaptiveLimiter(fixed, fixed, fixed), args.requests)
+            print(
+                f"fixed {fixed:3d}:        {result['throughput']:7.1f} req/s ({result['throughput'] / optimum:4.0%})  "
+                f"{result['throttled']:5d} 429s  {result['failed']:4d} failed"
+            )
+        result = run(server, AdaptiveLimiter(), args.requests)
+        print(
+            f"adaptive:         {result['throughput']:7.1f} req/s ({result['throughput'] / optimum:4.0%})  "
+            f"{result['throttled']:5d} 429s  {result['failed']:4d} failed  "
+            f"settled limit {result['settled']:.1f} (max {result['max_seen']}, {result['decreases']} decreases)"
+        )
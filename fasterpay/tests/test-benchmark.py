@@ -0,0 +1,145 @@
+import argparse
+import json
+import platform
+import statistics
+import time
+
+from fasterpay.gateway import Gateway
+from fasterpay.pagination import iter_records
+from fasterpay.tests.mockserver import MockFasterPayServer
+
+PUBLIC_KEY = "<your public key>"
+PRIVATE_KEY = "<your private key>"
+
+PINGBACK = '{"event":"payment","payment_order":{"id":13330,"merchant_order_id":"9654","status":"successful"}}'
+
+FORM_PAYLOAD = {
+    "description": "Golden Ticket",
+    "amount": "10.00",
+    "currency": "EUR",
+    "merchant_order_id": "1234",
+    "success_url": "https://example.com/success",
+    "pingback_url": "https://example.com/pingback",
+    "email": "customer@example.com",
+    "first_name": "Jane",
+    "last_name": "Doe",
+}
+
+
+def measure(call, iterations: int) -> dict:
+    """Run `call` `iterations` times and summarise per-call latency in microseconds."""
+    call()  # Warm-up: connection setup, lazy imports, cached resources
+    samples = []
+    errors = 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        begin = time.perf_counter()
+        try:
+            call()
+        except Exception:
+            errors += 1
+        samples.append((time.perf_counter() - begin) * 1e6)
+    elapsed = time.perf_counter() - started
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "errors": errors,
+        "ops_per_sec": iterations / elapsed,
+        "mean_us": statistics.fmean(samples),
+        "p50_us": samples[len(samples) // 2],
+        "p99_us": samples[min(int(len(samples) * 0.99), len(samples) - 1)],
+    }
+
+
+def run(args) -> dict:
+    results = {}
+    local = Gateway(PUBLIC_KEY, PRIVATE_KEY, True)
+    signature = local.signature()
+    pingback_headers = {
+        "X-Fasterpay-Signature": signature.calculate_pingback_hash(PINGBACK),
+        "X-Fasterpay-Signature-Version": "v2",
+    }
+
+    cpu_bound = {
+        "signature.calculate_hash v1": lambda: signature.calculate_hash(FORM_PAYLOAD, "v1"),
+        "signature.calculate_hash v2": lambda: signature.calculate_hash(FORM_PAYLOAD, "v2"),
+        "pingback.validate v2": lambda: local.pingback().validate(PINGBACK, pingback_headers),
+        "payment_form.build_form": lambda: local.payment_form().build_form({"payload": dict(FORM_PAYLOAD)}),
+    }
+    for name, call in cpu_bound.items():
+        results[name] = measure(call, args.iterations * 10)
+
+    with MockFasterPayServer(latency=args.latency, error_rate=args.error_rate, records=args.records) as server:
+        gateway = Gateway(
+            PUBLIC_KEY, PRIVATE_KEY, True, retries=args.retries,
+            api_url=server.url, external_api_url=server.url,
+        )
+        gateway.transport.backoff = 0.001
+        einvoice = gateway.einvoice()
+        invoice = {
+            "contact_id": "CT-250527-AZARCIJE",
+            "currency": "USD",
+            "items": [{"price": 10, "quantity": 1, "name": "Consulting hour"}],
+        }
+
+        def create_invoice_with_upload():
+            einvoice.create_invoice(dict(invoice, template={"logo": ("logo.png", b"\x89PNG" + b"\x00" * 20000, "image/png")}))
+
+        network = {
+            "transaction.refund": lambda: gateway.transaction().refund("1167", 0.01),
+            "transaction.deliver": lambda: gateway.transaction().deliver({"payment_order_id": "46157868", "status": "delivered"}),
+            "einvoice.get_invoice": lambda: einvoice.get_invoice("FPBIV-250528-0001"),
+            "einvoice.create_invoice": lambda: einvoice.create_invoice(dict(invoice)),
+            "einvoice.create_invoice (upload)": create_invoice_with_upload,
+            "einvoice.list_invoices (paginate all)": lambda: sum(1 for _ in iter_records(einvoice.list_invoices, per_page=args.per_page)),
+        }
+        for name, call in network.items():
+            iterations = max(args.iterations // 10, 5) if "paginate" in name else args.iterations
+            results[name] = measure(call, iterations)
+        server_stats = {"requests": server.requests, "injected_errors": server.errors}
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "server": server_stats,
+        "benchmarks": results,
+    }
+
+
+def compare(current: dict, previous: dict) -> None:
+    print(f"\n{'benchmark':<40} {'before':>12} {'after':>12} {'change':>8}")
+    for name, result in current["benchmarks"].items():
+        before = previous.get("benchmarks", {}).get(name)
+        if not before:
+            continue
+        change = (result["ops_per_sec"] / before["ops_per_sec"] - 1) * 100
+        print(f"{name:<40} {before['ops_per_sec']:12.1f} {result['ops_per_sec']:12.1f} {change:+7.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the SDK against a local FasterPay stand-in.")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0, help="Injected server latency in seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503.")
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--records", type=int, default=5000, help="Records behind each list endpoint.")
+    parser.add_argument("--per-page", type=int, default=1000)
+    parser.add_argument("--output", help="Write machine-readable results to this JSON file.")
+    parser.add_argument("--compare", help="Previous results file to compare against.")
+    args = parser.parse_args()
+
+    report = run(args)
+    for name, result in report["benchmarks"].items():
+        print(
+            f"{name:<40} {result['ops_per_sec']:12.1f} ops/s  "
+            f"p50 {result['p50_us']:9.1f} us  p99 {result['p99_us']:9.1f} us  errors {result['errors']}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    if args.compare:
+        with open(args.compare) as previous:
+            compare(report, json.load(previous))
@@ -0,0 +1,78 @@
+import argparse
+import gzip
+import os
+import tempfile
+import time
+
+from fasterpay.cassette import Cassette, lognormal_latency
+from fasterpay.gateway import Gateway
+from fasterpay.tests.mockserver import MockFasterPayServer
+
+PUBLIC_KEY = "<your public key>"
+PRIVATE_KEY = "<your private key>"
+DISTINCT_IDS = 20
+
+WORKLOAD = {
+    "einvoice.get_invoice": lambda gateway, index: gateway.einvoice().get_invoice(f"FPBIV-{index % DISTINCT_IDS:06d}"),
+    "einvoice.list_invoices": lambda gateway, index: gateway.einvoice().list_invoices({"page": 1 + index % 3}),
+    "payout.get_payout": lambda gateway, index: gateway.payout().get_payout(f"PO-{index % DISTINCT_IDS:06d}"),
+    "contact.create_contact": lambda gateway, index: gateway.contact().create_contact(
+        {"email": f"customer{index % DISTINCT_IDS}@example.com", "first_name": "Jane"}
+    ),
+    "contact.list_contacts": lambda gateway, index: gateway.contact().list_contacts({"page": 1 + index % 3}),
+}
+
+
+def gateway_for(url: str) -> Gateway:
+    # Reads are not coalesced, so every call goes through the transport.
+    return Gateway(PUBLIC_KEY, PRIVATE_KEY, True, api_url=url, external_api_url=url, coalesce_reads=False)
+
+
+def calls_per_second(gateway: Gateway, call, calls: int) -> float:
+    started = time.perf_counter()
+    for index in range(calls):
+        call(gateway, index)
+    return calls / (time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record a workload against the mock server, then replay it in process.")
+    parser.add_argument("--calls", type=int, default=20000, help="Replayed calls per resource method.")
+    parser.add_argument("--network-calls", type=int, default=500, help="Calls per method against the mock server.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "workload.cassette")
+        with MockFasterPayServer() as server:
+            network = {name: calls_per_second(gateway_for(server.url), call, args.network_calls) for name, call in WORKLOAD.items()}
+
+            recorder = gateway_for(server.url)
+            cassette = Cassette(path, mode="record", secrets=[PRIVATE_KEY])
+            recorder.transport.use_cassette(cassette)
+            for call in WORKLOAD.values():
+                for index in range(DISTINCT_IDS):
+                    call(recorder, index)
+            cassette.save()
+
+        with gzip.open(path, "rt", encoding="utf-8") as recorded:
+            assert PRIVATE_KEY not in recorded.read(), "private key written to the cassette"
+        print(f"cassette: {len(cassette.interactions)} exchanges, {os.path.getsize(path)} bytes")
+
+        replayer = gateway_for("https://pay.sandbox.fasterpay.com")
+        replayer.transport.use_cassette(Cassette(path))
+        for name, call in WORKLOAD.items():
+            replayed = calls_per_second(replayer, call, args.calls)
+            print(f"{name:24s} network {network[name]:8.0f} calls/s  replay {replayed:8.0f} calls/s  ({replayed / network[name]:5.1f}x)")
+
+        simulated = gateway_for("https://pay.sandbox.fasterpay.com")
+        simulated.transport.use_cassette(Cassette(path, latency=lognormal_latency(0.002, seed=1)))
+        timings = []
+        for index in range(500):
+            started = time.perf_counter()
+            WORKLOAD["payout.get_payout"](simulated, index)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        print(
+            f"simulated latency (log-normal, median 2 ms): p50 {timings[len(timings) // 2] * 1000:.2f} ms  "
+            f"p99 {timings[int(len(timings) * 0.99)] * 1000:.2f} ms"
+        )
@@ -0,0 +1,78 @@
+from urllib.parse import urlsplit
+
+from fasterpay.gateway import Gateway
+from fasterpay.tests.mockserver import MockFasterPayServer
+
+THRESHOLD = 1024
+
+
+def new_gateway(url: str) -> Gateway:
+    gateway = Gateway("<your public key>", "<your private key>", True, external_api_url=url, compress_threshold=THRESHOLD)
+    gateway.transport.session.trust_env = False
+    return gateway
+
+
+def bulk_invoice(lines: int) -> dict:
+    """An invoice whose JSON body grows with `lines`, repetitive enough to compress well."""
+    items = [{"product_id": f"PD-250528-{index:04d}", "price": 100, "quantity": 1, "description": "Consulting hours"}
+             for index in range(lines)]
+    return {"currency": "USD", "contact_id": "CT-250527-AZARCIJE", "items": items}
+
+
+def delta(before: dict, after: dict) -> dict:
+    return {key: after[key] - before[key] for key in before}
+
+
+def check_compressed(server: MockFasterPayServer) -> None:
+    gateway = new_gateway(server.url)
+    transfer = gateway.transport.transfer
+
+    before = transfer.snapshot()
+    invoice = gateway.einvoice().create_invoice(bulk_invoice(500))
+    sent = delta(before, transfer.snapshot())
+    # The server decompressed the body: the echoed invoice carries every line.
+    assert len(invoice["data"]["items"]) == 500
+    assert sent["calls"] == 1 and server.requests == 1
+    assert sent["request_wire_bytes"] * 10 < sent["request_bytes"], sent
+    assert sent["response_wire_bytes"] * 10 < sent["response_bytes"], sent
+
+    # Bodies under the threshold go as is.
+    before = transfer.snapshot()
+    gateway.einvoice().create_invoice(bulk_invoice(1))
+    small = delta(before, transfer.snapshot())
+    assert small["request_bytes"] < THRESHOLD and small["request_wire_bytes"] == small["request_bytes"], small
+
+    # Large listings come back compressed.
+    before = transfer.snapshot()
+    gateway.einvoice().list_invoices({"per_page": 200})
+    listed = delta(before, transfer.snapshot())
+    assert listed["request_bytes"] == 0 and listed["response_wire_bytes"] * 5 < listed["response_bytes"], listed
+    print(f"compressed: {sent['request_bytes']} request bytes sent as {sent['request_wire_bytes']}, "
+          f"{sent['response_bytes']} response bytes received as {sent['response_wire_bytes']}")
+
+
+def check_unsupported(server: MockFasterPayServer) -> None:
+    gateway = new_gateway(server.url)
+    transfer = gateway.transport.transfer
+
+    before = transfer.snapshot()
+    invoice = gateway.einvoice().create_invoice(bulk_invoice(500), idempotency_key="invoice-1")
+    sent = delta(before, transfer.snapshot())
+    # Answered 415, then resent uncompressed with the same key, once.
+    assert server.requests == 2 and server.idempotency_keys == ["invoice-1"] * 2, server.idempotency_keys
+    assert len(invoice["data"]["items"]) == 500
+    assert sent["calls"] == 1 and sent["request_wire_bytes"] == sent["request_bytes"] > THRESHOLD, sent
+    assert gateway.transport._uncompressed_hosts == {urlsplit(server.url).netloc}
+
+    # The host is remembered: later bodies go uncompressed at once.
+    gateway.einvoice().create_invoice(bulk_invoice(400))
+    assert server.requests == 3, server.requests
+    print(f"415 fallback: resent {sent['request_bytes']} bytes uncompressed, host remembered")
+
+
+if __name__ == "__main__":
+    with MockFasterPayServer(compression=True) as server:
+        check_compressed(server)
+    with MockFasterPayServer(compression=False) as server:
+        check_unsupported(server)
+    print("OK")
@@ -0,0 +1,140 @@
+import socket
+import threading
+import time
+
+from fasterpay.dnscache import DNSCache
+from fasterpay.tests.mockserver import MockFasterPayServer
+from fasterpay.transport import Transport
+
+
+def new_transport(**options) -> Transport:
+    transport = Transport(retries=0, **options)
+    transport.session.trust_env = False
+    return transport
+
+
+def accepted(server: MockFasterPayServer, count: int) -> int:
+    """Connections counted by the server once it has counted `count`, or after 5 seconds."""
+    # Connections are counted on the server's threads, after the client has connected.
+    deadline = time.monotonic() + 5
+    while server.connections < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    return server.connections
+
+
+def check_pooled_connections(server: MockFasterPayServer) -> None:
+    transport = new_transport()
+    assert transport.warmup([server.url], connections=4) == {server.url: 4}
+    assert accepted(server, 4) == 4, server.connections
+    # Warming again counts the open connections instead of replacing them.
+    assert transport.warmup([server.url], connections=4) == {server.url: 4}
+
+    # Concurrent calls reuse the warmed connections.
+    threads = [threading.Thread(target=transport.request, args=("GET", f"{server.url}/api/external/invoices")) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert accepted(server, 4) == 4, server.connections
+    print("pooled connections: 4 opened by warmup, reused by 4 concurrent calls")
+
+
+def check_dns_cache(server: MockFasterPayServer) -> None:
+    url = server.url.replace("127.0.0.1", "localhost")
+    transport = new_transport()
+    # Three connections resolve the host concurrently.
+    transport.warmup([url], connections=3)
+    stats = transport.dns_cache.stats()
+    assert stats["misses"] == 1 and stats["hits"] == 2 and stats["entries"] == 1, stats
+
+    # Addresses are not cached: they never reach the resolver.
+    transport.warmup([server.url], connections=2)
+    assert transport.dns_cache.stats() == stats, transport.dns_cache.stats()
+    print(f"DNS cache: 3 connections to localhost, {stats['misses']} lookup, {stats['hits']} hits")
+
+
+def check_concurrent_lookups() -> None:
+    lookups = []
+    getaddrinfo = socket.getaddrinfo
+
+    def slow_getaddrinfo(*args, **kwargs):
+        lookups.append(args[0])
+        time.sleep(0.1)
+        return getaddrinfo(*args, **kwargs)
+
+    cache = DNSCache()
+    threads = [threading.Thread(target=cache.resolve, args=("localhost", 443)) for _ in range(8)]
+    socket.getaddrinfo = slow_getaddrinfo
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        socket.getaddrinfo = getaddrinfo
+    stats = cache.stats()
+    assert lookups == ["localhost"] and stats["misses"] == 1 and stats["hits"] == 7, (lookups, stats)
+    print("concurrent lookups: 8 callers, 1 resolver query")
+
+
+def check_ttl_expiry(server: MockFasterPayServer) -> None:
+    url = server.url.replace("127.0.0.1", "localhost")
+    transport = new_transport(dns_ttl=0.2)
+
+    transport.warmup([url], connections=1)
+    transport.session.close()
+    transport.warmup([url], connections=1)
+    assert transport.dns_cache.stats()["misses"] == 1 and transport.dns_cache.stats()["hits"] == 1
+
+    time.sleep(0.3)
+    transport.session.close()
+    transport.warmup([url], connections=1)
+    stats = transport.dns_cache.stats()
+    assert stats["misses"] == 2 and stats["hits"] == 1, stats
+    print("TTL expiry: expired answer resolved again")
+
+
+def check_keep_warm(server: MockFasterPayServer) -> None:
+    transport = new_transport()
+    transport.warmup([server.url], connections=2)
+    assert accepted(server, 2) == 2, server.connections
+    try:
+        transport.keep_warm([server.url], connections=2, interval=0.1)
+        # Connections dropped while idle are reopened by the background thread.
+        transport.session.close()
+        reopened = accepted(server, 4)
+    finally:
+        transport.stop_keep_warm()
+    assert reopened == 4, reopened
+    print("keep warm: closed connections reopened in the background")
+
+
+def check_connect_timeout() -> None:
+    # A listener never accepting, its backlog filled: later connection attempts hang
+    # like against a black-holed host.
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(0)
+    filler = socket.create_connection(listener.getsockname())
+    url = f"http://127.0.0.1:{listener.getsockname()[1]}"
+    try:
+        for timeout in (0.3, (0.3, 30.0)):
+            transport = new_transport(timeout=timeout)
+            started = time.monotonic()
+            assert transport.warmup([url], connections=2) == {url: 0}
+            elapsed = time.monotonic() - started
+            assert elapsed < 2, f"warmup took {elapsed:.1f}s with a {timeout} timeout"
+    finally:
+        filler.close()
+        listener.close()
+    print(f"connect timeout: unreachable host given up after {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    for check in (check_pooled_connections, check_dns_cache, check_ttl_expiry, check_keep_warm):
+        with MockFasterPayServer() as server:
+            check(server)
+    check_concurrent_lookups()
+    check_connect_timeout()
+    print("OK")
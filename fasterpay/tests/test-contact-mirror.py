@@ -0,0 +1,119 @@
+from fasterpay.contactmirror import ContactMirror
+
+
+class StubContacts:
+    """Contacts held in memory and listed like `Contact.list_contacts`."""
+
+    def __init__(self, contacts: list):
+        self.contacts = {contact["id"]: dict(contact) for contact in contacts}
+        self.remote_queries = 0
+
+    def list_contacts(self, params: dict = None) -> dict:
+        params = params or {}
+        rows = sorted(self.contacts.values(), key=lambda contact: contact["updated_at"], reverse=True)
+        if params.get("email"):
+            self.remote_queries += 1
+            rows = [contact for contact in rows if contact["email"].startswith(params["email"])]
+        page = int(params.get("page", 1))
+        per_page = int(params.get("per_page", 15))
+        page_rows = [dict(contact) for contact in rows[(page - 1) * per_page:page * per_page]]
+        return {"success": True, "data": {"current_page": page, "per_page": per_page, "data": page_rows}}
+
+
+class StubGateway:
+    def __init__(self, contacts: StubContacts):
+        self.contacts = contacts
+
+    def contact(self) -> StubContacts:
+        return self.contacts
+
+
+def contact(index: int, **fields) -> dict:
+    record = {
+        "id": f"CT-{index:04d}",
+        "first_name": "Jane" if index % 2 else "John",
+        "last_name": f"Doe{index}",
+        "email": f"customer{index}@example.com",
+        "phone": f"+1 (555) 000-{index:04d}",
+        "country": "US" if index % 3 else "GB",
+        "updated_at": f"2025-05-01 10:00:{index % 60:02d}",
+    }
+    record.update(fields)
+    return record
+
+
+def ids(result: dict) -> list:
+    return sorted(row["id"] for row in result["data"]["data"])
+
+
+def check_lookups() -> None:
+    contacts = StubContacts([contact(index) for index in range(40)])
+    mirror = ContactMirror(StubGateway(contacts))
+    assert mirror.refresh(full=True) == 40 and len(mirror) == 40
+
+    assert mirror.get_contact("CT-0007")["last_name"] == "Doe7"
+    assert mirror.find_by_email(" Customer7@Example.com ")["id"] == "CT-0007"
+    assert [row["id"] for row in mirror.find_by_phone("15550000007")] == ["CT-0007"]
+    assert ids(mirror.list_contacts({"email": "customer1", "per_page": 100})) == sorted(
+        f"CT-{index:04d}" for index in range(40) if str(index).startswith("1")
+    )
+    assert ids(mirror.list_contacts({"name": "jane doe3", "per_page": 100})) == sorted(
+        f"CT-{index:04d}" for index in range(40) if index % 2 and str(index).startswith("3")
+    )
+    assert ids(mirror.list_contacts({"name": "john", "country": "GB", "per_page": 100})) == sorted(
+        f"CT-{index:04d}" for index in range(40) if index % 2 == 0 and index % 3 == 0
+    )
+    assert contacts.remote_queries == 0
+    print("lookups: id, email, phone, name and email prefixes and country answered locally")
+
+
+def check_incremental_refresh() -> None:
+    contacts = StubContacts([contact(index) for index in range(40)])
+    mirror = ContactMirror(StubGateway(contacts))
+    mirror.refresh(full=True)
+
+    contacts.contacts["CT-0005"].update(email="renamed@example.com", updated_at="2025-05-02 09:00:00")
+    # The contact updated at the watermark itself is fetched again.
+    assert mirror.refresh() == 2
+    assert mirror.find_by_email("customer5@example.com") is None
+    assert mirror.find_by_email("renamed@example.com")["id"] == "CT-0005"
+    assert mirror.watermark == "2025-05-02 09:00:00"
+    print("incremental refresh: only the changed contact and the watermark one fetched")
+
+
+def check_duplicate_emails() -> None:
+    shared = "shared@example.com"
+    contacts = StubContacts([
+        contact(1, email=shared, updated_at="2025-05-01 10:00:01"),
+        contact(2, email=shared, updated_at="2025-05-01 10:00:02"),
+    ])
+    mirror = ContactMirror(StubGateway(contacts))
+    mirror.refresh(full=True)
+
+    assert mirror.find_by_email(shared)["id"] == "CT-0002"
+    assert ids(mirror.list_contacts({"email": shared})) == ["CT-0001", "CT-0002"]
+    mirror.remove("CT-0002")
+    assert mirror.find_by_email(shared)["id"] == "CT-0001", "removing one duplicate dropped the other"
+    print("duplicate emails: both contacts kept, lookups survive removing one")
+
+
+def check_full_refresh_to_empty() -> None:
+    contacts = StubContacts([contact(index) for index in range(10)])
+    mirror = ContactMirror(StubGateway(contacts))
+    mirror.refresh(full=True)
+    assert ids(mirror.list_contacts({"name": "jane"}))
+
+    # Every contact was deleted server side: the sorted indexes must not keep stale IDs.
+    contacts.contacts.clear()
+    assert mirror.refresh(full=True) == 0 and len(mirror) == 0
+    assert ids(mirror.list_contacts({"name": "jane"})) == []
+    assert ids(mirror.list_contacts({"email": "customer1"})) == []
+    print("full refresh: stale index entries dropped")
+
+
+if __name__ == "__main__":
+    check_lookups()
+    check_incremental_refresh()
+    check_duplicate_emails()
+    check_full_refresh_to_empty()
+    print("OK")
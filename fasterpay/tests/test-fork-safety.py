@@ -0,0 +1,56 @@
+import os
+import tempfile
+
+from fasterpay.idempotency import IdempotencyJournal
+
+WORKERS = 4
+CALLS = 200
+
+
+def work(journal: IdempotencyJournal, worker: int) -> None:
+    """Journal CALLS completed calls, compacting many times, and leave one pending."""
+    journal.begin(f"pending-{worker}", "POST", "https://pay.fasterpay.com/payment/1/refund", {"amount": worker})
+    for index in range(CALLS):
+        key = f"refund-{worker}-{index}"
+        journal.begin(key, "POST", "https://pay.fasterpay.com/payment/1/refund", {"amount": 1})
+        journal.complete(key, 200, '{"success":true}')
+
+
+def check_forked_journal(directory: str) -> None:
+    path = os.path.join(directory, "journal.log")
+    journal = IdempotencyJournal(path, max_entries=20)
+    journal.begin("pending-parent", "POST", "https://pay.fasterpay.com/payment/2/refund", {"amount": 1})
+
+    children = []
+    for worker in range(WORKERS):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                work(journal, worker)
+            except BaseException:
+                code = 1
+            os._exit(code)
+        children.append(pid)
+    for pid in children:
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0, status
+    journal.close()
+
+    journal = IdempotencyJournal(path, max_entries=20)
+    pending = sorted(record["key"] for record in journal.pending())
+    assert pending == sorted(["pending-parent"] + [f"pending-{worker}" for worker in range(WORKERS)]), pending
+    finished = [record for record in journal._entries.values() if record["state"] == "done"]
+    assert len(finished) == 20, len(finished)
+    with open(path, encoding="utf-8") as lines:
+        count = sum(1 for _ in lines)
+    assert count <= WORKERS * 2 * 20, f"journal of {count} lines never compacted"
+    journal.close()
+    print(f"forked journal: {WORKERS} workers compacting one file, every pending call kept, {count} lines")
+
+
+if __name__ == "__main__":
+    if hasattr(os, "fork"):
+        with tempfile.TemporaryDirectory() as directory:
+            check_forked_journal(directory)
+    print("OK")
@@ -0,0 +1,48 @@
+import argparse
+import time
+
+from fasterpay.gateway import Gateway
+
+PLANS = [
+    {"amount": "9.99", "currency": "USD", "description": "Basic plan", "recurring_sku_id": "basic", "recurring_period": "1m"},
+    {"amount": "19.99", "currency": "USD", "description": "Pro plan", "recurring_sku_id": "pro", "recurring_period": "1m"},
+    {"amount": "199.00", "currency": "EUR", "description": "Pro plan, yearly", "recurring_sku_id": "pro-y", "recurring_period": "1y"},
+]
+
+
+def parameters(index: int, sign_version: str) -> dict:
+    """Checkout form parameters of one visitor buying one of the plans."""
+    payload = dict(PLANS[index % len(PLANS)])
+    payload.update({
+        "sign_version": sign_version,
+        "merchant_order_id": f"order-{index}",
+        "email": f"customer{index}@example.com",
+        "first_name": "Jane",
+        "last_name": "Doe",
+        "success_url": "https://merchant.example.com/thank-you",
+    })
+    return {"payload": payload}
+
+
+def renders_per_second(build_form, sign_version: str, forms: int) -> tuple:
+    batch = [parameters(index, sign_version) for index in range(forms)]
+    started = time.perf_counter()
+    rendered = [build_form(params) for params in batch]
+    return forms / (time.perf_counter() - started), rendered
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare checkout form renders/sec with and without the form cache.")
+    parser.add_argument("--forms", type=int, default=100000)
+    args = parser.parse_args()
+
+    gateway = Gateway("<your public key>", "<your private key>", True)
+    for sign_version in ("v1", "v2"):
+        uncached, expected = renders_per_second(gateway.payment_form().build_form, sign_version, args.forms)
+        cached, rendered = renders_per_second(gateway.form_cache().build_form, sign_version, args.forms)
+        assert rendered == expected, "cached forms differ from PaymentForm.build_form"
+        print(
+            f"{sign_version}: build_form {uncached:9.0f} renders/s  "
+            f"form cache {cached:9.0f} renders/s  ({cached / uncached:.2f}x)"
+        )
+    print(gateway.form_cache().stats())
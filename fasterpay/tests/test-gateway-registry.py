@@ -0,0 +1,112 @@
+import hashlib
+import hmac
+
+from fasterpay.gatewayregistry import GatewayRegistry
+
+PINGBACK = b'{"event":"payment.transfer","payment_order":{"id":1167,"merchant_order_id":"order-1"}}'
+
+
+def new_registry(merchants: int, **options) -> GatewayRegistry:
+    registry = GatewayRegistry(**options)
+    for index in range(merchants):
+        registry.register(f"merchant-{index}", f"public-{index}", f"private-{index}", is_test=True)
+    return registry
+
+
+def v2_headers(private_key: str, body: bytes = PINGBACK) -> dict:
+    signature = hmac.new(private_key.encode(), body, digestmod=hashlib.sha256).hexdigest()
+    return {"X-Fasterpay-Signature-Version": "v2", "X-Fasterpay-Signature": signature}
+
+
+def check_lru_eviction() -> None:
+    registry = new_registry(3, max_resident=2)
+    first = registry.gateway("merchant-0")
+    second = registry.gateway("merchant-1")
+    assert registry.gateway("merchant-0") is first
+    assert first.transport is second.transport is registry.transport
+
+    # merchant-1 is the least recently used: building merchant-2 evicts it.
+    registry.gateway("merchant-2")
+    assert list(registry._resident) == ["merchant-0", "merchant-2"], list(registry._resident)
+    assert registry.gateway("merchant-0") is first
+    rebuilt = registry.gateway("merchant-1")
+    assert rebuilt is not second and rebuilt.config.private_key == "private-1"
+    assert list(registry._resident) == ["merchant-0", "merchant-1"], list(registry._resident)
+    assert len(registry) == 3
+
+    try:
+        GatewayRegistry(max_resident=0)
+        raise AssertionError("accepted max_resident=0")
+    except ValueError:
+        pass
+    print("LRU eviction: 2 resident gateways of 3 merchants, least recently used rebuilt")
+
+
+def check_route_by_api_key() -> None:
+    registry = new_registry(3)
+    merchant_id, gateway = registry.route_pingback(PINGBACK, {"X-ApiKey": "private-2"})
+    assert merchant_id == "merchant-2" and gateway is registry.gateway("merchant-2")
+    assert list(registry._resident) == ["merchant-2"], "other merchants were built"
+
+    # A v2 signature of another key is still checked against the merchant named by X-ApiKey.
+    headers = {"X-ApiKey": "private-1", **v2_headers("private-2")}
+    assert registry.route_pingback(PINGBACK, headers) is None
+    print("X-ApiKey: routed with one lookup, signature checked against that merchant")
+
+
+def check_route_by_signature() -> None:
+    registry = new_registry(4, max_resident=2)
+    registry.gateway("merchant-0")
+    registry.gateway("merchant-1")
+
+    # A resident merchant, checked through its gateway.
+    merchant_id, gateway = registry.route_pingback(PINGBACK, v2_headers("private-1"))
+    assert merchant_id == "merchant-1" and gateway is registry.gateway("merchant-1")
+
+    # A registered merchant that is not resident: built once matched.
+    merchant_id, gateway = registry.route_pingback(PINGBACK.decode(), v2_headers("private-3"))
+    assert merchant_id == "merchant-3" and gateway.config.private_key == "private-3"
+    assert "merchant-3" in registry._resident
+
+    tampered = v2_headers("private-2", PINGBACK + b" ")
+    assert registry.route_pingback(PINGBACK, tampered) is None
+    print("v2 signature: resident and non-resident merchants matched, tampered body rejected")
+
+
+def check_unknown_merchant() -> None:
+    registry = new_registry(2)
+    for merchant_id in ("merchant-9", None):
+        try:
+            registry.gateway(merchant_id)
+            raise AssertionError(f"built a gateway for {merchant_id!r}")
+        except ValueError as error:
+            assert "Unknown merchant" in str(error), error
+
+    registry.gateway("merchant-1")
+    registry.unregister("merchant-1")
+    try:
+        registry.gateway("merchant-1")
+        raise AssertionError("unregistered merchant still resident")
+    except ValueError:
+        pass
+    assert len(registry) == 1
+
+    assert registry.route_pingback(PINGBACK, {"X-ApiKey": "private-1"}) is None
+    assert registry.route_pingback(PINGBACK, v2_headers("private-1")) is None
+    assert registry.route_pingback(PINGBACK, v2_headers("private-9")) is None
+    assert registry.route_pingback(PINGBACK, {}) is None and registry.route_pingback("", {"X-ApiKey": "private-0"}) is None
+
+    try:
+        registry.register("merchant-2", "public-2", "")
+        raise AssertionError("registered a merchant without a private key")
+    except ValueError:
+        pass
+    print("unknown merchants: ValueError from gateway(), pingbacks not routed")
+
+
+if __name__ == "__main__":
+    check_lru_eviction()
+    check_route_by_api_key()
+    check_route_by_signature()
+    check_unknown_merchant()
+    print("OK")
@@ -0,0 +1,93 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fasterpay.gateway import Gateway
+from fasterpay.tests.mockserver import MockFasterPayServer, MockHTTP2Server
+
+PUBLIC_KEY = "<your public key>"
+PRIVATE_KEY = "<your private key>"
+
+
+def run(gateway: Gateway, requests: int, concurrency: int) -> float:
+    """Fetch `requests` distinct invoices from `concurrency` threads; return requests per second."""
+    einvoice = gateway.einvoice()
+    einvoice.get_invoice("FPBIV-WARMUP")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        # Distinct IDs, so request coalescing does not hide the transport difference.
+        list(executor.map(lambda index: einvoice.get_invoice(f"FPBIV-250528-{index:06d}"), range(requests)))
+    return requests / (time.perf_counter() - started)
+
+
+def check_request_settings(url: str) -> None:
+    """Per-request proxies and TLS settings reach the HTTP/2 connections."""
+    import requests
+
+    gateway = Gateway(PUBLIC_KEY, PRIVATE_KEY, True, api_url=url, external_api_url=url, retries=0)
+    gateway.transport.use_http2(url, max_connections=2, prior_knowledge=True)
+    session = gateway.transport.session
+    gateway.einvoice().get_invoice("FPBIV-PLAIN")
+
+    # Nothing listens on the discard port, so a request sent through the proxy fails.
+    session.proxies = {"http": "http://127.0.0.1:9"}
+    try:
+        gateway.einvoice().get_invoice("FPBIV-PROXIED")
+    except requests.ConnectionError:
+        pass
+    else:
+        raise AssertionError("the session proxy was ignored")
+    session.proxies = {}
+
+    # REQUESTS_CA_BUNDLE in the environment would take precedence over Session.verify.
+    session.trust_env = False
+    session.verify = "/nonexistent/ca-bundle.pem"
+    try:
+        gateway.einvoice().get_invoice("FPBIV-VERIFY")
+    except OSError:
+        pass
+    else:
+        raise AssertionError("the session CA bundle was ignored")
+    session.verify = True
+
+    adapter = session.get_adapter(url + "/")
+    assert len(adapter._clients) == 2, adapter._clients
+    gateway.transport.close()
+    print("per-request settings: proxy and CA bundle honoured")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the HTTP/1.1 pool with the HTTP/2 transport.")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.02, help="Injected server latency in seconds.")
+    args = parser.parse_args()
+
+    try:
+        import h2  # noqa: F401
+        import httpx  # noqa: F401
+    except ImportError:
+        print("Skipped: HTTP/2 support requires `pip install httpx[http2]`.")
+        raise SystemExit(0)
+
+    with MockFasterPayServer(latency=args.latency) as server:
+        gateway = Gateway(PUBLIC_KEY, PRIVATE_KEY, True, api_url=server.url, external_api_url=server.url)
+        http1 = run(gateway, args.requests, args.concurrency)
+        http1_connections = server.connections
+        gateway.transport.close()
+
+    with MockHTTP2Server() as server:
+        check_request_settings(server.url)
+
+    with MockHTTP2Server(latency=args.latency) as server:
+        gateway = Gateway(PUBLIC_KEY, PRIVATE_KEY, True, api_url=server.url, external_api_url=server.url)
+        gateway.transport.use_http2(server.url, max_connections=2, prior_knowledge=True)
+        http2 = run(gateway, args.requests, args.concurrency)
+        http2_connections = server.connections
+        gateway.transport.close()
+
+    print(f"{args.requests} requests, {args.concurrency} threads, {args.latency * 1000:.0f} ms server latency")
+    print(f"HTTP/1.1 pool: {http1:10.1f} req/s  {http1_connections:5d} connections opened")
+    print(f"HTTP/2:        {http2:10.1f} req/s  {http2_connections:5d} connections opened  ({(http2 / http1 - 1) * 100:+.1f}%)")
+    # HTTP/2 framing runs in pure Python on one event loop thread: expect fewer
+    # connections, not more requests per second.
@@ -0,0 +1,130 @@
+import os
+import socket
+import tempfile
+
+from fasterpay.gateway import Gateway
+from fasterpay.idempotency import IdempotencyJournal
+from fasterpay.instrumentation import Tracer
+from fasterpay.tests.mockserver import MockFasterPayServer
+
+PUBLIC_KEY = "<your public key>"
+PRIVATE_KEY = "<your private key>"
+
+
+class Attempts(Tracer):
+    """Retries made by each call."""
+
+    def __init__(self):
+        self.retries = []
+
+    def on_call(self, event) -> None:
+        self.retries.append(event.retries)
+
+
+def new_gateway(url: str, **options) -> Gateway:
+    gateway = Gateway(PUBLIC_KEY, PRIVATE_KEY, True, api_url=url, external_api_url=url, **options)
+    gateway.transport.backoff = 0.01
+    gateway.transport.session.trust_env = False
+    return gateway
+
+
+def unused_url() -> str:
+    """URL of a local port nothing listens on: connecting is refused."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{probe.getsockname()[1]}"
+
+
+def check_keyed_post_retries() -> None:
+    with MockFasterPayServer(error_rate=1.0) as server:
+        gateway = new_gateway(server.url)
+        try:
+            gateway.transaction().refund("1167", 0.01, idempotency_key="refund-1167")
+        except Exception:
+            pass
+        assert server.idempotency_keys == ["refund-1167"], server.idempotency_keys
+
+        # GETs are still retried on 503s.
+        gateway.transport.request("GET", f"{server.url}/api/external/payouts/PO-1")
+        assert server.requests == 1 + 1 + gateway.transport.retries, server.requests
+
+        # Opting in retries keyed POSTs on 503s too.
+        gateway.transport.retry_keyed_posts = True
+        del server.idempotency_keys[:]
+        try:
+            gateway.transaction().refund("1168", 0.01, idempotency_key="refund-1168")
+        except Exception:
+            pass
+        assert server.idempotency_keys == ["refund-1168"] * (1 + gateway.transport.retries), server.idempotency_keys
+
+    # Connecting is refused: the refund never left the process, so it is retried.
+    attempts = Attempts()
+    gateway = new_gateway(unused_url())
+    gateway.add_tracer(attempts)
+    try:
+        gateway.transaction().refund("1169", 0.01, idempotency_key="refund-1169")
+        raise AssertionError("refund to a closed port succeeded")
+    except Exception as error:
+        assert "refused" in str(error).lower() or "connect" in str(error).lower(), error
+    assert attempts.retries == [gateway.transport.retries], attempts.retries
+    print("keyed POSTs: sent once on 503, retried when connecting fails or when opted in")
+
+
+def check_journal(directory: str) -> None:
+    path = os.path.join(directory, "journal.log")
+    with MockFasterPayServer() as server:
+        gateway = new_gateway(server.url, idempotency_journal=path)
+        refund = gateway.transaction().refund("1167", 0.01, idempotency_key="refund-1167")
+        # A completed key is answered from the journal, without a request.
+        assert gateway.transaction().refund("1167", 0.01, idempotency_key="refund-1167") == refund
+        assert server.idempotency_keys == ["refund-1167"], server.idempotency_keys
+        gateway.transport.journal.close()
+
+        journal = IdempotencyJournal(path)
+        assert journal.get("refund-1167")["state"] == "done"
+        journal.begin("payout-1", "POST", f"{server.url}/api/external/payouts", {"source_currency": "EUR"})
+        journal.begin("cancel-1", "POST", f"{server.url}/api/subscription/1/cancel", {})
+        journal.fail("cancel-1", status=422)
+        journal.begin("upload-1", "POST", f"{server.url}/api/external/invoices")
+        journal.close()
+
+        # After a restart the pending JSON call is re-sent with its original key.
+        gateway = new_gateway(server.url, idempotency_journal=path)
+        results = gateway.resume_pending()
+        assert [key for key, _ in results] == ["payout-1"], results
+        assert results[0][1]["data"]["source_currency"] == "EUR", results
+        assert server.idempotency_keys[-1] == "payout-1", server.idempotency_keys
+        journal = gateway.transport.journal
+        assert journal.get("payout-1")["state"] == "done"
+        assert journal.get("cancel-1")["state"] == "failed"
+        assert [record["key"] for record in journal.pending()] == ["upload-1"], "multipart calls stay pending"
+        journal.close()
+    print("journal: completed keys replayed locally, pending calls resumed with their key")
+
+
+def check_compaction(directory: str) -> None:
+    path = os.path.join(directory, "journal.log")
+    journal = IdempotencyJournal(path, max_entries=5)
+    journal.begin("pending-0", "POST", "https://pay.fasterpay.com/payment/0/refund", {"amount": 1})
+    for index in range(1, 40):
+        key = f"refund-{index}"
+        journal.begin(key, "POST", f"https://pay.fasterpay.com/payment/{index}/refund", {"amount": 1})
+        journal.complete(key, 200, '{"success":true}')
+        with open(path, encoding="utf-8") as lines:
+            assert sum(1 for _ in lines) <= 2 * 6, "journal not compacted"
+    journal.close()
+
+    journal = IdempotencyJournal(path, max_entries=5)
+    finished = [key for key, record in journal._entries.items() if record["state"] == "done"]
+    assert finished == [f"refund-{index}" for index in range(35, 40)], finished
+    assert [record["key"] for record in journal.pending()] == ["pending-0"]
+    journal.close()
+    print("compaction: 5 most recent finished calls and the pending one kept")
+
+
+if __name__ == "__main__":
+    check_keyed_post_retries()
+    for check in (check_journal, check_compaction):
+        with tempfile.TemporaryDirectory() as directory:
+            check(directory)
+    print("OK")
@@ -0,0 +1,43 @@
+import subprocess
+import sys
+
+# Signing-only usage: build a checkout form and validate a pingback.
+SIGNING_ONLY = """
+import sys
+from fasterpay.gateway import Gateway
+
+gateway = Gateway("<your public key>", "<your private key>", True)
+gateway.payment_form().build_form({"payload": {"amount": "0.01", "currency": "EUR", "description": "Test"}})
+gateway.pingback().validate('{"event":"payment"}', {"X-Fasterpay-Signature-Version": "v2", "X-Fasterpay-Signature": ""})
+print(",".join(name for name in ("requests", "urllib3", "fasterpay.transport") if name in sys.modules))
+"""
+
+# Cumulative import time budget for fasterpay.gateway, in microseconds.
+BUDGET_US = 20000
+
+
+def gateway_import_time() -> int:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import fasterpay.gateway"],
+        capture_output=True, text=True, check=True,
+    )
+    for line in result.stderr.splitlines():
+        if line.rstrip().endswith("| fasterpay.gateway"):
+            return int(line.split("|")[1])
+    raise RuntimeError("fasterpay.gateway missing from -X importtime output")
+
+
+if __name__ == "__main__":
+    loaded = subprocess.run(
+        [sys.executable, "-c", SIGNING_ONLY], capture_output=True, text=True, check=True,
+    ).stdout.strip()
+    cumulative = min(gateway_import_time() for _ in range(5))
+
+    print(f"fasterpay.gateway import: {cumulative} us (budget {BUDGET_US} us)")
+    print(f"HTTP modules loaded by signing-only usage: {loaded or 'none'}")
+
+    if not loaded and cumulative <= BUDGET_US:
+        print("OK")
+    else:
+        print("NOK")
+        sys.exit(1)
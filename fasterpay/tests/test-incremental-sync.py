@@ -0,0 +1,151 @@
+import os
+import tempfile
+
+from fasterpay.incrementalsync import IncrementalSync
+
+PER_PAGE = 10
+
+
+class StubSource:
+    """
+    Payouts held in memory and listed like `Payout.list_payouts`.
+
+    With `honour_sort` False the listing ignores `sort_by` and returns creation order,
+    newest first, as a server not supporting it would.
+    """
+
+    def __init__(self, count: int, honour_sort: bool = True):
+        self.honour_sort = honour_sort
+        self.records = {}
+        self.created = []
+        self.pages_read = 0
+        for index in range(count):
+            self.add(f"PO-{index:06d}", f"2025-05-01 10:{index // 60:02d}:{index % 60:02d}")
+
+    def add(self, record_id: str, updated_at: str = None) -> None:
+        self.records[record_id] = {"id": record_id, "updated_at": updated_at}
+        self.created.append(record_id)
+
+    def touch(self, record_id: str, updated_at: str) -> None:
+        self.records[record_id]["updated_at"] = updated_at
+
+    def list_payouts(self, params: dict) -> dict:
+        self.pages_read += 1
+        if self.honour_sort and params.get("sort_by") == "updated_at":
+            rows = sorted(self.records.values(), key=lambda record: (record["updated_at"] or "", record["id"]), reverse=True)
+        else:
+            rows = [self.records[record_id] for record_id in reversed(self.created)]
+        start = (params["page"] - 1) * params["per_page"]
+        page = [dict(row) for row in rows[start:start + params["per_page"]]]
+        return {"success": True, "data": {"current_page": params["page"], "data": page}}
+
+
+class StubGateway:
+    def __init__(self, source: StubSource):
+        self.source = source
+
+    def payout(self) -> StubSource:
+        return self.source
+
+
+def run(sync: IncrementalSync) -> list:
+    return [record["id"] for record in sync.changes("payouts")]
+
+
+def check_first_run_and_early_stop(path: str) -> None:
+    source = StubSource(55)
+    sync = IncrementalSync(StubGateway(source), path, per_page=PER_PAGE)
+    assert sorted(run(sync)) == sorted(source.records)
+    assert sync.watermark("payouts") == "2025-05-01 10:00:54"
+
+    source.pages_read = 0
+    assert run(sync) == []
+    assert source.pages_read == 1, source.pages_read
+
+    source.touch("PO-000003", "2025-05-02 08:00:00")
+    source.pages_read = 0
+    assert run(IncrementalSync(StubGateway(source), path, per_page=PER_PAGE)) == ["PO-000003"]
+    assert source.pages_read == 1, source.pages_read
+    print("first run: 55 records; later runs read one page for 0 and 1 change")
+
+
+def check_shared_watermark_second(path: str) -> None:
+    source = StubSource(25)
+    sync = IncrementalSync(StubGateway(source), path, per_page=PER_PAGE)
+    run(sync)
+    watermark = sync.watermark("payouts")
+
+    # Updated in the same second as the watermark, after the previous run read it.
+    source.add("PO-900000", watermark)
+    source.touch("PO-000004", watermark)
+    assert sorted(run(sync)) == ["PO-000004", "PO-900000"]
+    assert run(sync) == []
+    print("shared watermark second: records updated in the same second emitted once")
+
+
+def check_crash_and_resume(path: str) -> None:
+    source = StubSource(45)
+    sync = IncrementalSync(StubGateway(source), path, per_page=PER_PAGE)
+    run(sync)
+
+    for index in range(30):
+        source.touch(f"PO-{index:06d}", f"2025-05-03 09:00:{index:02d}")
+    emitted = []
+    changes = sync.changes("payouts")
+    for record in changes:
+        emitted.append(record["id"])
+        if len(emitted) == 15:
+            break  # The process dies in the middle of the second page.
+    changes.close()
+
+    # Between the crash and the restart, records of the first page are updated again
+    # and move ahead of the ones already consumed.
+    for index in range(25, 30):
+        source.touch(f"PO-{index:06d}", f"2025-05-03 09:01:{index:02d}")
+    resumed = run(IncrementalSync(StubGateway(source), path, per_page=PER_PAGE))
+    changed = {f"PO-{index:06d}" for index in range(30)}
+    assert set(emitted) | set(resumed) == changed, sorted(changed - set(emitted) - set(resumed))
+    assert set(resumed) <= changed
+    assert run(IncrementalSync(StubGateway(source), path, per_page=PER_PAGE)) == []
+    print(f"crash and resume: {len(emitted)} emitted before the crash, {len(resumed)} after, none lost")
+
+
+def check_unsorted_listing(path: str) -> None:
+    source = StubSource(45, honour_sort=False)
+    # An update puts creation order and update order apart, so the first complete
+    # scan can tell the listing ignores the sort.
+    source.touch("PO-000020", "2025-05-02 00:00:00")
+    sync = IncrementalSync(StubGateway(source), path, per_page=PER_PAGE)
+    run(sync)
+
+    # The oldest record, on the last page in creation order, changes.
+    source.touch("PO-000000", "2025-05-04 12:00:00")
+    source.pages_read = 0
+    assert run(sync) == ["PO-000000"]
+    assert source.pages_read == 5, source.pages_read
+    print("unsorted listing: every page read, change on the last page found")
+
+
+def check_missing_updated_at(path: str) -> None:
+    source = StubSource(15)
+    source.add("PO-NODATE")
+    sync = IncrementalSync(StubGateway(source), path, per_page=PER_PAGE)
+    assert "PO-NODATE" in run(sync)
+    # Sorted last, on the second page, it is still reached by later runs.
+    source.pages_read = 0
+    assert run(sync) == ["PO-NODATE"]
+    assert source.pages_read == 2, source.pages_read
+    print("missing updated_at: emitted on every run")
+
+
+if __name__ == "__main__":
+    for check in (
+        check_first_run_and_early_stop,
+        check_shared_watermark_second,
+        check_crash_and_resume,
+        check_unsorted_listing,
+        check_missing_updated_at,
+    ):
+        with tempfile.TemporaryDirectory() as directory:
+            check(os.path.join(directory, "sync.json"))
+    print("OK")
@@ -0,0 +1,66 @@
+import json
+import timeit
+from datetime import timedelta
+
+import requests
+
+from fasterpay.gateway import Gateway
+from fasterpay.instrumentation import HistogramCollector, endpoint_template
+
+TEMPLATES = {
+    "https://pay.fasterpay.com/api/v1/deliveries": "/api/v1/deliveries",
+    "https://pay.fasterpay.com/api/v1/deliveries/123456": "/api/v1/deliveries/{id}",
+    "https://pay.fasterpay.com/payment/13330/refund": "/payment/{id}/refund",
+    "https://business.fasterpay.com/api/external/invoices/FPBIV-250528-0001?page=2": "/api/external/invoices/{id}",
+    "https://business.fasterpay.com/api/external/payouts/PO-000001": "/api/external/payouts/{id}",
+    "https://business.fasterpay.com/api/external/contacts/123e4567-e89b-12d3-a456-426614174000": "/api/external/contacts/{id}",
+    "https://business.fasterpay.com/api/external/countries/US/states": "/api/external/countries/{code}/states",
+    "https://business.fasterpay.com/api/external/invoices/taxes": "/api/external/invoices/taxes",
+}
+
+
+class CannedSession:
+    """Stands in for requests.Session so only SDK-side overhead is measured."""
+
+    def __init__(self):
+        self.response = requests.Response()
+        self.response.status_code = 200
+        self.response._content = b'{"success":true,"data":{"id":"FPBIV-250528-0001","status":"paid"}}'
+        self.response.elapsed = timedelta(0)
+
+    def request(self, method, url, **kwargs):
+        return self.response
+
+
+def per_call_ns(gateway: Gateway, number: int = 50000) -> float:
+    gateway.transport.session = CannedSession()
+    einvoice = gateway.einvoice()
+    best = min(timeit.repeat(lambda: einvoice.get_invoice("FPBIV-250528-0001"), number=number, repeat=5))
+    return best / number * 1e9
+
+
+def baseline_ns(number: int = 50000) -> float:
+    """Bare session call plus JSON decode, without any SDK code around it."""
+    session = CannedSession()
+    url = "https://business.fasterpay.com/api/external/invoices/FPBIV-250528-0001"
+    call = lambda: json.loads(session.request("GET", url, headers={"X-ApiKey": ""}, params={}).content)
+    best = min(timeit.repeat(call, number=number, repeat=5))
+    return best / number * 1e9
+
+
+if __name__ == "__main__":
+    for url, template in TEMPLATES.items():
+        assert endpoint_template(url) == template, (url, endpoint_template(url))
+    print(f"endpoint templates: {len(TEMPLATES)} URLs reduced as expected")
+
+    baseline = baseline_ns()
+    disabled = per_call_ns(Gateway("<your public key>", "<your private key>", True))
+
+    traced = Gateway("<your public key>", "<your private key>", True)
+    collector = traced.add_tracer(HistogramCollector())
+    enabled = per_call_ns(traced)
+
+    print(f"bare session call + decode:  {baseline:8.0f} ns/call")
+    print(f"get_invoice, hooks disabled: {disabled:8.0f} ns/call")
+    print(f"get_invoice, histogram on:   {enabled:8.0f} ns/call (+{enabled - disabled:.0f} ns)")
+    print(collector.snapshot()["calls"]["GET /api/external/invoices/{id}"]["duration"])
@@ -0,0 +1,58 @@
+import requests
+
+from fasterpay.gateway import Gateway
+from fasterpay.invoicebatch import InvoiceBatch
+from fasterpay.tests.mockserver import MockFasterPayServer
+
+CONTACTS = "/api/external/contacts"
+PRODUCTS = "/api/external/invoices/products"
+TAXES = "/api/external/invoices/taxes"
+INVOICES = "/api/external/invoices"
+
+
+def spec(index: int) -> dict:
+    """Six invoices for two customers, sharing two products; the first two carry a tax."""
+    email = "ann@example.com" if index % 2 else "Bob@Example.com"
+    items = [{"price": 100, "quantity": 1, "product": {"name": "Consulting", "sku": "CONSULT", "type": "digital"}}]
+    if index % 3 == 0:
+        items.append({"price": 50, "quantity": 1, "product": {"name": "Setup", "sku": "SETUP", "type": "digital"}})
+    invoice = {"currency": "USD", "contact": {"email": email if index < 4 else email.lower()}, "items": items}
+    if index < 2:
+        invoice["tax"] = {"name": "VAT", "value": 20}
+    return invoice
+
+
+def check_batch() -> None:
+    with MockFasterPayServer(statuses={TAXES: 422}) as server:
+        gateway = Gateway("<your public key>", "<your private key>", True, external_api_url=server.url)
+        gateway.transport.session.trust_env = False
+        outcomes = sorted(InvoiceBatch(gateway).run([spec(index) for index in range(6)], send=True), key=lambda o: o["index"])
+        assert [outcome["index"] for outcome in outcomes] == list(range(6))
+
+        # Shared contacts and products are created once; the emails differ only in case.
+        created = {}
+        for position, (_, path, record_id) in enumerate(server.writes):
+            created.setdefault(path, []).append((record_id, position))
+        assert len(created[CONTACTS]) == 2 and len(created[PRODUCTS]) == 2, created
+        positions = {record_id: position for entries in created.values() for record_id, position in entries}
+
+        # Dependencies are created before the invoices using them, and wired by ID.
+        for outcome in outcomes[2:]:
+            assert outcome["error"] is None, outcome
+            invoice = outcome["invoice"]["data"]
+            dependencies = [invoice["contact_id"]] + [item["product_id"] for item in invoice["items"]]
+            assert all(positions[record_id] < positions[invoice["id"]] for record_id in dependencies), invoice
+            assert outcome["sent"]["data"]["path"] == f"{INVOICES}/{invoice['id']}/send"
+
+        # The tax failed once: both invoices needing it report that error and nothing else ran for them.
+        first, second = outcomes[0]["error"], outcomes[1]["error"]
+        assert isinstance(first, requests.HTTPError) and first.response.status_code == 422, first
+        assert first is second, "the shared tax was created more than once"
+        assert outcomes[0]["invoice"] is None and outcomes[1]["invoice"] is None
+        assert len(created[INVOICES]) == 4, created[INVOICES]
+    print("invoice batch: 2 contacts and 2 products for 6 invoices, created first; failed tax reported per invoice")
+
+
+if __name__ == "__main__":
+    check_batch()
+    print("OK")
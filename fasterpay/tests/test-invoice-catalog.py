@@ -0,0 +1,106 @@
+import threading
+import time
+
+from fasterpay.gateway import Gateway
+from fasterpay.tests.mockserver import MockFasterPayServer
+
+RECORDS = 1500  # Two pages per collection.
+
+
+def new_gateway(url: str) -> Gateway:
+    gateway = Gateway("<your public key>", "<your private key>", True, external_api_url=url)
+    gateway.transport.session.trust_env = False
+    return gateway
+
+
+def check_lazy_load(server: MockFasterPayServer) -> None:
+    catalog = new_gateway(server.url).invoice_catalog()
+    assert server.requests == 0, "creating the catalog must not call FasterPay"
+
+    product = catalog.product(name="Products 7")
+    assert product["id"] == "PR-250508-000007", product
+    assert catalog.price(product["id"], "usd") == 17
+    assert server.requests == 2, server.requests
+
+    # Loaded once; other collections wait for their own first lookup.
+    assert catalog.product(product_id="PR-250516-001499")["name"] == "products 1499"
+    assert server.requests == 2, server.requests
+    assert catalog.tax(name="taxes 3")["id"] == "TA-250504-000003"
+    assert catalog.discount(name="no such discount") is None
+    assert server.requests == 6, server.requests
+    print("lazy load: each collection fetched on first lookup, 2 pages, once")
+
+
+def check_mutation_hooks(server: MockFasterPayServer) -> None:
+    gateway = new_gateway(server.url)
+    einvoice = gateway.einvoice()
+    # Mutations to collections not loaded yet are left to their first load.
+    einvoice.create_invoice_tax({"name": "Early", "value": 5})
+    catalog = gateway.invoice_catalog()
+    assert catalog.tax(name="Early") is None
+    assert catalog.product(sku="CONSULT") is None and catalog.discount(name="Launch") is None
+
+    created = einvoice.create_invoice_product({"name": "Consulting", "sku": "CONSULT", "type": "digital",
+                                               "prices": [{"price": 120, "currency": "EUR"}]})["data"]
+    assert catalog.product(sku="CONSULT")["id"] == created["id"]
+    assert catalog.price(created["id"], "EUR") == 120
+
+    einvoice.update_invoice_product(created["id"], {"id": created["id"], "name": "Advice", "sku": "ADVICE",
+                                                    "prices": [{"price": 90, "currency": "EUR"}]})
+    assert catalog.product(sku="CONSULT") is None and catalog.product(name="Consulting") is None
+    assert catalog.product(sku="ADVICE")["id"] == created["id"] and catalog.price(created["id"], "EUR") == 90
+
+    einvoice.delete_invoice_product_price(created["id"], "EUR")
+    assert catalog.price(created["id"], "EUR") is None and catalog.product(sku="ADVICE")["prices"] == []
+    einvoice.delete_invoice_product(created["id"])
+    assert catalog.product(product_id=created["id"]) is None and catalog.product(sku="ADVICE") is None
+
+    tax = einvoice.create_invoice_tax({"name": "VAT", "value": 20})["data"]
+    assert catalog.tax(name="vat")["id"] == tax["id"]
+    einvoice.delete_invoice_tax(tax["id"])
+    assert catalog.tax(name="VAT") is None
+
+    discount = einvoice.create_invoice_discount({"name": "Launch", "type": "flat", "value": 5, "currency": "USD"})["data"]
+    assert catalog.discount(name="Launch")["id"] == discount["id"]
+    assert catalog.resolve_item({"product_id": "PR-250501-000000", "discount": "launch"}, "USD") == {
+        "product_id": "PR-250501-000000", "price": 10, "quantity": 1, "discount_id": discount["id"]
+    }
+    print("mutation hooks: created, updated and deleted records applied to the catalog")
+
+
+def check_reload_outside_lock(server: MockFasterPayServer) -> None:
+    gateway = new_gateway(server.url)
+    catalog = gateway.invoice_catalog()
+    catalog.tax(name="taxes 0")
+    catalog.product(name="products 0")
+    local = gateway.einvoice().create_invoice_product({"name": "Local", "type": "digital"})["data"]
+    assert catalog.product(name="Local")["id"] == local["id"]
+
+    # Slow down the reload: every page now takes 0.3s.
+    server.latency = 0.3
+    reload = threading.Thread(target=catalog.refresh, args=("products",))
+    reload.start()
+    time.sleep(0.1)
+    started = time.monotonic()
+    # Lookups and mutation hooks answer from the previous data while it runs.
+    assert catalog.product(name="Local")["id"] == local["id"]
+    assert catalog.product(product_id="PR-250516-001499") is not None
+    assert catalog.tax(name="taxes 0") is not None
+    catalog.upsert("taxes", {"id": "TA-LOCAL", "name": "Local tax"})
+    elapsed = time.monotonic() - started
+    assert reload.is_alive(), "the reload finished before the lookups"
+    assert elapsed < 0.1, f"lookups waited {elapsed:.2f}s for the reload"
+    reload.join()
+
+    # The reloaded collection replaces the previous one at once.
+    assert catalog.product(name="Local") is None
+    assert catalog.product(product_id="PR-250516-001499") is not None
+    assert catalog.tax(name="Local tax")["id"] == "TA-LOCAL"
+    print(f"reload: lookups answered in {elapsed * 1000:.1f}ms during a 0.6s reload, swapped in when complete")
+
+
+if __name__ == "__main__":
+    for check in (check_lazy_load, check_mutation_hooks, check_reload_outside_lock):
+        with MockFasterPayServer(records=RECORDS) as server:
+            check(server)
+    print("OK")
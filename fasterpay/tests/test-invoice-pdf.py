@@ -0,0 +1,72 @@
+import io
+import os
+import tempfile
+
+from fasterpay.gateway import Gateway
+from fasterpay.tests.mockserver import MockFasterPayServer
+
+PREVIEW = b"<html><body>" + b"invoice " * 4096 + b"</body></html>"
+
+
+def new_gateway(url: str) -> Gateway:
+    gateway = Gateway("<your public key>", "<your private key>", True, external_api_url=url)
+    gateway.transport.session.trust_env = False
+    return gateway
+
+
+def check_destinations(directory: str) -> None:
+    with MockFasterPayServer() as server:
+        invoices = new_gateway(server.url).einvoice()
+        path = os.path.join(directory, "INV-1.html")
+        assert invoices.download_invoice_pdf("INV-1", path, chunk_size=1024) == len(PREVIEW)
+        with open(path, "rb") as fileobj:
+            assert fileobj.read() == PREVIEW
+        assert os.listdir(directory) == ["INV-1.html"], os.listdir(directory)
+
+        buffer = io.BytesIO()
+        assert invoices.download_invoice_pdf("INV-1", buffer, chunk_size=1024) == len(PREVIEW)
+        assert buffer.getvalue() == PREVIEW
+    print(f"destinations: {len(PREVIEW)} bytes streamed to a path and to a file object")
+
+
+def check_interrupted(directory: str) -> None:
+    path = os.path.join(directory, "INV-1.html")
+    with open(path, "wb") as fileobj:
+        fileobj.write(b"previous")
+    with MockFasterPayServer(truncate_pdfs=True) as server:
+        invoices = new_gateway(server.url).einvoice()
+        try:
+            invoices.download_invoice_pdf("INV-1", path, chunk_size=1024)
+            raise AssertionError("truncated preview downloaded")
+        except Exception as error:
+            assert not isinstance(error, AssertionError), error
+
+        # The earlier download is left untouched and the partial one removed.
+        assert os.listdir(directory) == ["INV-1.html"], os.listdir(directory)
+        with open(path, "rb") as fileobj:
+            assert fileobj.read() == b"previous"
+
+        missing = os.path.join(directory, "INV-2.html")
+        outcomes = list(invoices.download_invoice_pdfs(["INV-2"], directory))
+        assert outcomes[0]["error"] is not None and outcomes[0]["bytes"] == 0, outcomes
+        assert not os.path.exists(missing) and not os.path.exists(f"{missing}.part")
+    print("interrupted: no partial file at the target, no .part left behind")
+
+
+def check_concurrency_cap(directory: str) -> None:
+    invoice_ids = [f"INV-{index}" for index in range(12)]
+    with MockFasterPayServer(latency=0.05) as server:
+        invoices = new_gateway(server.url).einvoice()
+        outcomes = list(invoices.download_invoice_pdfs(invoice_ids, directory, filename="{invoice_id}.pdf.html", max_workers=3))
+        assert sorted(outcome["invoice_id"] for outcome in outcomes) == sorted(invoice_ids)
+        assert all(outcome["error"] is None and outcome["bytes"] == len(PREVIEW) for outcome in outcomes), outcomes
+        assert sorted(os.listdir(directory)) == sorted(f"{invoice_id}.pdf.html" for invoice_id in invoice_ids)
+        assert server.peak_concurrency == 3, server.peak_concurrency
+    print(f"concurrency cap: {len(invoice_ids)} previews, at most {server.peak_concurrency} at once")
+
+
+if __name__ == "__main__":
+    for check in (check_destinations, check_interrupted, check_concurrency_cap):
+        with tempfile.TemporaryDirectory() as directory:
+            check(directory)
+    print("OK")
@@ -0,0 +1,138 @@
+import argparse
+import json
+import re
+import time
+from decimal import Decimal
+from urllib.parse import urlsplit
+
+from fasterpay.cassette import Cassette
+from fasterpay.gateway import Gateway
+from fasterpay.invoicetotals import InvoiceTotals
+
+PUBLIC_KEY = "<your public key>"
+PRIVATE_KEY = "<your private key>"
+TOTAL_FIELDS = ("subtotal", "discount", "tax", "total")
+INVOICE_PATH = re.compile(r"^/api/external/invoices/(?!products|taxes|discounts|templates)[^/]+$")
+
+
+class FixtureCatalog:
+    """In-memory reference data with the lookups of `InvoiceCatalog` used by `InvoiceTotals`."""
+
+    def __init__(self, prices: dict, taxes: dict, discounts: dict):
+        self.prices, self.taxes, self.discounts = prices, taxes, discounts
+
+    def price(self, product_id, currency):
+        return self.prices.get((product_id, currency))
+
+    def tax(self, name=None, tax_id=None):
+        return self.taxes.get(tax_id)
+
+    def discount(self, name=None, discount_id=None):
+        return self.discounts.get(discount_id)
+
+
+CATALOG = FixtureCatalog(
+    prices={("PD-1", "USD"): 19.99, ("PD-2", "USD"): "4.35", ("PD-1", "JPY"): 2500, ("PD-3", "KWD"): "1.2345"},
+    taxes={"TX-VAT": {"id": "TX-VAT", "value": 20}, "TX-GST": {"id": "TX-GST", "value": 7.25}},
+    discounts={
+        "DC-10": {"id": "DC-10", "type": "percentage", "value": 10},
+        "DC-5USD": {"id": "DC-5USD", "type": "flat", "value": 5, "currency": "USD"},
+    },
+)
+
+# Worked by hand: every amount rounded half up to the currency's minor unit when computed.
+WORKED_EXAMPLES = [
+    (
+        {"currency": "USD", "items": [{"product_id": "PD-1", "quantity": 3, "tax_id": "TX-VAT"}]},
+        # 59.97, tax 11.994 -> 11.99
+        {"subtotal": "59.97", "discount": "0.00", "tax": "11.99", "total": "71.96"},
+    ),
+    (
+        {"currency": "USD", "items": [
+            {"product_id": "PD-2", "quantity": 7, "discount_id": "DC-10", "tax_id": "TX-GST"},
+            {"product_id": "PD-1", "price": "0.05", "quantity": 1},
+        ], "discount_id": "DC-5USD"},
+        # 30.45 - 3.045 -> 3.05 = 27.40, tax 1.9865 -> 1.99; + 0.05; invoice discount 5.00
+        {"subtotal": "30.50", "discount": "8.05", "tax": "1.99", "total": "24.44"},
+    ),
+    (
+        {"currency": "JPY", "items": [{"product_id": "PD-1", "quantity": 2, "tax_id": "TX-GST"}], "discount_id": "DC-10"},
+        # 5000, line tax 362.5 -> 363, invoice discount 500
+        {"subtotal": "5000", "discount": "500", "tax": "363", "total": "4863"},
+    ),
+    (
+        {"currency": "KWD", "items": [{"product_id": "PD-3", "quantity": 3}], "tax_id": "TX-VAT"},
+        # 3.7035 -> 3.704, invoice tax 0.7408 -> 0.741
+        {"subtotal": "3.704", "discount": "0", "tax": "0.741", "total": "4.445"},
+    ),
+]
+
+
+def check_worked_examples() -> None:
+    totals = InvoiceTotals(CATALOG)
+    for invoice, expected in WORKED_EXAMPLES:
+        computed = totals.compute(invoice)
+        for field in TOTAL_FIELDS:
+            assert computed[field] == Decimal(expected[field]), (invoice, field, computed[field], expected[field])
+    print(f"worked examples: {len(WORKED_EXAMPLES)} invoices match")
+
+
+def benchmark(invoices: int) -> None:
+    batch = [
+        {"currency": "USD", "discount_id": "DC-10" if index % 3 else None, "items": [
+            {"product_id": "PD-1", "quantity": 1 + index % 5, "tax_id": "TX-VAT"},
+            {"product_id": "PD-2", "quantity": 1 + index % 7, "discount_id": "DC-5USD", "tax_id": "TX-GST"},
+        ]}
+        for index in range(invoices)
+    ]
+    started = time.perf_counter()
+    InvoiceTotals(CATALOG).compute_many(batch)
+    elapsed = time.perf_counter() - started
+    print(f"compute_many: {invoices} invoices in {elapsed * 1000:.1f} ms ({invoices / elapsed:.0f} invoices/s)")
+
+
+def check_cassette(path: str) -> None:
+    """
+    Compare local totals with the server's, for every invoice read in a cassette.
+
+    Record the cassette against the sandbox with `Cassette(path, mode="record")`, listing
+    the invoice taxes, discounts and products and calling `get_invoice` for invoices
+    created there. Only total fields the response carries are compared.
+    """
+    gateway = Gateway(PUBLIC_KEY, PRIVATE_KEY, True)
+    cassette = Cassette(path)
+    gateway.transport.use_cassette(cassette)
+    totals = gateway.einvoice().totals()
+    checked = mismatched = 0
+    for interaction in cassette.interactions:
+        path = urlsplit(interaction["url"]).path
+        if interaction["method"] != "GET" or not INVOICE_PATH.match(path) or interaction["status"] != 200:
+            continue
+        invoice = json.loads(interaction["body"]).get("data") or {}
+        if not invoice.get("currency") or not invoice.get("items"):
+            continue
+        items = [
+            {**item, "product_id": item.get("product_id") or (item.get("product") or {}).get("id")}
+            for item in invoice.get("items") or []
+        ]
+        computed = totals.compute({**invoice, "items": items})
+        for field in TOTAL_FIELDS:
+            if invoice.get(field) is not None:
+                checked += 1
+                if computed[field] != Decimal(str(invoice[field])):
+                    mismatched += 1
+                    print(f"{invoice.get('id')}: {field} computed {computed[field]}, server {invoice[field]}")
+    print(f"cassette parity: {checked} amounts compared, {mismatched} mismatched")
+    assert not mismatched
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check local invoice totals and measure batch throughput.")
+    parser.add_argument("--invoices", type=int, default=10000)
+    parser.add_argument("--cassette", help="Cassette of sandbox invoice reads to check parity against.")
+    args = parser.parse_args()
+
+    check_worked_examples()
+    benchmark(args.invoices)
+    if args.cassette:
+        check_cassette(args.cassette)
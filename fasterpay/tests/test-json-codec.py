@@ -0,0 +1,79 @@
+import timeit
+
+from fasterpay.codec import JsonCodec, OrjsonCodec
+
+
+def invoice_list_page(count: int = 1000) -> dict:
+    invoices = [
+        {
+            "id": f"FPBIV-250528-{i:04d}",
+            "status": "sent",
+            "currency": "USD",
+            "contact_id": f"CT-250527-{i:04d}",
+            "invoice_template_id": "IT-250527-AZAR",
+            "due_date": "2025-06-30",
+            "summary": {"subtotal": 120.0, "discount": 12.0, "tax": 21.6, "total": 129.6},
+            "items": [
+                {
+                    "price": 40.0,
+                    "quantity": 3,
+                    "product": {"id": f"PD-{i:04d}", "sku": f"SKU-{i % 50}", "name": "Consulting hour", "type": "digital"},
+                    "tax": {"id": "TX-250527-2E9N", "name": "VAT", "type": "percentage", "value": 20},
+                    "discount": {"id": "DC-250527-WZ1H", "name": "Spring", "type": "percentage", "value": 10},
+                }
+            ],
+            "created_at": "2025-05-28 10:00:00",
+            "updated_at": "2025-05-28 10:05:00",
+        }
+        for i in range(count)
+    ]
+    return {"success": True, "data": {"current_page": 1, "per_page": count, "total": count, "data": invoices}}
+
+
+def payout_batch(count: int = 500) -> dict:
+    return {
+        "source_currency": "EUR",
+        "template": "bank_account",
+        "payouts": [
+            {
+                "amount": "150.00",
+                "amount_currency": "EUR",
+                "target_currency": "EUR",
+                "receiver_type": "private",
+                "receiver_full_name": f"Receiver {i}",
+                "receiver_email": f"receiver{i}@example.com",
+                "bank_beneficiary_country": "DE",
+                "bank_beneficiary_address": "Hauptstrasse 1, Berlin",
+                "bank_account_number": f"DE8937040044053201{i:04d}",
+                "bank_swift_code": "COBADEFFXXX",
+                "bank_name": "Commerzbank",
+                "reference_id": f"payout-{i}",
+            }
+            for i in range(count)
+        ],
+    }
+
+
+def codecs() -> list:
+    available = [JsonCodec()]
+    try:
+        available.append(OrjsonCodec())
+    except ImportError:
+        print("orjson is not installed, benchmarking the standard library codec only")
+    return available
+
+
+if __name__ == "__main__":
+    payloads = {"invoice list page (1000)": invoice_list_page(), "payout batch (500)": payout_batch()}
+
+    for label, payload in payloads.items():
+        for codec in codecs():
+            encoded = codec.dumps(payload)
+            assert codec.loads(encoded) == payload
+
+            encode = min(timeit.repeat(lambda: codec.dumps(payload), number=20, repeat=5)) / 20
+            decode = min(timeit.repeat(lambda: codec.loads(encoded), number=20, repeat=5)) / 20
+            print(
+                f"{label:<26} {codec.name:<7} {len(encoded) / 1024:8.1f} KiB  "
+                f"encode {encode * 1000:7.2f} ms  decode {decode * 1000:7.2f} ms"
+            )
@@ -0,0 +1,118 @@
+import os
+import socket
+import tempfile
+
+from fasterpay.gateway import Gateway
+from fasterpay.outbox import Outbox
+from fasterpay.tests.mockserver import MockFasterPayServer
+
+
+def new_gateway(url: str, **options) -> Gateway:
+    gateway = Gateway("<your public key>", "<your private key>", True, api_url=url, external_api_url=url, **options)
+    gateway.transport.session.trust_env = False
+    return gateway
+
+
+def check_enqueue_and_drain(path: str) -> None:
+    with MockFasterPayServer() as server:
+        outbox = Outbox(new_gateway(server.url), path, backoff=0.0)
+        first = outbox.deliver({"payment_id": "1167", "status": "delivered"})
+        outbox.refund("1167", 0.01)
+        outbox.refund("1168", 2.5)
+        assert server.requests == 0, "queueing must not call FasterPay"
+        assert outbox.stats()["depth"] == 3 and first == 1
+
+        # One call per payment per batch: the refund of 1167 waits for its delivery.
+        assert outbox.drain(max_batches=1) == 2
+        assert outbox.drain() == 1
+        stats = outbox.stats()
+        assert stats["depth"] == 0 and stats["sent"] == 3 and stats["latency"]["count"] == 3, stats
+        keys = server.idempotency_keys
+        assert len(keys) == 3 and len(set(keys)) == 3 and None not in keys, keys
+        outbox.close()
+    print("enqueue and drain: 3 calls sent in 2 batches, each with its own key")
+
+
+def check_rejected(path: str) -> None:
+    with MockFasterPayServer(statuses={"/payment/1167/refund": 422}) as server:
+        outbox = Outbox(new_gateway(server.url), path, backoff=0.0)
+        call_id = outbox.refund("1167", 0.01)
+        outbox.refund("1168", 0.01)
+        outbox.drain()
+        assert server.requests == 2, server.requests
+        stats = outbox.stats()
+        assert stats["dead"] == 1 and stats["sent"] == 1 and stats["depth"] == 0, stats
+        dead = outbox.dead()
+        assert [entry["id"] for entry in dead] == [call_id] and "422" in dead[0]["last_error"], dead
+
+        del server.statuses["/payment/1167/refund"]
+        assert outbox.requeue_dead() == 1 and outbox.drain() == 1
+        assert server.idempotency_keys[0] == server.idempotency_keys[-1], "requeued call got a new key"
+        assert outbox.stats()["dead"] == 0
+        outbox.close()
+    print("4xx: rejected refund kept dead, requeued with its key")
+
+
+def check_ambiguous_failures(path: str) -> None:
+    with MockFasterPayServer(error_rate=1.0) as server:
+        outbox = Outbox(new_gateway(server.url), path, backoff=0.0)
+        failed_id = outbox.refund("1167", 0.01)
+        outbox.drain()
+        outbox.drain()
+        # Sent once: a 503 may follow a refund that was applied.
+        assert server.requests == 1, server.requests
+        stats = outbox.stats()
+        assert stats["unknown"] == 1 and stats["depth"] == 0 and stats["ambiguous"] == 1, stats
+        assert [entry["id"] for entry in outbox.unknown()] == [failed_id]
+
+        # Checked against FasterPay and not applied: sent again with its key.
+        server.error_rate = 0.0
+        outbox.resolve(failed_id, applied=False)
+        assert outbox.drain() == 1 and outbox.stats()["sent"] == 1
+        assert server.idempotency_keys == [server.idempotency_keys[0]] * 2, server.idempotency_keys
+        outbox.close()
+
+    os.remove(path)
+    with MockFasterPayServer(latency=0.5) as server:
+        outbox = Outbox(new_gateway(server.url, timeout=0.1), path, backoff=0.0)
+        timed_out_id = outbox.refund("1169", 0.01)
+        outbox.drain()
+        outbox.drain()
+        assert server.requests == 1, server.requests
+        assert [entry["id"] for entry in outbox.unknown()] == [timed_out_id]
+        assert "Timeout" in outbox.unknown()[0]["last_error"]
+
+        # Applied after all: dropped.
+        outbox.resolve(timed_out_id, applied=True)
+        assert outbox.unknown() == [] and outbox.stats()["depth"] == 0
+        try:
+            outbox.resolve(timed_out_id, applied=True)
+            raise AssertionError("resolved an unknown call twice")
+        except ValueError:
+            pass
+        outbox.close()
+    print("ambiguous failures: 503 and read timeout sent once, kept unknown until resolved")
+
+
+def check_unsent(path: str) -> None:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        url = f"http://127.0.0.1:{probe.getsockname()[1]}"
+    gateway = new_gateway(url)
+    gateway.transport.retries = 0
+    outbox = Outbox(gateway, path, backoff=0.0, max_attempts=3)
+    outbox.refund("1167", 0.01)
+    outbox.drain()
+    stats = outbox.stats()
+    # Connecting was refused: nothing was sent, so the refund is retried until given up.
+    assert stats["retried"] == 2 and stats["given_up"] == 1 and stats["unknown"] == 0, stats
+    assert outbox.dead()[0]["attempts"] == 3
+    outbox.close()
+    print("unsent: refused connections retried, given up after max_attempts")
+
+
+if __name__ == "__main__":
+    for check in (check_enqueue_and_drain, check_rejected, check_ambiguous_failures, check_unsent):
+        with tempfile.TemporaryDirectory() as directory:
+            check(os.path.join(directory, "outbox.db"))
+    print("OK")
@@ -0,0 +1,124 @@
+import os
+import tempfile
+
+from fasterpay.gateway import Gateway
+from fasterpay.pingbackjournal import PingbackJournal
+from fasterpay.redaction import SECRET_HEADERS
+
+PUBLIC_KEY = "<your public key>"
+PRIVATE_KEY = "<your private key>"
+PINGBACKS = 60
+SEGMENT_SIZE = 2048
+
+
+def pingback_body(index: int) -> bytes:
+    event = "refund" if index % 4 == 0 else "payment"
+    return f'{{"event":"{event}","payment_order":{{"id":{index},"status":"successful"}}}}'.encode()
+
+
+def fill(journal: PingbackJournal, gateway: Gateway) -> None:
+    """Journal PINGBACKS pingbacks: v2 signed, every fifth a v1 one, every seventh forged."""
+    signature = gateway.signature()
+    for index in range(PINGBACKS):
+        body = pingback_body(index)
+        if index % 5 == 0:
+            headers = {"X-ApiKey": PRIVATE_KEY}
+        else:
+            forged = index % 7 == 0
+            headers = {
+                "X-Fasterpay-Signature-Version": "v2",
+                "X-Fasterpay-Signature": "0" * 64 if forged else signature.calculate_pingback_hash(body),
+            }
+        gateway.pingback().validate(body, headers)
+    journal.close()
+
+
+def journal_bytes(directory: str) -> bytes:
+    return b"".join(open(os.path.join(directory, name), "rb").read() for name in sorted(os.listdir(directory)))
+
+
+def check_redaction_and_replay(directory: str) -> None:
+    gateway = Gateway(PUBLIC_KEY, PRIVATE_KEY, True, pingback_journal=directory)
+    journal = gateway.pingback_journal
+    journal.segment_size = SEGMENT_SIZE
+    fill(journal, gateway)
+
+    assert PRIVATE_KEY.encode() not in journal_bytes(directory), "private key written to the journal"
+    journal = PingbackJournal(directory, segment_size=SEGMENT_SIZE)
+    assert len(journal.segments()) > 2, journal.segments()
+
+    records = list(journal.records())
+    assert [bytes(record.body) for record in records] == [pingback_body(index) for index in range(PINGBACKS)]
+    assert all(record.headers.get("X-ApiKey", "[REDACTED]") == "[REDACTED]" for record in records)
+    refunds = [record.offset for record in journal.records(events={"refund"})]
+    assert len(refunds) == len(range(0, PINGBACKS, 4)), refunds
+    forged = [index for index in range(PINGBACKS) if index % 5 and index % 7 == 0]
+    assert len(list(journal.records(valid=False))) == len(forged)
+    # v2 signatures are kept by default, so every v2 pingback is checked again.
+    result = journal.verify(gateway)
+    v1 = len(range(0, PINGBACKS, 5))
+    assert result["redacted"] == v1, result
+    assert result["checked"] == PINGBACKS - v1 and len(result["invalid"]) == len(forged), result
+    journal.close()
+    print(
+        f"redaction and replay: {len(records)} pingbacks in {len(journal.segments())} segments, no private key; "
+        f"verify: {result['valid']} valid, {len(result['invalid'])} invalid, {result['redacted']} v1 redacted"
+    )
+
+
+def check_redacted_signatures(directory: str) -> None:
+    redact_headers = SECRET_HEADERS | {"x-fasterpay-signature"}
+    gateway = Gateway(PUBLIC_KEY, PRIVATE_KEY, True)
+    journal = PingbackJournal(directory, segment_size=SEGMENT_SIZE, redact_headers=redact_headers)
+    gateway._pingback_journal = journal
+    fill(journal, gateway)
+
+    journal = PingbackJournal(directory, segment_size=SEGMENT_SIZE, redact_headers=redact_headers)
+    result = journal.verify(gateway)
+    assert result["redacted"] == PINGBACKS and result["checked"] == 0, result
+    journal.close()
+    print("redacted signatures: every pingback skipped by verify")
+
+
+def check_recovery(directory: str) -> None:
+    gateway = Gateway(PUBLIC_KEY, PRIVATE_KEY, True)
+    journal = PingbackJournal(directory, segment_size=SEGMENT_SIZE)
+    gateway._pingback_journal = journal
+    fill(journal, gateway)
+    segments = journal.segments()
+    first, last = segments[0], segments[-1]
+    in_first = len(journal._entries(first))
+    in_last = len(journal._entries(last))
+
+    # A crash without fsync: the tail of the first segment is lost although later
+    # segments reached the disk, and its index still lists the torn record.
+    with open(journal._path(first, ".seg"), "r+b") as data:
+        data.truncate(os.path.getsize(journal._path(first, ".seg")) - 7)
+    # The last segment loses an index entry and gains half a record.
+    with open(journal._path(last, ".idx"), "r+b") as index:
+        index.truncate(os.path.getsize(journal._path(last, ".idx")) - 40)
+    with open(journal._path(last, ".seg"), "ab") as data:
+        data.write(b"\x01\x02\x03torn")
+
+    journal = PingbackJournal(directory, segment_size=SEGMENT_SIZE)
+    assert len(journal._entries(first)) == in_first - 1
+    assert len(journal._entries(last)) == in_last
+    assert all(journal._intact(segment) for segment in journal.segments())
+    records = list(journal.records())
+    assert len(records) == PINGBACKS - 1, len(records)
+    assert [bytes(record.body) for record in records] == [
+        pingback_body(index) for index in range(PINGBACKS) if index != in_first - 1
+    ]
+    assert not records[-1].valid, "a re-indexed record must be marked invalid"
+
+    journal.append(pingback_body(PINGBACKS), {}, False)
+    assert len(list(journal.records())) == PINGBACKS
+    journal.close()
+    print("recovery: torn record dropped from an earlier segment, last segment re-indexed and truncated")
+
+
+if __name__ == "__main__":
+    for check in (check_redaction_and_replay, check_redacted_signatures, check_recovery):
+        with tempfile.TemporaryDirectory() as directory:
+            check(directory)
+    print("OK")
@@ -0,0 +1,126 @@
+import argparse
+import asyncio
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fasterpay.gateway import Gateway
+from fasterpay.pingbackreceiver import PingbackASGIApp, PingbackReceiver, PingbackWSGIMiddleware
+
+PUBLIC_KEY = "<your public key>"
+PRIVATE_KEY = "<your private key>"
+
+
+def signed_pingbacks(gateway: Gateway, count: int) -> list:
+    """Signed v2 pingbacks with distinct order IDs, as (body, signature) pairs."""
+    signature = gateway.signature()
+    pingbacks = []
+    for index in range(count):
+        body = json.dumps({
+            "event": "payment",
+            "payment_order": {"id": 13330 + index, "merchant_order_id": str(index), "status": "successful"},
+            "pingback_ts": 1562838308,
+        }).encode()
+        pingbacks.append((body, signature.calculate_pingback_hash(body)))
+    return pingbacks
+
+
+def fulfil(handling_time: float):
+    def handler(event, gateway):
+        if handling_time:
+            time.sleep(handling_time)
+    return handler
+
+
+async def drive_asgi(app: PingbackASGIApp, pingbacks: list, concurrency: int) -> dict:
+    statuses = {}
+
+    async def post(body, signature):
+        scope = {
+            "type": "http",
+            "method": "POST",
+            "path": "/pingback",
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"x-fasterpay-signature", signature.encode()),
+                (b"x-fasterpay-signature-version", b"v2"),
+            ],
+        }
+        messages = iter([{"type": "http.request", "body": body, "more_body": False}])
+
+        async def receive():
+            return next(messages)
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                statuses[message["status"]] = statuses.get(message["status"], 0) + 1
+
+        await app(scope, receive, send)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(body, signature):
+        async with semaphore:
+            await post(body, signature)
+
+    await asyncio.gather(*(limited(body, signature) for body, signature in pingbacks))
+    return statuses
+
+
+def drive_wsgi(app: PingbackWSGIMiddleware, pingbacks: list, concurrency: int) -> dict:
+    statuses = {}
+
+    def post(pingback):
+        body, signature = pingback
+        environ = {
+            "REQUEST_METHOD": "POST",
+            "PATH_INFO": "/pingback",
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.input": io.BytesIO(body),
+            "HTTP_X_FASTERPAY_SIGNATURE": signature,
+            "HTTP_X_FASTERPAY_SIGNATURE_VERSION": "v2",
+        }
+        status = []
+        b"".join(app(environ, lambda line, headers: status.append(line)))
+        return int(status[0].split()[0])
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        for status in executor.map(post, pingbacks):
+            statuses[status] = statuses.get(status, 0) + 1
+    return statuses
+
+
+def report(name: str, statuses: dict, elapsed: float, receiver: PingbackReceiver) -> None:
+    total = sum(statuses.values())
+    metrics = receiver.metrics()
+    print(
+        f"{name:<5} {total / elapsed:10.0f} pingbacks/s  statuses {statuses}  "
+        f"max depth {metrics['max_depth']}/{metrics['capacity']}  "
+        f"queue wait p99 {metrics['queue_wait']['p99'] * 1000:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the pingback receiver in process.")
+    parser.add_argument("--pingbacks", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--max-queue", type=int, default=1000)
+    parser.add_argument("--handling-time", type=float, default=0.0, help="Seconds spent by the handler per event.")
+    args = parser.parse_args()
+
+    gateway = Gateway(PUBLIC_KEY, PRIVATE_KEY, True)
+    pingbacks = signed_pingbacks(gateway, args.pingbacks)
+
+    receiver = PingbackReceiver(fulfil(args.handling_time), gateway, workers=args.workers, max_queue=args.max_queue)
+    started = time.perf_counter()
+    statuses = asyncio.run(drive_asgi(PingbackASGIApp(receiver), pingbacks, args.concurrency))
+    report("ASGI", statuses, time.perf_counter() - started, receiver)
+    receiver.stop()
+
+    receiver = PingbackReceiver(fulfil(args.handling_time), gateway, workers=args.workers, max_queue=args.max_queue)
+    started = time.perf_counter()
+    statuses = drive_wsgi(PingbackWSGIMiddleware(None, receiver), pingbacks, args.concurrency)
+    report("WSGI", statuses, time.perf_counter() - started, receiver)
+    receiver.stop()
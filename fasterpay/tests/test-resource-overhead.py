@@ -0,0 +1,41 @@
+import timeit
+
+from fasterpay.gateway import Gateway
+from fasterpay.paymentform import PaymentForm
+from fasterpay.transaction import Transaction
+
+gateway = Gateway("<your public key>", "<your private key>", True)
+
+PINGBACK = '{"event":"payment","payment_order":{"id":13330,"merchant_order_id":"9654","status":"successful"}}'
+HEADERS = {
+    "X-Fasterpay-Signature": gateway.signature().calculate_pingback_hash(PINGBACK),
+    "X-Fasterpay-Signature-Version": "v2",
+}
+
+
+def payload() -> dict:
+    return {
+        "payload": {
+            "description": "Golden Ticket",
+            "amount": "10.00",
+            "currency": "EUR",
+            "merchant_order_id": "1234",
+            "sign_version": "v2",
+        }
+    }
+
+
+CASES = {
+    "gateway.transaction() (cached)": lambda: gateway.transaction(),
+    "Transaction(gateway) (new object)": lambda: Transaction(gateway),
+    "gateway.payment_form().build_form()": lambda: gateway.payment_form().build_form(payload()),
+    "PaymentForm(gateway).build_form()": lambda: PaymentForm(gateway).build_form(payload()),
+    "gateway.pingback().validate()": lambda: gateway.pingback().validate(PINGBACK, HEADERS),
+}
+
+
+if __name__ == "__main__":
+    for name, call in CASES.items():
+        number = 20000
+        best = min(timeit.repeat(call, number=number, repeat=5))
+        print(f"{name:<40} {best / number * 1e9:10.0f} ns/call")
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import time
+import timeit
+
+import requests
+from requests.adapters import BaseAdapter
+
+from fasterpay.gateway import Gateway
+from fasterpay.singleflight import SingleFlight
+from fasterpay.tests.mockserver import MockFasterPayServer
+
+INVOICE = b'{"success":true,"data":{"id":"FPBIV-000001","status":"draft"}}'
+
+
+class StaticAdapter(BaseAdapter):
+    """Answer every request with the same invoice, in process."""
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        response = requests.Response()
+        response.status_code = 200
+        response.headers["Content-Type"] = "application/json"
+        response._content = INVOICE
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+def check_threads() -> None:
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def call():
+        started.set()
+        release.wait()
+        return "invoice"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("key", call))) for _ in range(8)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    while flight.stats()["shared"] < 7:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["invoice"] * 8 and flight.stats()["calls"] == 1, (results, flight.stats())
+    print("threads: 8 callers, 1 call")
+
+
+async def check_cancelled_leader() -> None:
+    flight = SingleFlight()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "invoice"
+
+    leader = asyncio.ensure_future(flight.do_async("key", call))
+    await asyncio.sleep(0)
+    followers = [asyncio.ensure_future(flight.do_async("key", call)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    results = await asyncio.gather(*followers)
+    assert leader.cancelled()
+    assert results == ["invoice"] * 3 and len(calls) == 1, (results, calls)
+    print("asyncio: cancelled leader, 3 followers served by its call")
+
+
+async def check_abandoned_call() -> None:
+    flight = SingleFlight()
+    cancelled = asyncio.Event()
+
+    async def call():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    waiters = [asyncio.ensure_future(flight.do_async("key", call)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.wait_for(cancelled.wait(), 1)
+    assert flight.stats()["in_flight"] == 0, flight.stats()
+
+    async def fresh():
+        return "invoice"
+
+    assert await flight.do_async("key", fresh) == "invoice"
+    print("asyncio: call cancelled once every caller is gone")
+
+
+async def check_async_transport() -> None:
+    with MockFasterPayServer(latency=0.1) as server:
+        gateway = Gateway("<your public key>", "<your private key>", True, external_api_url=server.url, coalesce_reads=True)
+        gateway.transport.session.trust_env = False
+        url = f"{server.url}/api/external/invoices/FPBIV-000001"
+        responses = await asyncio.gather(*(gateway.transport.request_async("GET", url) for _ in range(10)))
+        assert server.requests == 1, server.requests
+        assert all(response.status_code == 200 for response in responses)
+        assert len({id(response) for response in responses}) == 1, "coalesced callers share the response"
+    print("asyncio: 10 concurrent GETs through the transport, 1 request")
+
+
+def overhead() -> None:
+    for coalesce in (False, True):
+        gateway = Gateway("<your public key>", "<your private key>", True, coalesce_reads=coalesce)
+        gateway.transport.session.mount("https://", StaticAdapter())
+        # Skip the proxy lookup in the environment, which would dwarf the SDK's share.
+        gateway.transport.session.trust_env = False
+        einvoice = gateway.einvoice()
+        number = 5000
+        best = min(timeit.repeat(lambda: einvoice.get_invoice("FPBIV-000001"), number=number, repeat=5))
+        print(f"get_invoice, coalesce_reads={coalesce!s:<5} {best / number * 1e6:8.1f} us/call")
+
+
+if __name__ == "__main__":
+    check_threads()
+    asyncio.run(check_cancelled_leader())
+    asyncio.run(check_abandoned_call())
+    asyncio.run(check_async_transport())
+    overhead()
+    print("OK")
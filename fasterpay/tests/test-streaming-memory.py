@@ -0,0 +1,99 @@
+import json
+import tracemalloc
+
+import requests
+
+from fasterpay.gateway import Gateway
+from fasterpay.pagination import iter_records
+from fasterpay.streaming import iter_records_from_chunks
+from fasterpay.tests.mockserver import MockFasterPayServer
+
+
+def synthetic_page(count: int = 1000) -> bytes:
+    invoices = [
+        {
+            "id": f"FPBIV-250528-{i:04d}",
+            "status": "paid" if i % 3 else "sent",
+            "currency": "USD",
+            "contact": {"id": f"CT-{i:04d}", "email": f"customer{i}@example.com", "first_name": "Jane", "last_name": "Doe"},
+            "items": [{"price": 40.0, "quantity": 3, "product": {"id": f"PD-{n}", "name": "Consulting hour"}} for n in range(5)],
+            "summary": {"subtotal": 600.0, "tax": 120.0, "total": 720.0},
+            "updated_at": "2025-05-28 10:05:00",
+        }
+        for i in range(count)
+    ]
+    return json.dumps({"success": True, "data": {"current_page": 1, "per_page": count, "data": invoices}}).encode()
+
+
+def chunked(body: bytes, size: int = 64 * 1024):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def measure(label: str, collect):
+    tracemalloc.start()
+    ids = collect()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {len(ids)} records, peak {peak / 1024:8.1f} KiB")
+    return ids
+
+
+def check_stream_mode_helpers() -> None:
+    """Paginating helpers work inside a stream block, and failed streamed calls free their connection."""
+    with MockFasterPayServer(records=2500) as server:
+        gateway = Gateway("<your public key>", "<your private key>", True, api_url=server.url, external_api_url=server.url)
+        with gateway.response_mode("stream"):
+            contacts = sum(1 for _ in iter_records(gateway.contact().list_contacts, per_page=1000))
+            gateway.contact_mirror().refresh(full=True)
+            gateway.invoice_catalog().refresh()
+        assert contacts == 2500, contacts
+        assert len(gateway.contact_mirror()) == 2500, len(gateway.contact_mirror())
+
+    with MockFasterPayServer(error_rate=1.0) as server:
+        gateway = Gateway("<your public key>", "<your private key>", True, api_url=server.url, external_api_url=server.url, retries=1)
+        gateway.transport.backoff = 0
+        with gateway.response_mode("stream"):
+            for _ in range(5):
+                try:
+                    gateway.einvoice().list_invoices()
+                except requests.HTTPError:
+                    pass
+        assert server.connections == 1, f"{server.connections} connections opened for failed streamed calls"
+    print("stream mode: paginating helpers work, failed calls release their connection")
+
+
+def check_modes_outside_listings() -> None:
+    """Only list methods stream or return raw bytes; raw pages are refused by the paginators."""
+    with MockFasterPayServer(records=30) as server:
+        gateway = Gateway("<your public key>", "<your private key>", True, api_url=server.url, external_api_url=server.url)
+        invoice = {"contact_id": "CT-1", "currency": "USD", "items": [{"price": 10, "quantity": 1}]}
+        for mode in ("stream", "raw"):
+            with gateway.response_mode(mode):
+                created = gateway.einvoice().create_invoice(dict(invoice))
+                fetched = gateway.einvoice().get_invoice("FPBIV-000001")
+                page = gateway.einvoice().list_invoices()
+            assert isinstance(created, dict) and created["data"]["currency"] == "USD", (mode, created)
+            assert isinstance(fetched, dict), (mode, fetched)
+            assert isinstance(page, bytes) if mode == "raw" else not isinstance(page, (dict, bytes)), (mode, page)
+
+        with gateway.response_mode("raw"):
+            try:
+                list(iter_records(gateway.contact().list_contacts))
+                raise AssertionError("paginated raw pages")
+            except TypeError:
+                pass
+    print("modes: create and get return dicts inside stream and raw blocks; raw pages refused")
+
+
+if __name__ == "__main__":
+    check_stream_mode_helpers()
+    check_modes_outside_listings()
+
+    body = synthetic_page()
+    print(f"synthetic page: {len(body) / 1024:.1f} KiB")
+
+    full = measure("full decode", lambda: [row["id"] for row in json.loads(body)["data"]["data"]])
+    streamed = measure("streamed records", lambda: [row["id"] for row in iter_records_from_chunks(chunked(body))])
+
+    print("OK" if full == streamed else "NOK")
@@ -1,22 +1,29 @@
-import requests
-
-
 class Transaction:
+    __slots__ = ("gateway", "api_url", "api_key")
+
     def __init__(self, gateway):
         self.gateway = gateway
         self.api_url = gateway.config.api_url
         self.api_key = gateway.config.private_key
 
-    def refund(self, order_id: str, amount: float):
-        """Process a refund for a given order ID."""
+    def refund(self, order_id: str, amount: float, idempotency_key: str = None):
+        """
+        Process a refund for a given order ID.
+
+        Without an idempotency key the refund is sent once and never retried. With one,
+        it is sent as the `Idempotency-Key` header, retried only when connecting to
+        FasterPay fails, and, with an idempotency journal, not sent again once it
+        completed. After a timeout or a 5xx response the refund may have been applied:
+        check its status before sending it again.
+        """
         if not order_id or amount < 0:
             raise ValueError("order_id is required and amount must be non-negative.")
 
         url = f"{self.api_url}/payment/{order_id}/refund"
         data = {"amount": amount}
-        return self._post_json(url, data)
+        return self._post_json(url, data, idempotency_key=idempotency_key)
 
-    def deliver(self, delivery_info: dict):
+    def deliver(self, delivery_info: dict, idempotency_key: str = None):
         """
         Send delivery confirmation for a completed payment.
 
@@ -30,6 +37,7 @@ class Transaction:
                 - status (str): Required. Delivery status. Example: "delivered".
                 - type (str): Optional. Type of delivery. Example: "digital".
                 - estimated_delivery_datetime (str): Optional. ISO 8601 timestamp of estimated delivery time.
+            idempotency_key (str, optional): Key of the confirmation, see `refund`.
 
         Endpoint:
             POST https://pay.fasterpay.com/api/v1/deliveries
@@ -41,13 +49,75 @@ class Transaction:
             dict: API response confirming delivery has been recorded.
         """
         url = f"{self.api_url}/api/v1/deliveries"
-        return self._post_json(url, delivery_info)
+        return self._post_json(url, delivery_info, idempotency_key=idempotency_key)
+
+    def refund_many(self, refunds: list, max_workers: int = None):
+        """
+        Process many refunds concurrently.
+
+        Concurrency follows the transport's adaptive limiter, which raises it while
+        FasterPay answers quickly and cuts it on 429s, 5xx responses and rising latency.
+
+        Args:
+            refunds (list): Dicts with `order_id`, `amount` and optionally `idempotency_key`.
+            max_workers (int, optional): Upper bound on concurrent refunds.
+
+        Yields:
+            dict: Per-refund outcome, in completion order, with keys `index` (position
+                in `refunds`), `order_id`, `refund` (API response) and `error` (None on
+                success).
+
+        Raises:
+            ValueError: A refund has no `amount`; checked before any refund is sent.
+        """
+        for index, params in enumerate(refunds):
+            if params.get("amount") is None:
+                raise ValueError(f"refunds[{index}] has no amount.")
+
+        def refund(indexed):
+            index, params = indexed
+            outcome = {"index": index, "order_id": params.get("order_id"), "refund": None, "error": None}
+            try:
+                outcome["refund"] = self.refund(params.get("order_id"), params["amount"], params.get("idempotency_key"))
+            except Exception as error:
+                outcome["error"] = error
+            return outcome
+
+        return self.gateway.transport.limiter.map_unordered(refund, enumerate(refunds), max_workers)
+
+    def deliver_many(self, deliveries: list, max_workers: int = None):
+        """
+        Send many delivery confirmations concurrently, see `refund_many`.
+
+        Args:
+            deliveries (list): `delivery_info` dicts, see `deliver`; an `idempotency_key`
+                entry is sent as the call's idempotency key.
+            max_workers (int, optional): Upper bound on concurrent confirmations.
+
+        Yields:
+            dict: Per-confirmation outcome, in completion order, with keys `index`,
+                `payment_id`, `delivery` (API response) and `error` (None on success).
+        """
+        def deliver(indexed):
+            index, delivery_info = indexed
+            delivery_info = dict(delivery_info)
+            idempotency_key = delivery_info.pop("idempotency_key", None)
+            outcome = {"index": index, "payment_id": delivery_info.get("payment_id"), "delivery": None, "error": None}
+            try:
+                outcome["delivery"] = self.deliver(delivery_info, idempotency_key=idempotency_key)
+            except Exception as error:
+                outcome["error"] = error
+            return outcome
+
+        return self.gateway.transport.limiter.map_unordered(deliver, enumerate(deliveries), max_workers)
 
 
-    def _post_json(self, url: str, data: dict):
+    def _post_json(self, url: str, data: dict, idempotency_key: str = None):
         """Helper to POST JSON with auth header."""
         headers = {"X-ApiKey": self.api_key, "Content-Type": "application/json"}
-        response = requests.post(url, json=data, headers=headers)
+        response = self.gateway.transport.request(
+            "POST", url, json=data, headers=headers, idempotency_key=idempotency_key
+        )
         response.raise_for_status()
-        return response.json()
+        return self.gateway.transport.decode(response)
     
\ No newline at end of file
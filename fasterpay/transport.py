@@ -0,0 +1,711 @@
+import asyncio
+import functools
+import gzip
+import random
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError
+
+from fasterpay import forksafety
+from fasterpay.codec import JsonCodec
+from fasterpay.concurrencylimit import AdaptiveLimiter, current_limiter
+from fasterpay.dnscache import DNSCache, is_ip_address
+from fasterpay.instrumentation import CallEvent, TransferCounters
+from fasterpay.singleflight import SingleFlight
+from fasterpay.streaming import current_response_mode, iter_records_from_chunks
+
+if TYPE_CHECKING:
+    from fasterpay.cassette import Cassette
+
+RETRYABLE_STATUS_CODES = (429, 502, 503, 504)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+COALESCED_OPTIONS = frozenset(("params", "headers", "timeout"))
+# Connect timeout, in seconds, of connections opened by `warmup` when the transport has none.
+WARMUP_TIMEOUT = 5.0
+
+# TCP keep-alive probes stop NAT gateways and load balancers from silently dropping
+# idle pooled connections.
+KEEPALIVE_SOCKET_OPTIONS = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+if hasattr(socket, "TCP_KEEPIDLE"):
+    KEEPALIVE_SOCKET_OPTIONS += [
+        (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 30),
+        (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 10),
+        (socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3),
+    ]
+
+
+class Transport:
+    """
+    HTTP transport shared by all resources of a gateway.
+
+    Requests go through one pooled `requests.Session`. Idempotent methods are retried
+    on connection errors, timeouts and 429/502/503/504 responses with exponential
+    backoff. POSTs sent with an idempotency key are only retried when connecting
+    failed, so the request never left the process: after a read timeout, a dropped
+    connection or an error response the call may have been applied, and FasterPay
+    does not document deduplicating the key. `retry_keyed_posts` retries them like
+    idempotent methods, for hosts known to deduplicate it. Other POSTs are sent once:
+    no key is generated on the caller's behalf. When a journal is configured, keyed
+    calls are recorded in it so a call completed in this process is not sent again.
+
+    With `coalesce` enabled (it is off by default), concurrent identical GETs (same
+    URL, query and headers) share one in-flight request; `single_flight.stats()`
+    reports how many upstream calls were saved.
+
+    Responses are requested with every content encoding urllib3 can decode (gzip,
+    deflate, and brotli when the `brotli` package is installed) and decompressed
+    while they are read. With `compress_threshold` set, request bodies of at least
+    that many bytes are sent gzip-compressed; a host answering 415 gets the body
+    uncompressed and is not sent compressed bodies again. `transfer` counts the
+    bytes exchanged, decoded and on the wire.
+
+    New connections resolve hosts through `dns_cache`, which keeps answers for
+    `dns_ttl` seconds. `warmup` opens pooled connections ahead of the first call, and
+    `keep_warm` keeps them open through quiet periods.
+
+    Requests sent by bulk helpers are gated by `limiter`, an adaptive concurrency
+    limit shared by all of them, see `fasterpay.concurrencylimit.AdaptiveLimiter`.
+    Connection pools keep up to `limiter.max_limit` connections per host, so a bulk
+    helper at full concurrency reuses its connections.
+
+    `use_cassette` records traffic to, or replays it from, a `fasterpay.cassette.Cassette`
+    instead of the network, for load tests and profiling.
+    """
+
+    def __init__(
+        self,
+        retries: int = 2,
+        backoff: float = 0.5,
+        timeout: float = None,
+        journal=None,
+        codec: JsonCodec = None,
+        tracers: list = None,
+        coalesce: bool = False,
+        compress_threshold: int = None,
+        compress_level: int = 6,
+        dns_ttl: float = 60.0,
+        limiter: AdaptiveLimiter = None,
+        retry_keyed_posts: bool = False,
+    ):
+        self.retries = retries
+        self.retry_keyed_posts = retry_keyed_posts
+        self.backoff = backoff
+        self.timeout = timeout
+        self.journal = journal
+        self.codec = codec or JsonCodec()
+        self.tracers = tracers if tracers is not None else []
+        self.coalesce = coalesce
+        self.single_flight = SingleFlight()
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+        self.transfer = TransferCounters()
+        self.limiter = limiter or AdaptiveLimiter()
+        self._uncompressed_hosts = set()
+        self._http2_hosts = {}
+        self._cassette = None
+        self.dns_cache = DNSCache(dns_ttl) if dns_ttl else None
+        self.session = _new_session(self.dns_cache, self.limiter.max_limit)
+        self._keep_warm = None
+        self._keep_warm_stop = None
+        self._resume_after_fork = False
+        self._resume_lock = threading.Lock()
+        forksafety.register(self)
+
+    def use_http2(self, base_url: str, **options) -> None:
+        """
+        Send requests to one host over multiplexed HTTP/2 connections.
+
+        Requires the optional `httpx[http2]` package. Other hosts keep using the
+        HTTP/1.1 pool.
+
+        Args:
+            base_url (str): Scheme and host, e.g. "https://business.fasterpay.com".
+            **options: Passed on to `fasterpay.http2.HTTP2Adapter`.
+        """
+        from fasterpay.http2 import HTTP2Adapter
+
+        prefix = base_url.rstrip("/") + "/"
+        self.session.mount(prefix, HTTP2Adapter(**options))
+        self._http2_hosts[prefix] = options
+
+    def use_cassette(self, cassette: "Cassette") -> None:
+        """
+        Record every request to, or replay every response from, `cassette`.
+
+        Everything above the network still runs (retries, idempotency journal, codec,
+        tracers, concurrency limit), so a replaying gateway measures the SDK's own
+        overhead. Call it after `use_http2`; recording then goes over HTTP/2 too.
+
+        Args:
+            cassette (Cassette): Cassette in "record" or "replay" mode.
+        """
+        from fasterpay.cassette import CassetteAdapter
+
+        for prefix, adapter in list(self.session.adapters.items()):
+            upstream = adapter.upstream if isinstance(adapter, CassetteAdapter) else adapter
+            self.session.mount(prefix, CassetteAdapter(cassette, upstream))
+        self._cassette = cassette
+
+    def warmup(self, urls, connections: int = 2) -> dict:
+        """
+        Open pooled connections to the hosts of `urls` before calls need them.
+
+        Connections are opened concurrently, resolving, connecting and completing the
+        TLS handshake, and put in the pool that requests to the host use. Connections
+        already open are counted, not replaced. Hosts sent over HTTP/2 are skipped.
+        Connecting is bounded by the connect part of `timeout`, or WARMUP_TIMEOUT when
+        the transport has none.
+
+        Args:
+            urls (iterable): URLs of the hosts, e.g. "https://pay.fasterpay.com".
+            connections (int): Connections per host, at most the pool size.
+
+        Returns:
+            dict: Number of open connections per URL.
+        """
+        self._resume()
+        connect_timeout = self.timeout[0] if isinstance(self.timeout, tuple) else self.timeout
+        opened = {}
+        for url in urls:
+            adapter = self.session.get_adapter(url)
+            if isinstance(adapter, PoolAdapter):
+                # Pick the pool a request would, e.g. honouring REQUESTS_CA_BUNDLE and proxies.
+                settings = self.session.merge_environment_settings(url, {}, None, None, None)
+                opened[url] = adapter.warm(
+                    url, connections, settings["verify"], settings["cert"], settings["proxies"],
+                    connect_timeout if connect_timeout is not None else WARMUP_TIMEOUT,
+                )
+            else:
+                opened[url] = 0
+        return opened
+
+    def keep_warm(self, urls, connections: int = 2, interval: float = 30.0) -> None:
+        """
+        Call `warmup` every `interval` seconds on a background thread.
+
+        Connections the server closed while idle are reopened in the background rather
+        than by the next call, and expired DNS answers are refreshed. A forked child
+        process starts its own thread on its first call. Stop it with `stop_keep_warm`.
+        """
+        if interval <= 0:
+            raise ValueError("interval must be positive.")
+        self.stop_keep_warm()
+        self._keep_warm = (tuple(urls), connections, interval)
+        self._start_keep_warm()
+
+    def stop_keep_warm(self) -> None:
+        stop, self._keep_warm_stop = self._keep_warm_stop, None
+        self._keep_warm = None
+        if stop is not None:
+            stop.set()
+
+    def request(self, method: str, url: str, idempotency_key: str = None, **kwargs) -> requests.Response:
+        """
+        Send a request and return the final response.
+
+        Args:
+            method (str): HTTP method.
+            url (str): Request URL.
+            idempotency_key (str, optional): Sent as the `Idempotency-Key` header. A
+                keyed POST is retried when connecting fails and, with a journal, is not
+                sent again once it completed.
+            **kwargs: Passed on to `requests.Session.request`. A `json` body is
+                encoded with the transport's codec.
+
+        Returns:
+            requests.Response: The response of the last attempt. Coalesced callers
+            share the same response object.
+        """
+        method = method.upper()
+        key = self._flight_key(method, url, idempotency_key, kwargs)
+        if key is not None:
+            return self.single_flight.do(key, lambda: self._send(method, url, idempotency_key, kwargs))
+        return self._send(method, url, idempotency_key, kwargs)
+
+    async def request_async(self, method: str, url: str, idempotency_key: str = None, **kwargs) -> requests.Response:
+        """
+        Send a request from asyncio code without blocking the event loop.
+
+        The request runs on a worker thread. Concurrent identical GETs awaited on the
+        same loop share one in-flight request, like `request` does for threads.
+        """
+        method = method.upper()
+        key = self._flight_key(method, url, idempotency_key, kwargs)
+        if key is not None:
+            return await self.single_flight.do_async(
+                key, lambda: asyncio.to_thread(self._send, method, url, idempotency_key, kwargs)
+            )
+        return await asyncio.to_thread(self._send, method, url, idempotency_key, kwargs)
+
+    def _send(self, method: str, url: str, idempotency_key: str, kwargs: dict) -> requests.Response:
+        if self._resume_after_fork:
+            self._resume()
+        if self.timeout is not None:
+            kwargs.setdefault("timeout", self.timeout)
+        if method == "GET" and current_response_mode() == "stream":
+            kwargs.setdefault("stream", True)
+
+        journal = self.journal if idempotency_key else None
+        if idempotency_key:
+            kwargs["headers"] = dict(kwargs.get("headers") or {}, **{"Idempotency-Key": idempotency_key})
+        if journal is not None:
+            record = journal.begin(idempotency_key, method, url, kwargs.get("json"))
+            if record["state"] == "done":
+                return _recorded_response(record, url)
+
+        event = CallEvent(method, url) if self.tracers else None
+        if event is not None:
+            started = time.perf_counter()
+            _connection_timings.__dict__.clear()
+
+        if kwargs.get("json") is not None:
+            kwargs["data"] = self.codec.dumps(kwargs.pop("json"))
+            kwargs["headers"] = dict(kwargs.get("headers") or {})
+            kwargs["headers"].setdefault("Content-Type", "application/json")
+            if event is not None:
+                event.add_phase("encode", time.perf_counter() - started)
+        else:
+            kwargs.pop("json", None)
+
+        if event is not None:
+            compress_started = time.perf_counter()
+        plain = self._compress(url, kwargs)
+        if event is not None and plain is not None:
+            event.add_phase("compress", time.perf_counter() - compress_started)
+
+        retries = self.retries if self._retryable(method, idempotency_key, kwargs) else 0
+        # A keyed POST may have been applied once any of it was sent.
+        unsent_only = method not in IDEMPOTENT_METHODS and not self.retry_keyed_posts
+        limiter = current_limiter()
+        attempt = 0
+        try:
+            while True:
+                if limiter is not None:
+                    waiting = time.perf_counter()
+                    slot = limiter.acquire()
+                    if event is not None:
+                        event.add_phase("queue", slot - waiting)
+                if event is not None:
+                    attempt_started = time.perf_counter()
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as error:
+                    if limiter is not None:
+                        limiter.release(slot, overloaded=True)
+                    if attempt >= retries or (unsent_only and not is_unsent(error)):
+                        raise
+                except Exception:
+                    if limiter is not None:
+                        limiter.release(slot)
+                    raise
+                else:
+                    if limiter is not None:
+                        limiter.release(slot, overloaded=response.status_code == 429 or response.status_code >= 500)
+                    if response.status_code == 415 and plain is not None:
+                        # The host does not accept compressed bodies: resend as is, and remember it.
+                        response.content
+                        self._uncompressed_hosts.add(urlsplit(url).netloc)
+                        kwargs["data"] = plain
+                        del kwargs["headers"]["Content-Encoding"]
+                        plain = None
+                        continue
+                    if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= retries or unsent_only:
+                        break
+                    # Read a streamed error body so its connection goes back to the pool.
+                    response.content
+                attempt += 1
+                delay = self.backoff * (2 ** (attempt - 1)) * (0.5 + random.random())
+                if event is not None:
+                    event.add_phase("backoff", delay)
+                time.sleep(delay)
+        except Exception as error:
+            if event is not None:
+                event.error = error
+                self._count_bytes(event, kwargs, plain, None)
+                self._emit(event, started, attempt, None)
+            raise
+
+        if kwargs.get("stream") and response.status_code >= 400:
+            # Error bodies are read at once, so the connection goes back to the pool even
+            # when the caller raises on the status without reading the stream.
+            response.content
+        self._count_bytes(event, kwargs, plain, response)
+        if event is not None:
+            event.add_phase("attempt", time.perf_counter() - attempt_started)
+            self._emit(event, started, attempt, response)
+
+        if journal is not None:
+            if response.ok:
+                journal.complete(idempotency_key, response.status_code, response.text)
+            elif response.status_code not in RETRYABLE_STATUS_CODES:
+                journal.fail(idempotency_key, status=response.status_code)
+        return response
+
+    def decode(self, response: requests.Response, chunk_size: int = 64 * 1024, listing: bool = False):
+        """
+        Decode a response body according to the current response mode.
+
+        Args:
+            response (requests.Response): Response to decode.
+            chunk_size (int): Bytes read at a time in "stream" mode.
+            listing (bool): Whether the response is a page of a GET list endpoint. Other
+                responses are always decoded as in "json" mode.
+
+        Returns:
+            The body decoded with the transport's codec in "json" mode, the raw bytes in
+            "raw" mode, and an iterator over the records of the body's `data` array in
+            "stream" mode. The iterator closes the response once exhausted.
+        """
+        mode = current_response_mode() if listing else "json"
+        if mode == "raw":
+            return response.content
+        if mode == "stream":
+            return _stream_records(response, chunk_size)
+
+        event = getattr(response, "fasterpay_event", None)
+        if event is None or not self.tracers:
+            return self.codec.loads(response.content)
+
+        started = time.perf_counter()
+        decoded = self.codec.loads(response.content)
+        elapsed = time.perf_counter() - started
+        for tracer in self.tracers:
+            tracer.on_decode(event, elapsed)
+        return decoded
+
+    def close(self) -> None:
+        self.stop_keep_warm()
+        self.session.close()
+
+    def _emit(self, event: CallEvent, started: float, attempt: int, response) -> None:
+        event.retries = attempt
+        connect = _connection_timings.__dict__.get("connect", 0.0)
+        setup = max(_connection_timings.__dict__.get("setup", 0.0), connect)
+        if connect:
+            event.add_phase("connect", connect)
+        if setup > connect:
+            event.add_phase("tls", setup - connect)
+
+        event.duration = time.perf_counter() - started
+        if response is None:
+            self._notify(event)
+            return
+
+        # Time spent in the final attempt, split into waiting for headers and reading the body.
+        last_attempt = event.phases.pop("attempt", 0.0)
+        headers_at = response.elapsed.total_seconds()
+        event.status = response.status_code
+        event.add_phase("server", max(headers_at - setup, 0.0))
+        if response._content_consumed:
+            event.add_phase("download", max(last_attempt - headers_at, 0.0))
+        response.fasterpay_event = event
+        self._notify(event)
+
+    def _compress(self, url: str, kwargs: dict):
+        """Gzip a large request body in place and return the original, or None."""
+        data = kwargs.get("data")
+        if (
+            self.compress_threshold is None
+            or not isinstance(data, bytes)
+            or len(data) < self.compress_threshold
+            or kwargs.get("files")
+            or urlsplit(url).netloc in self._uncompressed_hosts
+        ):
+            return None
+        kwargs["data"] = gzip.compress(data, self.compress_level, mtime=0)
+        kwargs["headers"] = dict(kwargs.get("headers") or {}, **{"Content-Encoding": "gzip"})
+        return data
+
+    def _count_bytes(self, event: CallEvent, kwargs: dict, plain: bytes, response) -> None:
+        data = kwargs.get("data")
+        request_wire_bytes = len(data) if isinstance(data, (bytes, str)) else 0
+        request_bytes = len(plain) if plain is not None else request_wire_bytes
+        response_bytes = response_wire_bytes = 0
+        if response is not None:
+            if response._content_consumed:
+                response_bytes = len(response.content)
+                response_wire_bytes = _wire_size(response, response_bytes)
+            else:
+                # Streamed bodies are not read yet; count the announced size.
+                response_bytes = response_wire_bytes = int(response.headers.get("Content-Length") or 0)
+            self.transfer.record(request_bytes, request_wire_bytes, response_bytes, response_wire_bytes)
+        if event is not None:
+            event.request_bytes = request_bytes
+            event.request_wire_bytes = request_wire_bytes
+            event.response_bytes = response_bytes
+            event.response_wire_bytes = response_wire_bytes
+
+    def _notify(self, event: CallEvent) -> None:
+        for tracer in self.tracers:
+            tracer.on_call(event)
+
+    def _flight_key(self, method: str, url: str, idempotency_key: str, kwargs: dict):
+        if not self.coalesce or method != "GET" or idempotency_key or current_response_mode() == "stream":
+            return None
+        if not COALESCED_OPTIONS.issuperset(kwargs):
+            return None
+        try:
+            key = (url, _frozen(kwargs.get("params")), _frozen(kwargs.get("headers")), kwargs.get("timeout"))
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _after_fork(self) -> None:
+        """
+        Give a forked child process its own connections and in-flight call table.
+
+        The inherited pools are dropped without being closed: their sockets are still
+        used by the parent, and HTTP/2 connections are driven by a thread that does
+        not exist in the child.
+        """
+        self.single_flight = SingleFlight()
+        self.transfer = TransferCounters()
+        self.session = _new_session(self.dns_cache, self.limiter.max_limit)
+        if self._cassette is not None:
+            self.use_cassette(self._cassette)
+        # Threads cannot safely be started until every at-fork handler has run: HTTP/2
+        # adapters, each driven by a thread, and keep-warm are restored by the first call.
+        self._keep_warm_stop = None
+        self._resume_lock = threading.Lock()
+        self._resume_after_fork = bool(self._http2_hosts) or self._keep_warm is not None
+
+    def _resume(self) -> None:
+        """Restore, in a forked child, the HTTP/2 adapters and keep-warm deferred by `_after_fork`."""
+        if not self._resume_after_fork:
+            return
+        with self._resume_lock:
+            if not self._resume_after_fork:
+                return
+            for prefix, options in self._http2_hosts.items():
+                self.use_http2(prefix, **options)
+            if self._cassette is not None and self._http2_hosts:
+                self.use_cassette(self._cassette)
+            if self._keep_warm is not None:
+                self._start_keep_warm()
+            self._resume_after_fork = False
+
+    def _start_keep_warm(self) -> None:
+        urls, connections, interval = self._keep_warm
+        stop = self._keep_warm_stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                try:
+                    self.warmup(urls, connections)
+                except Exception:
+                    pass  # Best effort: calls open their own connections if this fails.
+
+        threading.Thread(target=run, name="fasterpay-keep-warm", daemon=True).start()
+
+    def _retryable(self, method: str, idempotency_key: str, kwargs: dict) -> bool:
+        if method not in IDEMPOTENT_METHODS and not idempotency_key:
+            return False
+        # Open file objects are consumed by the first attempt and cannot be re-sent.
+        return all(_replayable(value) for value in (kwargs.get("files") or {}).values())
+
+
+class PoolAdapter(HTTPAdapter):
+    """
+    `requests` adapter whose connection pools time connection setup, so the
+    transport can report connect and TLS handshake time separately from server time.
+
+    Connections resolve hosts through `dns_cache` when one is given, and send TCP
+    keep-alive probes while idle.
+    """
+
+    def __init__(self, dns_cache: DNSCache = None, **kwargs):
+        self.dns_cache = dns_cache
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs.setdefault("socket_options", KEEPALIVE_SOCKET_OPTIONS)
+        super().init_poolmanager(*args, **kwargs)
+        dns_cache = getattr(self, "dns_cache", None)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": functools.partial(_TimedHTTPConnectionPool, dns_cache=dns_cache),
+            "https": functools.partial(_TimedHTTPSConnectionPool, dns_cache=dns_cache),
+        }
+
+    def warm(self, url: str, connections: int, verify=True, cert=None, proxies=None, timeout: float = None) -> int:
+        """
+        Open up to `connections` connections, at most the pool size, in the pool for `url`.
+
+        Args:
+            timeout (float, optional): Connect timeout, in seconds, of each connection.
+
+        Returns:
+            int: Number of open connections.
+        """
+        request = requests.Request("GET", url).prepare()
+        if hasattr(self, "get_connection_with_tls_context"):
+            pool = self.get_connection_with_tls_context(request, verify, proxies, cert)
+        else:
+            pool = self.get_connection(url, proxies)
+
+        # Check connections out so each one is opened, then return them to the pool.
+        checked_out = [pool._get_conn() for _ in range(min(connections, self._pool_maxsize))]
+        try:
+            with ThreadPoolExecutor(max_workers=len(checked_out) or 1) as executor:
+                return sum(executor.map(functools.partial(_open_connection, timeout=timeout), checked_out))
+        finally:
+            for connection in checked_out:
+                pool._put_conn(connection)
+
+
+# Connection setup time accumulated by the current thread during one request.
+_connection_timings = threading.local()
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def __init__(self, *args, dns_cache: DNSCache = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dns_cache = dns_cache
+
+    def _new_conn(self):
+        started = time.perf_counter()
+        try:
+            return _resolved_conn(self, super()._new_conn)
+        finally:
+            _add_timing("connect", time.perf_counter() - started)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def __init__(self, *args, dns_cache: DNSCache = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dns_cache = dns_cache
+
+    def _new_conn(self):
+        started = time.perf_counter()
+        try:
+            return _resolved_conn(self, super()._new_conn)
+        finally:
+            _add_timing("connect", time.perf_counter() - started)
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            _add_timing("setup", time.perf_counter() - started)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+def _new_session(dns_cache: DNSCache = None, pool_size: int = 10) -> requests.Session:
+    pool_size = max(pool_size, DEFAULT_POOLSIZE)
+    session = requests.Session()
+    session.mount("https://", PoolAdapter(dns_cache, pool_maxsize=pool_size))
+    session.mount("http://", PoolAdapter(dns_cache, pool_maxsize=pool_size))
+    return session
+
+
+def _resolved_conn(connection, new_conn):
+    """Open a socket to the first reachable cached address of the connection's host."""
+    host = connection._dns_host
+    dns_cache = connection.dns_cache
+    if dns_cache is None or is_ip_address(host):
+        return new_conn()
+    try:
+        addresses = dns_cache.resolve(host, connection.port)
+    except OSError:
+        return new_conn()  # Let urllib3 resolve the host and report the failure.
+
+    # TLS still uses `connection.host` for SNI and certificate checks.
+    try:
+        for index, address in enumerate(addresses):
+            connection._dns_host = address
+            try:
+                return new_conn()
+            except Exception:
+                if index == len(addresses) - 1:
+                    dns_cache.invalidate(host)
+                    raise
+    finally:
+        connection._dns_host = host
+
+
+def _open_connection(connection, timeout: float = None) -> bool:
+    if connection.sock is None:
+        if timeout is not None:
+            # Requests set the timeout of their connection themselves, see urllib3's `_make_request`.
+            connection.timeout = timeout
+        try:
+            connection.connect()
+        except Exception:
+            connection.close()
+            return False
+    return True
+
+
+def _add_timing(name: str, seconds: float) -> None:
+    timings = _connection_timings.__dict__
+    timings[name] = timings.get(name, 0.0) + seconds
+
+
+def _frozen(mapping):
+    if not mapping:
+        return None
+    if isinstance(mapping, dict):
+        return tuple(sorted(mapping.items()))
+    return mapping
+
+
+def _wire_size(response: requests.Response, decoded_size: int) -> int:
+    # urllib3 responses report how many (possibly compressed) bytes were read from the socket.
+    tell = getattr(response.raw, "tell", None)
+    return tell() if tell is not None else decoded_size
+
+
+def is_unsent(error: Exception) -> bool:
+    """
+    Whether a request error was raised while connecting, before any of the request was
+    sent, so sending it again cannot apply it twice.
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    cause = error.args[0] if error.args else None
+    # urllib3 wraps refused connections and failed lookups in MaxRetryError.
+    if isinstance(getattr(cause, "reason", None), ConnectTimeoutError):
+        return True
+    httpx = sys.modules.get("httpx")
+    return httpx is not None and isinstance(cause, httpx.ConnectError)
+
+
+def _replayable(upload) -> bool:
+    if isinstance(upload, tuple):
+        upload = upload[1] if len(upload) > 1 else upload[0]
+    return isinstance(upload, (bytes, str))
+
+
+def _recorded_response(record: dict, url: str) -> requests.Response:
+    response = requests.Response()
+    response.status_code = record.get("status") or 200
+    response._content = (record.get("body") or "").encode("utf-8")
+    response.encoding = "utf-8"
+    response.headers["Content-Type"] = "application/json"
+    response.url = url
+    return response
+
+
+def _stream_records(response: requests.Response, chunk_size: int):
+    try:
+        yield from iter_records_from_chunks(response.iter_content(chunk_size=chunk_size))
+    finally:
+        response.close()